@@ -0,0 +1,468 @@
+"""A local stand-in for the iGEM websites API and static.igem.wiki, for benchmarks.
+
+Serves sign-in, team lookup, directory listings, uploads, deletes and static
+file downloads over plain HTTP/1.1 with keep-alive. Uploaded files are kept
+in a temporary directory. Latency, per-connection bandwidth and error
+injection are configurable, so transfer code can be measured under
+conditions close to production without touching it.
+
+Run it on its own:
+    python bench/mock_server.py --port 8765 --latency-ms 40 --bandwidth-mbps 20
+
+or from a harness with MockServer(...).start(), and point a Session at it
+with attach().
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+import httpx
+
+
+TEAM_ID = 1
+API_HOST = "api.igem.org"
+STATIC_HOST = "static.igem.wiki"
+CHUNK_SIZE = 64 * 1024
+ERROR_STATUSES = (429, 500, 503)
+
+
+class Throttle:
+    """Paces reads or writes of one connection to a bandwidth limit."""
+
+    def __init__(self, bytes_per_second: float = None):
+        self.rate = bytes_per_second
+        self.start = time.monotonic()
+        self.sent = 0
+
+    def wait(self, size: int) -> None:
+        if not self.rate:
+            return
+        self.sent += size
+        delay = self.start + self.sent / self.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Store:
+    """The remote file tree of one team, on disk, indexed by directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dirs = {"": {"files": {}, "folders": set()}}
+        self.lock = threading.Lock()
+
+    def _dir(self, directory: str) -> dict:
+        entry = self.dirs.get(directory)
+        if entry is None:
+            entry = self.dirs[directory] = {"files": {}, "folders": set()}
+            parent, _, name = directory.rpartition("/")
+            self._dir(parent)["folders"].add(name)
+        return entry
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest())
+
+    def put(self, directory: str, name: str, tmp_path: str, size: int) -> str:
+        key = f"{directory}/{name}" if directory else name
+        os.replace(tmp_path, self.path(key))
+        with self.lock:
+            self._dir(directory)["files"][name] = {"size": size, "mtime": time.time()}
+        return key
+
+    def get(self, key: str) -> dict | None:
+        directory, _, name = key.rpartition("/")
+        with self.lock:
+            entry = self.dirs.get(directory)
+            return entry["files"].get(name) if entry else None
+
+    def delete(self, directory: str, name: str) -> int:
+        with self.lock:
+            entry = self.dirs.get(directory)
+            if entry is None:
+                return 404
+            if name in entry["files"]:
+                del entry["files"][name]
+                key = f"{directory}/{name}" if directory else name
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+                return 200
+            if name in entry["folders"]:
+                sub = f"{directory}/{name}" if directory else name
+                if self.dirs[sub]["files"] or self.dirs[sub]["folders"]:
+                    return 409
+                entry["folders"].discard(name)
+                del self.dirs[sub]
+                return 200
+            return 404
+
+    def listing(self, directory: str, page_size: int = 0, token: str = None) -> dict:
+        """The listing of a directory, cut into pages of ``page_size`` entries if set.
+
+        Pages follow S3 ListObjectsV2: entries are ordered by name, and a
+        truncated page carries IsTruncated and a NextContinuationToken, sent
+        back as the continuation-token parameter. The token is the last name
+        of the page, so entries deleted meanwhile do not shift the next page.
+        """
+        with self.lock:
+            entry = self.dirs.get(directory, {"files": {}, "folders": set()})
+            names = sorted([(name, None) for name in entry["folders"]] + list(entry["files"].items()), key=lambda e: e[0])
+        truncated = False
+        if page_size:
+            if token is not None:
+                names = names[bisect.bisect_right(names, token, key=lambda e: e[0]):]
+            truncated = len(names) > page_size
+            names = names[:page_size]
+        prefix = f"teams/{TEAM_ID}/" + (directory + "/" if directory else "")
+        contents = [
+            {
+                "Type": name.rsplit(".", 1)[-1] if "." in name else "file",
+                "Name": name,
+                "Key": prefix + name,
+                "Location": f"https://{STATIC_HOST}/{quote(prefix + name)}",
+                "Size": meta["size"],
+                "LastModified": formatdate(meta["mtime"], usegmt=True),
+            }
+            for name, meta in names
+            if meta is not None
+        ]
+        prefixes = [
+            {"Type": "Folder", "Name": name, "Key": prefix + name, "Prefix": prefix + name + "/"}
+            for name, meta in names
+            if meta is None
+        ]
+        listing = {"KeyCount": len(contents) + len(prefixes), "Contents": contents, "CommonPrefixes": prefixes}
+        if page_size:
+            listing["IsTruncated"] = truncated
+            if truncated:
+                listing["NextContinuationToken"] = names[-1][0]
+        return listing
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "MockServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    # Helpers
+
+    def _delay(self) -> None:
+        latency, jitter = self.server.latency, self.server.jitter
+        if latency or jitter:
+            time.sleep(latency + random.uniform(0, jitter))
+
+    def _send(self, status: int, body: bytes = b"", headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self._write(body)
+
+    def _write(self, data: bytes) -> None:
+        throttle = Throttle(self.server.bandwidth)
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            chunk = view[start:start + CHUNK_SIZE]
+            throttle.wait(len(chunk))
+            self.wfile.write(chunk)
+
+    def _json(self, value, status: int = 200) -> None:
+        self._send(status, json.dumps(value).encode(), {"Content-Type": "application/json"})
+
+    def _read_body(self, sink) -> int:
+        """Copy the request body, plain or chunked, into ``sink``. Returns its size."""
+        throttle = Throttle(self.server.bandwidth)
+        size = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                length = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if length == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return size
+                remaining = length
+                while remaining:
+                    data = self.rfile.read(min(CHUNK_SIZE, remaining))
+                    throttle.wait(len(data))
+                    sink(data)
+                    remaining -= len(data)
+                size += length
+                self.rfile.readline()
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            data = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            throttle.wait(len(data))
+            sink(data)
+            remaining -= len(data)
+            size += len(data)
+        return size
+
+    def _inject_error(self) -> bool:
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._read_body(lambda data: None)
+            status = random.choice(ERROR_STATUSES)
+            self._send(status, b"injected error", {"Retry-After": "0"} if status == 429 else None)
+            return True
+        return False
+
+    # Routing
+
+    def _route(self) -> None:
+        self.server.count_request()
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        host = self.headers.get("Host", API_HOST).split(":")[0]
+        self._delay()
+        if host == STATIC_HOST:
+            return self._static(unquote(url.path))
+        if self._inject_error():
+            return
+        path = url.path
+        directory = params.get("directory", "").strip("/")
+        teams = f"/v1/websites/teams/{TEAM_ID}"
+        if path == "/v1/auth/sign-in" and self.command == "POST":
+            self._read_body(lambda data: None)
+            self._send(200, b"Signed in", {"Set-Cookie": f"session=bench; Domain={API_HOST}; Path=/"})
+        elif path == "/v1/teams/memberships/mine" and self.command == "GET":
+            self._json([
+                {
+                    "team": {"id": TEAM_ID, "name": "Benchmark", "year": 2024, "status": "accepted"},
+                    "membership": {"role": "primary contact", "status": "accepted"},
+                }
+            ])
+        elif path == teams and self.command == "GET":
+            self._json(self.server.store.listing(directory, self.server.page_size, params.get("continuation-token")))
+        elif path == teams and self.command == "POST":
+            self._upload(directory)
+        elif path.startswith(teams + "/") and self.command == "DELETE":
+            self._read_body(lambda data: None)
+            status = self.server.store.delete(directory, unquote(path[len(teams) + 1:]))
+            self._send(status)
+        else:
+            self._send(404, b"Not found")
+
+    def _upload(self, directory: str) -> None:
+        """Accept a multipart upload with a single "file" field, streaming it to disk."""
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get("Content-Type", ""))
+        if match is None:
+            self._read_body(lambda data: None)
+            return self._send(400, b"Expected multipart/form-data")
+        fd, tmp_path = tempfile.mkstemp(dir=self.server.store.root)
+        # The body is spooled to disk, then the file part is cut out of it
+        with os.fdopen(fd, "w+b") as f:
+            self._read_body(f.write)
+            f.seek(0)
+            head = f.read(CHUNK_SIZE)
+            name_match = re.search(rb'filename="([^"]*)"', head)
+            header_end = head.find(b"\r\n\r\n", name_match.end() if name_match else 0)
+            if name_match is None or header_end < 0:
+                os.remove(tmp_path)
+                return self._send(400, b"Missing file part")
+            start = header_end + 4
+            end = f.seek(0, os.SEEK_END) - len(b"\r\n--" + match.group(1).encode() + b"--\r\n")
+            f.seek(start)
+            fd_out, part_path = tempfile.mkstemp(dir=self.server.store.root)
+            with os.fdopen(fd_out, "wb") as out:
+                remaining = end - start
+                while remaining > 0:
+                    data = f.read(min(CHUNK_SIZE, remaining))
+                    out.write(data)
+                    remaining -= len(data)
+        os.remove(tmp_path)
+        name = unquote(name_match.group(1).decode())
+        key = self.server.store.put(directory, name, part_path, end - start)
+        self._send(201, f"https://{STATIC_HOST}/teams/{TEAM_ID}/{quote(key)}".encode())
+
+    def _static(self, path: str) -> None:
+        prefix = f"/teams/{TEAM_ID}/"
+        key = path[len(prefix):] if path.startswith(prefix) else None
+        meta = self.server.store.get(key) if key else None
+        if meta is None:
+            return self._send(404, b"Not found")
+        size = meta["size"]
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Last-Modified": formatdate(meta["mtime"], usegmt=True),
+            "ETag": f'"{size:x}-{int(meta["mtime"] * 1000):x}"',
+            "Accept-Ranges": "bytes",
+        }
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if if_none_match == headers["ETag"]:
+                return self._send(304, headers=headers)
+        elif self.headers.get("If-Modified-Since"):
+            try:
+                since = parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and int(meta["mtime"]) <= since:
+                return self._send(304, headers=headers)
+        start, end, status = 0, size, 200
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range not in (headers["ETag"], headers["Last-Modified"]):
+            match = None  # The file changed since the client's partial download: send it whole
+        if match:
+            start = int(match.group(1))
+            end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+            if start >= size:
+                return self._send(416, headers={"Content-Range": f"bytes */{size}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        throttle = Throttle(self.server.bandwidth)
+        with open(self.server.store.path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                data = f.read(min(CHUNK_SIZE, remaining))
+                throttle.wait(len(data))
+                self.wfile.write(data)
+                remaining -= len(data)
+
+    do_GET = do_POST = do_DELETE = do_HEAD = _route
+
+
+class MockServer(ThreadingHTTPServer):
+    """The mock API and static host, served from one local port.
+
+    Requests are told apart by their Host header, which attach() keeps as
+    the production host name.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        bandwidth_mbps: float = None,
+        error_rate: float = 0,
+        page_size: int = 0,
+    ):
+        """Create the server.
+
+        Args:
+            port (int, optional): The port to listen on, 0 for any free port.
+            latency_ms (float, optional): Delay added before every response.
+            jitter_ms (float, optional): Random extra delay, up to this much.
+            bandwidth_mbps (float, optional): Per-connection transfer limit in megabytes per second.
+            error_rate (float, optional): Share of API requests answered with 429, 500 or 503.
+            page_size (int, optional): Entries per listing page, 0 to list every directory in one response.
+        """
+        super().__init__(("127.0.0.1", port), Handler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.bandwidth = bandwidth_mbps * 1024 * 1024 if bandwidth_mbps else None
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self._data_dir = tempfile.mkdtemp(prefix="igem-cdn-mock-")
+        self.store = Store(self._data_dir)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count_request(self) -> None:
+        with self._count_lock:
+            self.requests += 1
+
+    def start(self) -> "MockServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        shutil.rmtree(self._data_dir, ignore_errors=True)
+
+
+class RedirectTransport(httpx.HTTPTransport):
+    """Sends every request to the mock server, keeping the original Host header."""
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return super().handle_request(request)
+
+
+def attach(session, port: int, event_hooks: dict = None, http1: bool = False) -> None:
+    """Point the connection pools of a Session at a mock server on ``port``.
+
+    The mock speaks HTTP/1.1, so each HTTP/2 stream the pool settings allow
+    becomes a connection of its own: a pool of ``max_connections`` with
+    ``max_streams`` each gets ``max_connections * max_streams`` connections.
+    With ``http1`` the pools get only ``max_connections``, as a host that
+    falls back to HTTP/1.1 would give them. Headers and the keep-alive
+    expiry are kept.
+    """
+    from src.uploads import STATIC_HEADERS
+
+    for pool, headers in ((session.client, None), (session.static, STATIC_HEADERS)):
+        streams = pool.settings["max_connections"] * (1 if http1 else pool.settings["max_streams"])
+        limits = httpx.Limits(
+            max_connections=streams,
+            max_keepalive_connections=streams,
+            keepalive_expiry=pool.settings["keepalive_expiry"],
+        )
+        pool.client = httpx.Client(
+            headers=headers,
+            limits=limits,
+            event_hooks=event_hooks,
+            transport=RedirectTransport(port, limits=limits),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock iGEM websites API for benchmarks")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--bandwidth-mbps", type=float, help="Per-connection limit in MB/s")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of API requests that fail")
+    parser.add_argument("--page-size", type=int, default=0, help="Entries per listing page, 0 for no pagination")
+    args = parser.parse_args()
+    server = MockServer(args.port, args.latency_ms, args.jitter_ms, args.bandwidth_mbps, args.error_rate, args.page_size)
+    print(f"Mock iGEM API on http://127.0.0.1:{server.port} (team {TEAM_ID})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutil.rmtree(server._data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
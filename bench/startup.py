@@ -0,0 +1,219 @@
+"""Startup benchmark: time from launching igem-cdn to its first request, per action.
+
+The CLI is started with HTTPS_PROXY pointing at a local listener. The moment
+the listener accepts a connection is the moment the tool sends its first
+request; the process is then killed, so no request ever leaves the machine.
+A saved session is placed next to a throwaway config so that the first
+request is the action's own rather than the sign-in.
+
+Usage:
+    python bench/startup.py                      # run main.py with this Python
+    python bench/startup.py --command igem-cdn   # run an installed binary
+    python bench/startup.py --runs 20 --max-ms 400
+
+With --max-ms the script exits with status 1 when the median of any action
+is slower, so it can guard against startup regressions.
+"""
+import argparse
+import json
+import os
+import queue
+import shlex
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACTIONS = ["query", "download", "upload", "delete", "sync", "mirror"]
+FIRST_REQUEST_TIMEOUT = 30
+
+
+def start_listener() -> tuple:
+    """Accept connections on a free local port and report when each one arrives.
+
+    Returns:
+        tuple: (port, queue of perf_counter timestamps, one per connection).
+    """
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    arrivals = queue.Queue()
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            arrivals.put(time.perf_counter())
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1], arrivals
+
+
+def make_workspace(work_dir: str) -> str:
+    """Create a config, a saved session and a small local tree.
+
+    Returns:
+        str: The config file path.
+    """
+    local_root = os.path.join(work_dir, "server")
+    os.makedirs(os.path.join(local_root, "site"))
+    with open(os.path.join(local_root, "site", "index.txt"), "w") as f:
+        f.write("igem-cdn startup benchmark\n")
+
+    config_path = os.path.join(work_dir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(
+            {
+                "username": {"data": "bench"},
+                "password": {"data": "bench"},
+                "local_root": {"data": local_root},
+            },
+            f,
+        )
+    with open(os.path.join(work_dir, "session.json"), "w") as f:
+        json.dump(
+            {
+                "username": "bench",
+                "team_id": 0,
+                "url": "https://static.igem.wiki/teams/0/",
+                "cookies": [
+                    {"name": "session", "value": "bench", "domain": "api.igem.org", "path": "/", "expires": None}
+                ],
+            },
+            f,
+        )
+    return config_path
+
+
+def action_args(action: str, local_root: str) -> list:
+    site = os.path.join(local_root, "site")
+    match action:
+        case "query":
+            return ["query", site]
+        case "download":
+            return ["download", site, "-rp", "site/index.txt"]
+        case "upload":
+            return ["upload", os.path.join(site, "index.txt"), "-rp", "site/index.txt"]
+        case "delete":
+            return ["delete", site, "-rp", "site/index.txt"]
+        case "sync" | "mirror":
+            return [action, site, "-rp", "site"]
+
+
+def time_to_first_request(command: list, env: dict, arrivals: queue.Queue) -> float | None:
+    """Launch the command once and measure how long it takes to connect.
+
+    Returns:
+        float | None: Seconds until the first connection, or None if the
+        process exited or timed out without connecting.
+    """
+    while not arrivals.empty():
+        arrivals.get_nowait()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        deadline = start + FIRST_REQUEST_TIMEOUT
+        while time.perf_counter() < deadline:
+            try:
+                return arrivals.get(timeout=0.05) - start
+            except queue.Empty:
+                if process.poll() is not None:
+                    return None
+        return None
+    finally:
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure igem-cdn time to first request")
+    parser.add_argument(
+        "--command",
+        help="Command that runs the tool (default: this Python on main.py)",
+    )
+    parser.add_argument("--runs", type=int, default=10, help="Launches per action (default: 10)")
+    parser.add_argument(
+        "--actions", nargs="+", choices=ACTIONS, default=ACTIONS, help="Actions to measure"
+    )
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Pass --async to the tool")
+    parser.add_argument("--max-ms", type=float, help="Fail if a median exceeds this many milliseconds")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.command:
+        base = shlex.split(args.command)
+    else:
+        base = [sys.executable, os.path.join(REPO_ROOT, "main.py")]
+
+    port, arrivals = start_listener()
+    env = dict(os.environ)
+    for name in ("HTTPS_PROXY", "HTTP_PROXY", "ALL_PROXY", "https_proxy", "http_proxy", "all_proxy", "NO_PROXY", "no_proxy"):
+        env.pop(name, None)
+    env["HTTPS_PROXY"] = env["HTTP_PROXY"] = f"http://127.0.0.1:{port}"
+
+    results = {}
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="igem-cdn-bench-") as work_dir:
+        config_path = make_workspace(work_dir)
+        local_root = os.path.join(work_dir, "server")
+
+        # Process startup and argument parsing alone, as a floor for the numbers below
+        help_times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run(base + ["--help"], env=env, stdout=subprocess.DEVNULL, check=True)
+            help_times.append(time.perf_counter() - start)
+        results["--help"] = help_times
+
+        for action in args.actions:
+            command = base + action_args(action, local_root) + ["--config", config_path]
+            if args.use_async:
+                command.append("--async")
+            times = []
+            for _ in range(args.runs):
+                elapsed = time_to_first_request(command, env, arrivals)
+                if elapsed is None:
+                    print(f"{action}: exited without sending a request: {shlex.join(command)}", file=sys.stderr)
+                    failed = True
+                    break
+                times.append(elapsed)
+            if times:
+                results[action] = times
+
+    print(f"{'action':<10} {'min ms':>8} {'median ms':>10} {'max ms':>8}")
+    summary = {}
+    for action, times in results.items():
+        summary[action] = {
+            "min_ms": min(times) * 1000,
+            "median_ms": statistics.median(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "runs": len(times),
+        }
+        print(
+            f"{action:<10} {summary[action]['min_ms']:>8.1f} "
+            f"{summary[action]['median_ms']:>10.1f} {summary[action]['max_ms']:>8.1f}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.max_ms is not None:
+        slow = [a for a, s in summary.items() if a != "--help" and s["median_ms"] > args.max_ms]
+        if slow:
+            print(f"Slower than {args.max_ms} ms: {', '.join(slow)}", file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Transfer benchmark: drive a Session against the local mock API.
+
+Builds a synthetic tree, then times upload_dir, a recursive listing,
+download_dir, a second download_dir of the unchanged tree and delete_dir
+on it, reporting files/s, MB/s, request latency percentiles (time to
+response headers) and peak RSS for each phase. The mock server runs in a
+separate process so its CPU and memory do not count.
+
+Usage:
+    python bench/transfer.py --scenario tiny     # 10,000 files of 1 KiB
+    python bench/transfer.py --scenario large    # 50 files of 8 MiB
+    python bench/transfer.py --scenario mixed --bandwidth-mbps 20  # 400 x 64 KiB, then 4 x 32 MiB
+    python bench/transfer.py --scenario large --latency-ms 50 --bandwidth-mbps 10 --error-rate 0.02
+    python bench/transfer.py --files 20000 --size 1024 --per-dir 20000 --page-size 1000  # one paginated folder
+    python bench/transfer.py --files 500 --size 65536 --jobs 16 --json result.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from bench.mock_server import attach  # noqa: E402
+from src.catalog import Catalog  # noqa: E402
+from src.throttle import DEFAULT_INFLIGHT_MB  # noqa: E402
+from src.transfer import DEFAULT_JOBS  # noqa: E402
+from src.uploads import Session  # noqa: E402
+from src.validators import ValidatorStore  # noqa: E402
+
+
+SCENARIOS = {
+    "tiny": {"files": 10_000, "size": 1024, "per_dir": 100},
+    "large": {"files": 50, "size": 8 * 1024 * 1024, "per_dir": 10},
+    # Small files with a few big ones found last in walk order
+    "mixed": {"files": 400, "size": 64 * 1024, "per_dir": 50, "big_files": 4, "big_size": 32 * 1024 * 1024},
+}
+PHASES = ["upload", "query", "download", "redownload", "delete"]
+REMOTE_DIR = "bench"
+RSS_INTERVAL = 0.02
+
+
+class RssSampler:
+    """Tracks the peak resident set size of this process between start() and stop()."""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _current(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            # No /proc (macOS): fall back to the peak over the process lifetime
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, self._current())
+
+    def start(self) -> None:
+        self.peak = self._current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._current())
+        return self.peak
+
+
+class RequestTimer:
+    """httpx event hooks recording the latency of every request."""
+
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def on_request(self, request) -> None:
+        request.extensions["bench_start"] = time.perf_counter()
+
+    def on_response(self, response) -> None:
+        start = response.request.extensions.get("bench_start")
+        if start is not None:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+    def take(self) -> list:
+        with self._lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+def start_server(args) -> tuple:
+    """Run the mock server in a subprocess and return (process, port)."""
+    command = [
+        sys.executable,
+        os.path.join(REPO_ROOT, "bench", "mock_server.py"),
+        "--port", "0",
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--page-size", str(args.page_size),
+    ]
+    if args.bandwidth_mbps:
+        command += ["--bandwidth-mbps", str(args.bandwidth_mbps)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    port = int(line.split("http://127.0.0.1:")[1].split()[0])
+    return process, port
+
+
+def make_tree(root: str, files: int, size: int, per_dir: int, big_files: int = 0, big_size: int = 0) -> int:
+    """Write ``files`` random files of ``size`` bytes, ``per_dir`` to a directory,
+    then ``big_files`` of ``big_size`` bytes in a last directory.
+
+    Returns:
+        int: The total number of bytes written.
+    """
+    for index in range(files):
+        directory = os.path.join(root, f"d{index // per_dir:04d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"f{index:06d}.bin"), "wb") as f:
+            f.write(os.urandom(size))
+    if big_files:
+        os.makedirs(os.path.join(root, "zz"), exist_ok=True)
+    for index in range(big_files):
+        with open(os.path.join(root, "zz", f"big{index:03d}.bin"), "wb") as f:
+            f.write(os.urandom(big_size))
+    return files * size + big_files * big_size
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_phase(name: str, session: Session, tree: str, target: str) -> int:
+    """Run one phase and return the number of files it handled."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        match name:
+            case "upload":
+                return len(session.upload_dir(tree, REMOTE_DIR, True) or [])
+            case "query":
+                session.listings.clear()
+                return len(session.list_files(REMOTE_DIR, True))
+            case "download" | "redownload":
+                session.listings.clear()
+                session.download_dir(REMOTE_DIR, target, True)
+                return sum(len(files) for _, _, files in os.walk(target))
+            case "delete":
+                session.listings.clear()
+                return len(session.list_files(REMOTE_DIR, True)) - len(session.delete_dir(REMOTE_DIR, True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Session transfers against a local mock API")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="tiny")
+    parser.add_argument("--files", type=int, help="Number of files (overrides the scenario)")
+    parser.add_argument("--size", type=int, help="Bytes per file (overrides the scenario)")
+    parser.add_argument("--per-dir", type=int, help="Files per directory (overrides the scenario)")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help="Parallel transfers")
+    parser.add_argument("--max-inflight-mb", type=float, default=DEFAULT_INFLIGHT_MB, help="Upload byte budget")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=PHASES)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Server delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay per request")
+    parser.add_argument("--bandwidth-mbps", type=float, help="Per-connection limit in MB/s")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of API requests that fail")
+    parser.add_argument("--page-size", type=int, default=0, help="Entries per listing page, 0 for no pagination")
+    parser.add_argument("--http1", action="store_true", help="Limit each pool to max_connections, as over HTTP/1.1")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    scenario = dict(SCENARIOS[args.scenario])
+    for key in ("files", "size", "per_dir"):
+        if getattr(args, key) is not None:
+            scenario[key] = getattr(args, key)
+
+    server, port = start_server(args)
+    work_dir = tempfile.mkdtemp(prefix="igem-cdn-bench-")
+    results = {}
+    try:
+        tree = os.path.join(work_dir, "tree")
+        target = os.path.join(work_dir, "download")
+        total_bytes = make_tree(
+            tree, scenario["files"], scenario["size"], scenario["per_dir"],
+            scenario.get("big_files", 0), scenario.get("big_size", 0),
+        )
+        print(
+            f"{scenario['files']} files of {scenario['size']} bytes"
+            + (f" and {scenario['big_files']} of {scenario['big_size']} bytes" if scenario.get("big_files") else "")
+            + f", {args.jobs} jobs, "
+            f"latency {args.latency_ms} ms, bandwidth {args.bandwidth_mbps or 'unlimited'} MB/s, "
+            f"error rate {args.error_rate}"
+        )
+
+        timer = RequestTimer()
+        sampler = RssSampler()
+        session = Session(args.jobs, max_inflight_mb=args.max_inflight_mb)
+        session.validators = ValidatorStore(os.path.join(work_dir, "downloads.json"))
+        session.catalog = Catalog(os.path.join(work_dir, "catalog.sqlite3"))
+        session.journal_dir = os.path.join(work_dir, "journals")
+        attach(session, port, {"request": [timer.on_request], "response": [timer.on_response]}, args.http1)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            session.login("bench", "bench")
+        timer.take()
+
+        for phase in args.phases:
+            sampler.start()
+            start = time.perf_counter()
+            count = run_phase(phase, session, tree, target)
+            elapsed = time.perf_counter() - start
+            peak = sampler.stop()
+            latencies = timer.take()
+            moved = total_bytes if phase in ("upload", "download") else 0
+            results[phase] = {
+                "files": count,
+                "seconds": elapsed,
+                "files_per_s": count / elapsed if elapsed else 0.0,
+                "mb_per_s": moved / elapsed / 1024 / 1024 if elapsed else 0.0,
+                "requests": len(latencies),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+                "peak_rss_mb": peak / 1024 / 1024,
+            }
+        session.close()
+    finally:
+        server.terminate()
+        server.wait()
+        server.stdout.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(
+        f"{'phase':<10} {'files':>7} {'seconds':>8} {'files/s':>9} {'MB/s':>8} "
+        f"{'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12}"
+    )
+    for phase, r in results.items():
+        print(
+            f"{phase:<10} {r['files']:>7} {r['seconds']:>8.2f} {r['files_per_s']:>9.1f} "
+            f"{r['mb_per_s']:>8.1f} {r['requests']:>8} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+            f"{r['peak_rss_mb']:>12.1f}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"scenario": scenario, "jobs": args.jobs, "phases": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,37 @@
 import os
 import argparse
+import contextlib
 import json
-from src.uploads import Session
+import sys
+from typing import TYPE_CHECKING
+from src.transfer import DEFAULT_JOBS
+from src.throttle import DEFAULT_INFLIGHT_MB
+from src.auth_cache import SessionCache, SESSION_CACHE_NAME
+from src.formats import FORMATS
 import re
 
+# The sessions (and with them httpx), asyncio, the sync/mirror machinery and
+# the optimizer are imported on the code paths that use them, to keep them
+# off the startup of --help, query --offline and the other actions.
+if TYPE_CHECKING:
+    from src.async_uploads import AsyncSession
+    from src.uploads import Session
+
 local_root = ""
 args = None
+recorder = None
+
+
+def phase(name: str):
+    """Time a step of the run when --stats or --trace is given."""
+    return recorder.phase(name) if recorder is not None else contextlib.nullcontext()
+
+
+def login_output():
+    """Send the sign-in messages to stderr when stdout carries batch results or query rows."""
+    if args.action == "batch" or args.format != "table":
+        return contextlib.redirect_stdout(sys.stderr)
+    return contextlib.nullcontext()
 
 
 def is_file_path(path: str) -> bool:
@@ -29,52 +55,257 @@ def handle_missing(path: str) -> None:
         if is_dir_path(os.path.join(local_root, path)):
             os.makedirs(os.path.join(local_root, path))
         elif is_file_path(os.path.join(local_root, path)):
-            # Create a empty new file, add text in it to prompt user
-            # that seeing the prompt means request failed.
-            with open(os.path.join(local_root, path), "w") as f:
-                f.write("Request failed. Please try again.")
+            # Only create the parent directory, the file itself is written
+            # atomically once the download completes.
+            os.makedirs(os.path.dirname(os.path.join(local_root, path)), exist_ok=True)
+
 
+# The action helpers return the client call, which is a coroutine when the
+# client is an AsyncSession, so that run_async can await it.
 
-def delete(client: Session, remote_path: str) -> None:
+
+def delete(client: "Session", remote_path: str):
     if is_file_path(os.path.join(local_root, remote_path)):
         dir_path = os.path.dirname(remote_path)
         file_name = os.path.basename(remote_path)
-        client.delete_file(file_name, dir_path, True)
+        return client.delete_file(file_name, dir_path, True)
     elif os.path.isdir(os.path.join(local_root, remote_path)):
-        client.delete_dir(remote_path, args.recursive)
+        return client.delete_dir(remote_path, args.recursive, args.resume)
     else:
         print(f"Error: '{os.path.join(local_root, remote_path)}' does not exist.")
 
 
-def sync_work_dir(client: Session, local_work_dir: str, remote_work_dir: str) -> None:
-    """Upload all local files to remote without overwriting check, then download all remote files to local."""
-    client.upload_dir(local_work_dir, remote_work_dir, True)
-    client.download_dir(remote_work_dir, True)
+def sync_work_dir(client: "Session", local_work_dir: str, remote_work_dir: str) -> None:
+    """Upload new or changed local files, then download new or changed remote files.
+
+    Changes are detected against the manifest kept in the local root.
+    """
+    from src.manifest import Manifest
+    from src.sync import sync_dir
+
+    sync_dir(client, Manifest(local_root), local_work_dir, remote_work_dir)
+
+
+def mirror_work_dir(client: "Session", local_work_dir: str, remote_work_dir: str) -> None:
+    """Make the remote directory match the local one, deleting remote files that are gone locally.
+
+    With --dry-run, only print what would be uploaded, overwritten and deleted.
+    """
+    from src.manifest import Manifest
+    from src.mirror import plan_mirror, print_plan, run_mirror
+
+    manifest = Manifest(local_root)
+    with phase("plan"):
+        plan = plan_mirror(client, manifest, local_work_dir, remote_work_dir)
+    if args.dry_run:
+        print_plan(plan)
+    else:
+        with phase("apply"):
+            run_mirror(client, manifest, plan)
+
+
+def watch_work_dir(client: "Session", local_work_dir: str, remote_work_dir: str) -> None:
+    """Keep the session open and upload local files as they change, until Ctrl+C."""
+    from src.manifest import Manifest
+    from src.watch import watch_dir
+
+    watch_dir(client, Manifest(local_root), local_work_dir, remote_work_dir)
+
+
+def batch_work(client: "Session", operations_path: str) -> None:
+    """Run the upload/download/delete operations listed in a JSON lines file, or stdin for '-'.
 
+    The results are written to stdout as JSON lines; the exit status is 1 if any operation failed.
+    """
+    from src.batch import run_batch
 
-def download(client: Session, remote_path: str) -> None:
+    if operations_path == "-":
+        succeeded, failed = run_batch(client, sys.stdin, local_root)
+    else:
+        with open(operations_path) as stream:
+            succeeded, failed = run_batch(client, stream, local_root)
+    print(f"Batch: {succeeded} succeeded, {failed} failed", file=sys.stderr)
+    if failed:
+        client.close()
+        sys.exit(1)
+
+
+def download(client: "Session", remote_path: str):
     """Download from remote without overwriting check."""
     handle_missing(remote_path)
-    if os.path.isfile(os.path.join(local_root, remote_path)):
-        client.download_file(
+    if os.path.isdir(os.path.join(local_root, remote_path)):
+        return client.download_dir(remote_path, local_root, args.recursive, args.resume)
+    elif os.path.isfile(os.path.join(local_root, remote_path)) or is_file_path(
+        os.path.join(local_root, remote_path)
+    ):
+        return client.download_file(
             remote_path, os.path.dirname(os.path.join(local_root, remote_path)), True
         )
-    elif os.path.isdir(os.path.join(local_root, remote_path)):
-        client.download_dir(remote_path, local_root, args.recursive)
     else:
         print(f"Error: '{os.path.join(local_root, remote_path)}' does not exist.")
 
 
-def upload(client: Session, local_path: str, remote_path: str) -> None:
+def query(client: "Session", remote_path: str):
+    """List a remote directory, look up the URL of a remote file, or find the files matching --glob."""
+    if args.format != "table":
+        return query_rows(client, remote_path)
+    if args.glob:
+        return client.search(args.glob, remote_path, True)
+    elif is_file_path(remote_path):
+        return client.locate(remote_path, True)
+    else:
+        return client.query(remote_path)
+
+
+def query_pattern(remote_path: str) -> str | None:
+    """The glob a query in --format rows answers: --glob, or the escaped file path."""
+    from src.catalog import glob_escape
+
+    if args.glob:
+        return args.glob
+    if is_file_path(remote_path):
+        return glob_escape(remote_path.strip("/"))
+    return None
+
+
+def query_rows(client: "Session", remote_path: str):
+    """Write the rows of a query in --format as the listings arrive; with -r the whole subtree."""
+    from src.formats import RowWriter
+
+    writer = RowWriter(args.format, client.team_id)
+    pattern = query_pattern(remote_path)
+    directory = remote_path if args.glob else ""
+    if args.use_async:
+        return query_rows_async(client, remote_path, writer, pattern, directory)
+    from src.crawler import crawl
+
+    try:
+        if pattern is not None:
+            for path, item in client.search(pattern, directory):
+                writer.write(os.path.dirname(path), item)
+        else:
+            for current_dir, item in crawl(client, remote_path, args.recursive, client.executor.jobs):
+                writer.write(current_dir, item)
+    finally:
+        writer.close()
+
+
+async def query_rows_async(client: "AsyncSession", remote_path: str, writer, pattern: str, directory: str) -> None:
+    """query_rows on an AsyncSession."""
+    try:
+        if pattern is not None:
+            for path, item in await client.search(pattern, directory):
+                writer.write(os.path.dirname(path), item)
+        else:
+            async for current_dir, item in client.crawl(remote_path, args.recursive):
+                writer.write(current_dir, item)
+    finally:
+        writer.close()
+
+
+def query_offline(team_id, remote_path: str) -> None:
+    """Answer a query from the catalog of earlier listings, without signing in."""
+    from src.catalog import Catalog, print_matches
+    from src.formats import RowWriter
+    from src.uploads import listing_contents
+
+    catalog = Catalog()
+    try:
+        if args.format != "table":
+            writer = RowWriter(args.format, team_id)
+            pattern = query_pattern(remote_path)
+            try:
+                if pattern is not None:
+                    for path, item in catalog.glob(team_id, pattern, remote_path if args.glob else ""):
+                        writer.write(os.path.dirname(path), item)
+                else:
+                    for current_dir, item in catalog.walk(team_id, remote_path, args.recursive):
+                        writer.write(current_dir, item)
+            finally:
+                writer.close()
+        elif args.glob:
+            print_matches(catalog.glob(team_id, args.glob, remote_path), args.glob)
+        elif is_file_path(remote_path):
+            url = catalog.url(team_id, remote_path)
+            print(url if url is not None else f"'{remote_path}' not in the catalog")
+        else:
+            listing = catalog.listing(team_id, remote_path)
+            if listing is None:
+                print(f"Error: '{remote_path or "/"}' is not in the catalog, query it once without --offline.")
+                return
+            listing_contents(listing, remote_path, team_id)
+    finally:
+        catalog.close()
+
+
+def upload(client: "Session", local_path: str, remote_path: str):
     """Upload to remote without overwriting check."""
     if os.path.isfile(local_path):
-        client.upload_file(local_path, os.path.dirname(remote_path), True)
+        if client.optimizer is not None:
+            local_path = client.optimizer.optimize(local_path)
+        return client.upload_file(local_path, os.path.dirname(remote_path), True)
     elif os.path.isdir(local_path):
-        client.upload_dir(local_path, remote_path, args.recursive)
+        return client.upload_dir(local_path, remote_path, args.recursive, args.resume)
     else:
         print(f"Error: '{os.path.join(local_root, remote_path)}' does not exist.")
 
 
+def run_action(client: "Session", local_path: str, remote_path: str):
+    """Run the requested action on a logged-in client."""
+    match args.action:
+        case "delete":
+            if not remote_path:
+                print("Error: --remote-path is required for delete action")
+                return
+            return delete(client, remote_path)
+        case "sync":
+            if args.use_async:
+                print("Error: sync does not support --async yet")
+                return
+            return sync_work_dir(client, local_path, remote_path)
+        case "mirror":
+            if args.use_async:
+                print("Error: mirror does not support --async yet")
+                return
+            return mirror_work_dir(client, local_path, remote_path)
+        case "watch":
+            if args.use_async:
+                print("Error: watch does not support --async yet")
+                return
+            return watch_work_dir(client, local_path, remote_path)
+        case "batch":
+            if args.use_async:
+                print("Error: batch does not support --async yet")
+                return
+            return batch_work(client, local_path)
+        case "download":
+            return download(client, remote_path)
+        case "upload":
+            return upload(client, local_path, remote_path)
+        case "query":
+            return query(client, remote_path)
+
+
+async def run_async(
+    client: "AsyncSession",
+    username: str,
+    password: str,
+    session_cache: SessionCache,
+    local_path: str,
+    remote_path: str,
+) -> None:
+    """Log in and run the requested action on an AsyncSession."""
+    import inspect
+
+    async with client:
+        with phase("login"), login_output():
+            await client.login(username, password, session_cache)
+        with phase(args.action):
+            result = run_action(client, local_path, remote_path)
+            if inspect.isawaitable(result):
+                await result
+
+
 def load_config(config_path="config.json") -> dict:
     """Loads the configuration from a JSON file."""
     try:
@@ -98,10 +329,14 @@ def main() -> None:
     )
     parser.add_argument(
         "action",
-        choices=["delete", "sync", "download", "upload", "query"],
+        choices=["delete", "sync", "mirror", "watch", "batch", "download", "upload", "query"],
         help="Action to perform",
     )
-    parser.add_argument("local_path", help="Local path")
+    parser.add_argument(
+        "local_path",
+        help="Local path (for batch: JSON lines operations file, '-' for stdin; "
+        "directories and remote paths ending in '/' are transferred file by file)",
+    )
     parser.add_argument("-rp", "--remote-path", help="Remote path")
     parser.add_argument("--config", help="Path to the configuration file")
     parser.add_argument(
@@ -110,18 +345,80 @@ def main() -> None:
         action="store_true",
         help="Recursively upload/download directories",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help=f"Number of parallel transfers (default: {DEFAULT_JOBS})",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run on asyncio instead of worker threads",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the files an interrupted upload/download/delete of the same directory completed",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the changes mirror would make",
+    )
+    parser.add_argument(
+        "--glob",
+        metavar="PATTERN",
+        help="For query: list the files matching PATTERN, e.g. '**/*.png'",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="table",
+        help="For query: output format; json, jsonl and tsv stream one row per entry, recursively with -r",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="For query: answer from the catalog of earlier listings without signing in",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Convert PNG/JPEG/GIF to WebP and TTF to WOFF2 before uploading",
+    )
+    parser.add_argument(
+        "--fresh-login",
+        action="store_true",
+        help="Sign in again instead of reusing the saved session",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print request counts, throughput, latencies and retries at the end",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write one JSON line per request, retry and phase to FILE",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Profile the run with cProfile and write the stats to FILE",
+    )
 
     global args
     args = parser.parse_args()
 
-    config = args.config
+    config_path = args.config
     remote_path = args.remote_path
     local_path = args.local_path
 
-    if config is None:
-        config = load_config(f"{os.getenv('HOME')}/.local/share/igem/config.json")
-    else:
-        config = load_config(config)
+    if config_path is None:
+        config_path = f"{os.getenv('HOME')}/.local/share/igem/config.json"
+    config = load_config(config_path)
 
     if config is None:
         return
@@ -143,23 +440,97 @@ def main() -> None:
         remote_path = remote_path.replace("server/", "")
         remote_path = remote_path.replace("server", "")
 
-    client = Session()
-    client.login(username, password)
+    session_cache = SessionCache(
+        os.path.join(os.path.dirname(os.path.abspath(config_path)), SESSION_CACHE_NAME)
+    )
 
-    match args.action:
-        case "delete":
-            if not remote_path:
-                print("Error: --remote-path is required for delete action")
-                return
-            delete(client, remote_path)
-        case "sync":
-            sync_work_dir(client, local_path, remote_path)
-        case "download":
-            download(client, remote_path)
-        case "upload":
-            upload(client, local_path, remote_path)
-        case "query":
-            client.query(remote_path)
+    if args.offline:
+        if args.action != "query":
+            print("Error: --offline only works with query")
+            return
+        team_id = session_cache.team_id(username)
+        if team_id is None:
+            print("Error: no saved session, run query once without --offline first.")
+            return
+        query_offline(team_id, remote_path)
+        return
+
+    jobs = args.jobs
+    if jobs is None:
+        jobs = config.get("jobs", {}).get("data", DEFAULT_JOBS)
+    if jobs < 1:
+        print("Error: 'jobs' must be at least 1.")
+        return
+
+    max_inflight_mb = config.get("max_inflight_mb", {}).get("data", DEFAULT_INFLIGHT_MB)
+    if max_inflight_mb <= 0:
+        print("Error: 'max_inflight_mb' must be positive.")
+        return
+
+    optimizer = None
+    if args.optimize or config.get("optimize", {}).get("data", False):
+        from src.optimize import Optimizer
+
+        optimizer = Optimizer()
+
+    if args.fresh_login:
+        session_cache.clear()
+
+    global recorder
+    if args.stats or args.trace:
+        from src.stats import Recorder
+
+        recorder = Recorder(args.trace)
+
+    if args.use_async:
+        from src.async_uploads import AsyncSession
+
+        session_class = AsyncSession
+    else:
+        from src.uploads import Session
+
+        session_class = Session
+    try:
+        client = session_class(
+            jobs,
+            config.get("api_pool", {}).get("data"),
+            config.get("static_pool", {}).get("data"),
+            optimizer,
+            recorder,
+            max_inflight_mb,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.use_async:
+            import asyncio
+
+            asyncio.run(
+                run_async(client, username, password, session_cache, local_path, remote_path)
+            )
+        else:
+            with phase("login"), login_output():
+                client.login(username, password, session_cache)
+            with phase(args.action):
+                run_action(client, local_path, remote_path)
+            client.close()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to '{args.profile}', view it with: python -m pstats {args.profile}")
+        if recorder is not None:
+            if args.stats:
+                recorder.print_summary(client.limiter)
+            recorder.close()
 
 
 if __name__ == "__main__":
@@ -11,6 +11,7 @@ fi
 
 PROGRAM_NAME="igem-cdn"
 PROGRAM_DIR="$HOME/.local/share/igem"
+APP_DIR="$HOME/.local/lib/$PROGRAM_NAME"
 
 ensure_install_path() {
     if [ ! -d "$INSTALL_PATH" ]; then
@@ -42,14 +43,22 @@ install_program() {
         is_update=true
     fi
 
+    local SUDO=""
     if [[ "$OSTYPE" == "darwin"* ]]; then
-        sudo rm -rf "$INSTALL_PATH/$PROGRAM_NAME"
-        sudo mv "$PROGRAM_NAME" "$INSTALL_PATH/$PROGRAM_NAME"
-        sudo chmod +x "$INSTALL_PATH/$PROGRAM_NAME"
+        SUDO="sudo"
+    fi
+
+    $SUDO rm -rf "$INSTALL_PATH/$PROGRAM_NAME"
+    rm -rf "$APP_DIR"
+    if [ -d "$PROGRAM_NAME" ]; then
+        # One-dir release: keep the executable next to its libraries and link it
+        mkdir -p "$(dirname "$APP_DIR")"
+        mv "$PROGRAM_NAME" "$APP_DIR"
+        chmod +x "$APP_DIR/$PROGRAM_NAME"
+        $SUDO ln -s "$APP_DIR/$PROGRAM_NAME" "$INSTALL_PATH/$PROGRAM_NAME"
     else
-        rm -rf "$INSTALL_PATH/$PROGRAM_NAME"
-        mv "$PROGRAM_NAME" "$INSTALL_PATH/$PROGRAM_NAME"
-        chmod +x "$INSTALL_PATH/$PROGRAM_NAME"
+        $SUDO mv "$PROGRAM_NAME" "$INSTALL_PATH/$PROGRAM_NAME"
+        $SUDO chmod +x "$INSTALL_PATH/$PROGRAM_NAME"
     fi
 
     if [[ ! -f "$PROGRAM_DIR/config.json" || -f "igem-cdn-config.json" ]]; then
@@ -74,6 +83,7 @@ uninstall_program() {
     else
         rm -rf "$INSTALL_PATH/$PROGRAM_NAME"
     fi
+    rm -rf "$APP_DIR"
     rm -rf "$PROGRAM_DIR"
     echo "iGEM CDN Tool uninstalled successfully!"
 }
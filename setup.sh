@@ -3,6 +3,10 @@
 INSTALL_PATH="$HOME/.local/bin"
 PROGRAM_NAME="igem-cdn"
 PROGRAM_DIR="$HOME/.local/share/igem"
+APP_DIR="$HOME/.local/lib/$PROGRAM_NAME"
+# onefile: a single executable that unpacks itself into a temp dir on every run
+# onedir: an executable next to its libraries, which starts without unpacking
+BUILD_MODE="${2:-onedir}"
 
 ensure_install_path() {
     if [ ! -d "$INSTALL_PATH" ]; then
@@ -30,11 +34,19 @@ install_program() {
     fi
 
     rm -rf $INSTALL_PATH/$PROGRAM_NAME
+    rm -rf $APP_DIR
     rm -rf $PROGRAM_DIR
-    cp ./dist/$PROGRAM_NAME $INSTALL_PATH/$PROGRAM_NAME
+    if [ -d ./dist/$PROGRAM_NAME ]; then
+        mkdir -p "$(dirname $APP_DIR)"
+        cp -r ./dist/$PROGRAM_NAME $APP_DIR
+        chmod +x $APP_DIR/$PROGRAM_NAME
+        ln -s $APP_DIR/$PROGRAM_NAME $INSTALL_PATH/$PROGRAM_NAME
+    else
+        cp ./dist/$PROGRAM_NAME $INSTALL_PATH/$PROGRAM_NAME
+        chmod +x $INSTALL_PATH/$PROGRAM_NAME
+    fi
     mkdir $PROGRAM_DIR
     cp config.json $PROGRAM_DIR/config.json
-    chmod +x $INSTALL_PATH/$PROGRAM_NAME
     
     ensure_path
 
@@ -48,6 +60,7 @@ install_program() {
 
 uninstall_program() {
     rm -rf $INSTALL_PATH/$PROGRAM_NAME
+    rm -rf $APP_DIR
     rm -rf $PROGRAM_DIR
     echo "iGEM CDN Tool uninstalled successfully!"
 }
@@ -59,7 +72,17 @@ build_program() {
         echo "Virtual environment not found, using system packages."
     fi
     
-    python -m PyInstaller main.py --name $PROGRAM_NAME --hidden-import=_cffi_backend -F --clean --strip
+    if [ "$BUILD_MODE" == "onefile" ]; then
+        MODE_FLAG="-F"
+    elif [ "$BUILD_MODE" == "onedir" ]; then
+        MODE_FLAG="-D"
+    else
+        echo "Unknown build mode '$BUILD_MODE', use 'onedir' or 'onefile'."
+        exit 1
+    fi
+
+    rm -rf ./dist/$PROGRAM_NAME
+    python -m PyInstaller main.py --name $PROGRAM_NAME --hidden-import=_cffi_backend $MODE_FLAG --clean --strip
 }
 
 if [ "$1" == "uninstall" ]; then
@@ -71,4 +94,5 @@ elif [ "$1" == "build" ]; then
     build_program
 else
     echo "Please specify the action you want to perform: 'install' or 'uninstall'."
+    echo "'build' and 'install' take an optional build mode: 'onedir' (default) or 'onefile'."
 fi
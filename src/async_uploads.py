@@ -0,0 +1,667 @@
+import asyncio
+import httpx
+import os
+import re
+import time
+from typing import TYPE_CHECKING
+import warnings
+from tqdm import tqdm
+from src.uploads import (
+    CHUNK_SIZE,
+    STATIC_HEADERS,
+    TIMEOUT,
+    BaseSession,
+    byte_progress,
+    check_parameter,
+    folder_levels,
+    listing_contents,
+    local_size,
+    next_page,
+    part_write_mode,
+    read_team_id,
+    remote_size,
+    resume_request,
+)
+from src.transfer import DEFAULT_JOBS, PENDING_TRANSFERS, SMALL_FILE_SIZE, AsyncSizeLanes, small_lane_workers
+from src.pool import AsyncConnectionPool, DEFAULT_API_POOL, static_pool_defaults
+from src.cache import AsyncListingCache
+from src.journal import Journal
+from src.stats import Recorder
+from src.auth_cache import EXPIRED_STATUS, SessionCache
+from src.throttle import (
+    AsyncAdaptiveConcurrency,
+    AsyncByteBudget,
+    DEFAULT_INFLIGHT_MB,
+    MAX_RETRIES,
+    RETRY_STATUSES,
+    THROTTLE_STATUSES,
+    retry_delay,
+)
+
+if TYPE_CHECKING:
+    from src.optimize import Optimizer
+
+
+# Characters a multipart filename parameter escapes, as httpx does
+FORM_ESCAPES = {'"': "%22", "\\": "\\\\", **{chr(c): f"%{c:02X}" for c in range(0x20) if c != 0x1B}}
+FORM_ESCAPES_RE = re.compile("|".join(re.escape(c) for c in FORM_ESCAPES))
+
+
+class FileBody:
+    """The multipart/form-data body of a file upload, read from disk in worker threads.
+
+    httpx reads the files of a multipart body with blocking calls on the
+    event loop, which stalls every other coroutine while a large file goes
+    out. This body reads its file chunk by chunk through asyncio.to_thread
+    instead. Iterating it again starts over, so a retried request resends it.
+    """
+
+    def __init__(self, field: str, file_path: str, file_name: str, mime_type: str | None, size: int):
+        """Create the body.
+
+        Args:
+            field (str): The form field name.
+            file_path (str): The file to send.
+            file_name (str): The file name to send it under.
+            mime_type (str | None): Its content type, if known.
+            size (int): Its size in bytes.
+        """
+        boundary = os.urandom(16).hex()
+        file_name = FORM_ESCAPES_RE.sub(lambda match: FORM_ESCAPES[match.group(0)], file_name)
+        head = f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{file_name}"\r\n'
+        if mime_type is not None:
+            head += f"Content-Type: {mime_type}\r\n"
+        self.head = (head + "\r\n").encode()
+        self.tail = f"\r\n--{boundary}--\r\n".encode()
+        self.file_path = file_path
+        self.headers = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(self.head) + size + len(self.tail)),
+        }
+
+    async def __aiter__(self):
+        yield self.head
+        file = await asyncio.to_thread(open, self.file_path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(file.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            file.close()
+        yield self.tail
+
+
+async def _aiter(items):
+    """Iterate over a plain or an asynchronous iterable."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class AsyncSession(BaseSession):
+    """Asyncio counterpart of Session, built on httpx.AsyncClient.
+
+    It offers the same operations as Session. Parallel transfers are
+    coroutines limited by a semaphore of ``jobs`` slots instead of worker
+    threads. Use it as an async context manager, or call ``aclose`` when done.
+    """
+
+    def __init__(
+        self,
+        jobs: int = DEFAULT_JOBS,
+        api_pool: dict = None,
+        static_pool: dict = None,
+        optimizer: "Optimizer" = None,
+        recorder: Recorder = None,
+        max_inflight_mb: float = DEFAULT_INFLIGHT_MB,
+    ):
+        """Create a session.
+
+        Args:
+            jobs (int, optional): Number of parallel transfers. Defaults to DEFAULT_JOBS.
+            api_pool (dict, optional): Connection pool settings for api.igem.org.
+            static_pool (dict, optional): Connection pool settings for static.igem.wiki,
+                over a connection per transfer, see static_pool_defaults.
+            optimizer (Optimizer, optional): Transcodes assets in upload_files before they are sent.
+            recorder (Recorder, optional): Receives the timing of every request and retry.
+            max_inflight_mb (float, optional): Cap on the size of the files being uploaded at once,
+                in MiB. Defaults to DEFAULT_INFLIGHT_MB.
+        """
+        self.jobs = max(1, int(jobs))
+        super().__init__(
+            AsyncConnectionPool(api_pool, DEFAULT_API_POOL),
+            AsyncConnectionPool(static_pool, static_pool_defaults(self.jobs), headers=STATIC_HEADERS),
+            optimizer,
+            recorder,
+        )
+        self._slots = asyncio.Semaphore(self.jobs)
+        self.listings = AsyncListingCache()
+        self.limiter = AsyncAdaptiveConcurrency(self.jobs, reserved=small_lane_workers(self.jobs))
+        self.upload_budget = AsyncByteBudget(max_inflight_mb * 1024 * 1024)
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Save the download validators, close the catalog and the HTTP connection pools."""
+        self.validators.save()
+        self.catalog.close()
+        await self.client.aclose()
+        await self.static.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data: dict = None,
+        files: dict = None,
+        large: bool = False,
+        content=None,
+        headers: dict = None,
+    ) -> httpx.Response:
+        """Make an HTTP request to the specified URL, see Session._request.
+
+        ``content`` and ``headers`` are passed on to httpx, e.g. a FileBody and its headers.
+        """
+        self._check_logged_in()
+        generation = self._auth_generation
+        response = await self._send(method, url, params, data, files, large, content, headers)
+        if response.status_code == EXPIRED_STATUS and self._credentials is not None:
+            async with self._auth_lock:
+                sign_in = self._claim_sign_in(generation)
+                if sign_in:
+                    await self._sign_in(*self._credentials)
+            if sign_in is None:
+                return response
+            response = await self._send(method, url, params, data, files, large, content, headers)
+        return response
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data: dict = None,
+        files: dict = None,
+        large: bool = False,
+        content=None,
+        headers: dict = None,
+    ) -> httpx.Response:
+        """Send a request through the adaptive concurrency limiter, see Session._send."""
+        for attempt in range(MAX_RETRIES + 1):
+            await self.limiter.acquire(large)
+            start = time.monotonic()
+            latency = None
+            throttled = False
+            # Exactly one release per acquire, whatever ends the attempt
+            try:
+                response = await self.client.request(
+                    method,
+                    url,
+                    params=params,
+                    data=data,
+                    files=files,
+                    content=content,
+                    headers=headers,
+                    timeout=TIMEOUT,
+                )
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    latency = time.monotonic() - start
+                    return response
+                throttled = response.status_code in THROTTLE_STATUSES
+                reason, retry_after = response.status_code, response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                throttled = isinstance(e, httpx.TimeoutException)
+                if attempt == MAX_RETRIES:
+                    raise
+                reason, retry_after = e, None
+            finally:
+                await self.limiter.release(latency=latency, throttled=throttled, large=large)
+            delay = retry_delay(attempt, retry_after)
+            if self.recorder is not None:
+                self.recorder.retry(reason, attempt, delay)
+            await asyncio.sleep(delay)
+
+    async def _request_team_id(self) -> str:
+        response = await self.client.get(
+            "https://api.igem.org/v1/teams/memberships/mine",
+            params={"onlyAcceptedTeams": True},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return read_team_id(response.json())
+
+    async def login(self, username: str, password: str, cache: SessionCache = None) -> None:
+        """Log in to the iGEM API.
+
+        Args:
+            username (str): Your username.
+            password (str): Your password.
+            cache (SessionCache, optional): Where to reuse and keep the signed-in session.
+
+        Raises:
+            Warning: If the credentials are invalid.
+        """
+        if not self._restore_session(username, password, cache):
+            await self._sign_in(username, password)
+
+    async def _sign_in(self, username: str, password: str) -> None:
+        """Sign in and look up the team, see Session._sign_in."""
+        data = {"identifier": username, "password": password}
+        try:
+            print("Logging in...")
+            response = await self.client.post(
+                "https://api.igem.org/v1/auth/sign-in", data=data, timeout=TIMEOUT
+            )
+            self._check_sign_in(response)
+            self._signed_in(username, await self._request_team_id())
+        except httpx.HTTPStatusError as http_err:
+            self._sign_in_failed(f"HTTP error occurred: {http_err}")
+        except httpx.RequestError as req_err:
+            self._sign_in_failed(f"Request failed: {req_err}")
+
+    async def query(self, directory: str = "", output: bool = True) -> list:
+        """Query files and directories in a specific directory.
+
+        Args:
+            directory (str, optional): The directory to query. Defaults to the root directory.
+            output (bool, optional): Whether to print the query result. Defaults to True.
+
+        Returns:
+            list: A list of files, each represented as a dictionary, from every page of the listing.
+        """
+        items, page = await self.listing_page(directory)
+        if items is None:
+            return []
+        if page is not None:
+            items = items + [item async for item in self.listing_items(directory, page)]
+        return self._query_result(directory, items, output)
+
+    async def listing_page(self, directory: str, page: dict = None) -> tuple[list | None, dict | None]:
+        """Fetch one page of a directory listing, see Session.listing_page."""
+        check_parameter(directory)
+        if page is None:
+            res = await self.listings.get(
+                directory.strip("/"), lambda: self._fetch_listing(directory), keep=lambda res: next_page(res) is None
+            )
+        else:
+            res = await self._fetch_listing(directory, page)
+        if res is None:
+            return None, None
+        return listing_contents(res, directory, self.team_id, False), next_page(res)
+
+    async def listing_items(self, directory: str, page: dict = None):
+        """Iterate over the items of a directory listing page by page, see Session.listing_items.
+
+        The next page is requested in a task while the current one is consumed.
+        """
+        items, page = await self.listing_page(directory, page)
+        while True:
+            prefetch = asyncio.ensure_future(self.listing_page(directory, page)) if page is not None else None
+            try:
+                for item in items or []:
+                    yield item
+                if prefetch is None:
+                    return
+                items, page = await prefetch
+            finally:
+                if prefetch is not None and not prefetch.done():
+                    prefetch.cancel()
+
+    async def _fetch_listing(self, directory: str, page: dict = None) -> dict | None:
+        response = await self._request("GET", self._team_url(), params=self._listing_params(directory, page))
+        return self._take_listing(directory, page, response)
+
+    async def locate(self, remote_path: str, output: bool = False) -> str | None:
+        """Look up the URL of a remote file, see Session.locate."""
+        url = self.catalog.url(self.team_id, remote_path)
+        if url is None:
+            async for _ in self.listing_items(os.path.dirname(remote_path.strip("/"))):
+                pass
+            url = self.catalog.url(self.team_id, remote_path)
+        if output:
+            print(url if url is not None else f"'{remote_path}' not found")
+        return url
+
+    async def search(self, pattern: str, directory: str = "", output: bool = False) -> list:
+        """Refresh the catalog below a glob and match it, see Session.search."""
+        async for _ in self.crawl(*self._search_scope(pattern, directory)):
+            pass
+        return self._search_matches(pattern, directory, output)
+
+    async def crawl(self, directory: str = "", recursive: bool = True):
+        """Walk a remote directory breadth first, listing sibling folders concurrently.
+
+        Args:
+            directory (str, optional): The directory to walk. Defaults to the root directory.
+            recursive (bool, optional): Whether to descend into subfolders. Defaults to True.
+
+        Yields:
+            tuple: (parent directory, item) for every file and folder found.
+        """
+        pending = {asyncio.ensure_future(self.listing_page(directory)): directory}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    current_dir = pending.pop(task)
+                    items, page = task.result()
+                    if page is not None:
+                        # Request the next page while this one is handed out
+                        pending[asyncio.ensure_future(self.listing_page(current_dir, page))] = current_dir
+                    for item in items or []:
+                        if item["Type"] == "Folder" and recursive:
+                            sub_dir = item["Prefix"].split(f"teams/{self.team_id}/")[1].rstrip("/")
+                            pending[asyncio.ensure_future(self.listing_page(sub_dir))] = sub_dir
+                        yield current_dir, item
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def list_files(self, directory: str = "", recursive: bool = False) -> list:
+        """List the files in a remote directory, see Session.list_files."""
+        return [
+            (current_dir, item)
+            async for current_dir, item in self.crawl(directory, recursive)
+            if item["Type"] != "Folder"
+        ]
+
+    async def _map(self, fn, items, pbar: tqdm) -> None:
+        """Await ``fn(*args)`` for every argument tuple, at most ``jobs`` at a time.
+
+        Args:
+            fn (callable): A coroutine function.
+            items (iterable): Argument tuples, plain or asynchronous. It is
+                consumed lazily, so work starts while it is still being produced.
+            pbar (tqdm): Progress bar, its total grows as items arrive.
+        """
+        async def run(args):
+            try:
+                await fn(*args)
+            finally:
+                pbar.update(1)
+                self._slots.release()
+
+        async with asyncio.TaskGroup() as group:
+            async for args in _aiter(items):
+                await self._slots.acquire()
+                pbar.total += 1
+                pbar.refresh()
+                group.create_task(run(args))
+
+    async def _map_by_size(self, fn, lanes: AsyncSizeLanes, tasks=None, fits=None) -> None:
+        """Await ``fn(*args)`` for every transfer of ``lanes``, at most ``jobs`` at a time.
+
+        Like TransferExecutor.map_by_size, one runner per job takes the
+        transfers largest first, some of them from the small-file lane first,
+        while ``tasks`` is still adding to the lanes.
+
+        Args:
+            fn (callable): A coroutine function.
+            lanes (AsyncSizeLanes): The transfers.
+            tasks (iterable, optional): (argument tuple, size) pairs, plain or asynchronous,
+                to add to the lanes, after which the lanes are closed. Without it,
+                ``lanes`` must already be closed.
+            fits (callable, optional): Passed on to SizeLanes.pop.
+        """
+        async def run(small_first):
+            while (item := await lanes.pop(small_first, fits)) is not None:
+                await fn(*item[1])
+
+        small_workers = small_lane_workers(self.jobs)
+        async with asyncio.TaskGroup() as group:
+            for i in range(self.jobs):
+                group.create_task(run(i < small_workers))
+            if tasks is not None:
+                try:
+                    async for task, size in _aiter(tasks):
+                        await lanes.add(task, size)
+                        await asyncio.sleep(0)  # A plain iterable would otherwise fill the lanes before any runner starts
+                finally:
+                    await lanes.close()
+
+    async def upload_file(
+        self, file_path: str, dest_dir: str = "", output: bool = False
+    ) -> str:
+        """Upload a file to a specific remote directory, see Session.upload_file."""
+        path_to_file, mime_type, size = self._upload_source(file_path, dest_dir)
+        large = size >= SMALL_FILE_SIZE
+        if large:
+            await self.upload_budget.acquire(size)
+        body = FileBody("file", file_path, path_to_file.name, mime_type, size)
+        try:
+            res = await self._request(
+                "POST",
+                self._team_url(),
+                params=self._directory_params(dest_dir),
+                large=large,
+                content=body,
+                headers=body.headers,
+            )
+        finally:
+            if large:
+                await self.upload_budget.release(size)
+        return self._uploaded(res, dest_dir, path_to_file, size, output)
+
+    async def upload_files(self, files, journal: Journal = None) -> dict:
+        """Upload many files concurrently, see Session.upload_files."""
+        urls = {}
+        upload_paths = {}
+        if self.optimizer is not None:
+            files = list(files)
+            upload_paths = await asyncio.to_thread(
+                self.optimizer.optimize_many, [file_path for file_path, _ in files]
+            )
+
+        async def sized(tasks):
+            async for file_path, remote_dir_path in _aiter(tasks):
+                url = self._plan_upload(journal, file_path, remote_dir_path)
+                if url is not None:
+                    urls[file_path] = url
+                    continue
+                size = local_size(upload_paths.get(file_path, file_path))
+                pbar.total += size
+                pbar.refresh()
+                yield (file_path, remote_dir_path, size), size
+
+        async def upload(file_path, remote_dir_path, size):
+            url = None
+            error = "upload failed"
+            try:
+                url = await self.upload_file(
+                    upload_paths.get(file_path, file_path), remote_dir_path, False
+                )
+                if url is not None:
+                    urls[file_path] = url
+            except (Exception, SystemExit) as e:
+                print(f"Error uploading '{file_path}': {e}")
+                error = str(e) or type(e).__name__
+            finally:
+                self._record(journal, os.path.abspath(file_path), url is not None, error, url=url)
+                pbar.update(size)
+
+        with byte_progress(0, "Uploading files") as pbar:
+            await self._map_by_size(
+                upload, AsyncSizeLanes(max_pending=PENDING_TRANSFERS), sized(files), self.upload_budget.fits
+            )
+        return urls
+
+    async def upload_dir(self, local_dir: str, dest_dir: str = "", recursive: bool = False, resume: bool = False) -> list:
+        """Upload the contents of a directory, see Session.upload_dir.
+
+        Returns:
+            list: The file URLs of the uploaded files.
+        """
+        planned = self._upload_tasks(local_dir, dest_dir, recursive)
+        if planned is None:
+            return []
+        remote_base_dir, upload_tasks = planned
+
+        with self._upload_journal(local_dir, remote_base_dir, resume) as journal:
+            urls = await self.upload_files(upload_tasks, journal)
+
+        print(f"Uploaded {len(urls)} files to '{os.path.join(dest_dir, '')}'\n")
+        return list(urls.values())
+
+    async def delete_file(self, filename: str, directory: str = "", output: bool = False) -> bool:
+        """Delete a file in a specific directory, see Session.delete_file."""
+        self._check_directory(directory)
+        res = await self._request("DELETE", self._team_url(filename), params=self._directory_params(directory))
+        return self._deleted(res, directory, filename, output)
+
+    async def delete_dir(self, directory: str, recursive: bool = False, resume: bool = False) -> list:
+        """Delete a directory by deleting its contents, see Session.delete_dir."""
+        self._check_delete_root(directory)
+
+        if not (await self.listing_page(directory))[0]:
+            warnings.warn(f"Directory '{directory}' is empty")
+            return []
+
+        folders = []
+        failed = []
+        successful_deletions = 0
+
+        async def delete(current_dir, item):
+            nonlocal successful_deletions
+            key = os.path.join(current_dir, item["Name"])
+            error = "delete failed"
+            try:
+                deleted = await self.delete_file(item["Name"], current_dir, False)
+            except (Exception, SystemExit) as e:
+                print(f"Error deleting '{key}': {e}")
+                deleted = False
+                error = str(e) or type(e).__name__
+            self._record(journal, key, deleted, error)
+            if deleted:
+                successful_deletions += 1
+            else:
+                failed.append((current_dir, item))
+
+        async def file_items():
+            async for current_dir, item in self.crawl(directory, recursive):
+                if self._plan_delete(journal, folders, recursive, current_dir, item):
+                    yield current_dir, item
+
+        with (
+            self._delete_journal(directory, resume) as journal,
+            tqdm(total=0, desc="Deleting directory", unit="item") as pbar,
+        ):
+            await self._map(delete, file_items(), pbar)
+
+            for level in folder_levels(folders):
+                await self._map(delete, self._ready_folders(journal, level, failed), pbar)
+
+        self._print_deleted(directory, successful_deletions, failed)
+        return failed
+
+    async def download_file(
+        self, file_url: str, target_dir: str = "", output: bool = False, item: dict = None
+    ) -> bool:
+        """Download a single file from a URL, see Session.download_file."""
+        file_url, file_path, part_path = self._download_paths(file_url, target_dir)
+        entry, up_to_date = self._up_to_date(file_path, file_url, item, output)
+        if up_to_date:
+            return True
+
+        try:
+            response = await self._download_to_part(
+                file_url, part_path, self.validators.headers(entry) if entry else None
+            )
+        except httpx.RequestError as e:
+            print(f"Request failed: {e}")
+            return False
+        return self._downloaded(response, file_url, file_path, part_path, item, output)
+
+    async def _download_to_part(
+        self, file_url: str, part_path: str, conditional: dict = None
+    ) -> httpx.Response | None:
+        """Stream a file into ``part_path``, see Session._download_to_part."""
+        while True:
+            offset, info, headers = resume_request(part_path, conditional)
+            async with self.static.stream("GET", file_url, headers=headers, timeout=TIMEOUT) as response:
+                mode = part_write_mode(response, part_path, offset, info)
+                if mode == "complete":
+                    return None
+                if mode == "restart":
+                    continue
+                if mode is None:
+                    return response
+                # Disk writes go to a worker thread, so other transfers keep going meanwhile
+                file = await asyncio.to_thread(open, part_path, mode)
+                try:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        await asyncio.to_thread(file.write, chunk)
+                finally:
+                    await asyncio.to_thread(file.close)
+                return response
+
+    async def download_files(self, files, journal: Journal = None) -> list:
+        """Download many files concurrently, see Session.download_files.
+
+        Args:
+            files (iterable): (file URL, local target directory) pairs or triples
+                with the listing item, plain or asynchronous. It is consumed lazily,
+                so downloads start while it is still being produced.
+            journal (Journal, optional): Records every download; the files it has
+                as done are not requested again.
+
+        Returns:
+            list: The URLs of the files that are up to date locally.
+        """
+        downloaded = []
+
+        async def sized(tasks):
+            async for task in _aiter(tasks):
+                if not self._plan_download(journal, task):
+                    downloaded.append(task[0])
+                    continue
+                item = task[2] if len(task) > 2 else None
+                pbar.total += remote_size(item)
+                pbar.refresh()
+                yield (*task[:2], item), remote_size(item)
+
+        async def download(file_url, dir_path, item):
+            done = False
+            error = "download failed"
+            try:
+                os.makedirs(dir_path, exist_ok=True)
+                done = await self.download_file(file_url, dir_path, False, item)
+                if done:
+                    downloaded.append(file_url)
+            except (Exception, SystemExit) as e:
+                print(f"Error downloading '{file_url}': {e}")
+                error = str(e) or type(e).__name__
+            finally:
+                self._record(journal, file_url, done, error)
+                pbar.update(remote_size(item))
+
+        with byte_progress(0, "Downloading files") as pbar:
+            await self._map_by_size(download, AsyncSizeLanes(max_pending=PENDING_TRANSFERS), sized(files))
+        self.validators.save()
+        return downloaded
+
+    async def download_dir(
+        self, remote_dir: str = "", target_dir: str = "server", recursive: bool = False, resume: bool = False
+    ) -> None:
+        """Download a directory and its subdirectories to the local file system."""
+        if not (await self.listing_page(remote_dir))[0]:
+            print(f"Directory '{remote_dir}' is empty")
+            return
+
+        async def remote_files():
+            async for directory, item in self.crawl(remote_dir, recursive):
+                if item["Type"] != "Folder":
+                    yield item["Location"], f"{target_dir}/{directory}", item
+
+        with self._download_journal(remote_dir, target_dir, resume) as journal:
+            downloaded = await self.download_files(remote_files(), journal)
+
+        remote_dir = remote_dir if remote_dir != "" else "/"
+        print(f"Downloaded {len(downloaded)} files in '{os.path.join(remote_dir, "")}'\n")
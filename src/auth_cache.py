@@ -0,0 +1,107 @@
+import json
+import os
+import time
+from typing import TYPE_CHECKING
+
+# httpx is only needed for type hints here, so reading the cache (query
+# --offline) does not import it
+if TYPE_CHECKING:
+    import httpx
+
+
+SESSION_CACHE_NAME = "session.json"
+# A 403 is a request the account may not make, which signing in again would not change
+EXPIRED_STATUS = 401
+
+
+class SessionCache:
+    """Signed-in session state kept on disk between CLI invocations.
+
+    Stores the cookies, team ID and static URL prefix of one account, never
+    the password. The file is only readable by its owner.
+    """
+
+    def __init__(self, path: str):
+        """Create the cache.
+
+        Args:
+            path (str): The cache file, usually next to the config file.
+        """
+        self.path = path
+
+    def load(self, username: str) -> dict | None:
+        """Read the saved session of ``username``.
+
+        Args:
+            username (str): The account the session must belong to.
+
+        Returns:
+            dict | None: The saved "team_id", "url" and "cookies", or None if
+            there is no saved session for this account or all its cookies expired.
+        """
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if saved.get("username") != username:
+            return None
+        now = time.time()
+        saved["cookies"] = [
+            cookie for cookie in saved.get("cookies", [])
+            if cookie.get("expires") is None or cookie["expires"] > now
+        ]
+        if not saved["cookies"]:
+            return None
+        return saved
+
+    def team_id(self, username: str):
+        """The team ID saved for ``username``, even if its cookies expired, or None."""
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return saved.get("team_id") if saved.get("username") == username else None
+
+    def save(self, username: str, team_id, url: str, cookies: "httpx.Cookies") -> None:
+        """Write the session of ``username``, replacing any previous one.
+
+        Args:
+            username (str): The account the session belongs to.
+            team_id: The team ID.
+            url (str): The static URL prefix of the team.
+            cookies (httpx.Cookies): The cookies of the signed-in client.
+        """
+        data = {
+            "username": username,
+            "team_id": team_id,
+            "url": url,
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "expires": cookie.expires,
+                }
+                for cookie in cookies.jar
+            ],
+        }
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def restore_cookies(cookies: "httpx.Cookies", saved: list) -> None:
+    """Put saved cookies back into a client's cookie jar."""
+    for cookie in saved:
+        cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
@@ -0,0 +1,217 @@
+import json
+import os
+import posixpath
+import sys
+import threading
+import time
+from concurrent.futures import wait
+from pathlib import Path
+from src.crawler import crawl
+from src.uploads import Session
+from src.walk import walk_local
+
+
+OPS = ("upload", "download", "delete")
+
+
+def read_operations(stream):
+    """Parse a JSON lines stream of operations, one per line.
+
+    Blank lines and lines starting with '#' are skipped. The stream is read
+    lazily, so operations piped in on stdin start while more are arriving.
+
+    Args:
+        stream (file): The open operations file or stdin.
+
+    Yields:
+        tuple: (line number, operation dict, or the error message if the line is invalid).
+    """
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"invalid JSON: {e}"
+            continue
+        if not isinstance(op, dict) or op.get("op") not in OPS:
+            yield number, f"'op' must be one of {', '.join(OPS)}"
+        elif op["op"] in ("download", "delete") and not op.get("remote"):
+            yield number, f"{op['op']} needs 'remote'"
+        elif op["op"] == "upload" and not op.get("local"):
+            yield number, "upload needs 'local'"
+        else:
+            yield number, op
+
+
+def is_directory_operation(op: dict) -> bool:
+    """Whether an operation transfers a directory: an upload of a local
+    directory, or a download of a remote path ending in '/'."""
+    if op["op"] == "upload":
+        return os.path.isdir(op["local"])
+    return op["op"] == "download" and op["remote"].endswith("/")
+
+
+def file_operations(client: Session, op: dict, local_root: str):
+    """Split a directory upload or download into the operations of its files.
+
+    Like ``upload`` and ``download`` on the command line, a directory upload
+    goes to ``remote`` (default: a remote directory named like the local one),
+    skipping what walk_local skips, and a directory download keeps the remote
+    paths under ``local`` (default: the local root). Subdirectories are only
+    included with ``"recursive": true``.
+
+    Yields:
+        dict: One upload or download operation per file, for run_operation.
+    """
+    recursive = bool(op.get("recursive"))
+    if op["op"] == "upload":
+        remote_base = (op.get("remote") or "").strip("/") or Path(op["local"]).name
+        for file_path, relative_dir in walk_local(op["local"], recursive):
+            remote = posixpath.normpath(posixpath.join(remote_base, relative_dir.replace(os.sep, "/")))
+            yield {"op": "upload", "local": file_path, "remote": "" if remote == "." else remote}
+    else:
+        remote_dir = op["remote"]
+        if remote_dir.startswith(client.url):
+            remote_dir = remote_dir[len(client.url):]
+        target_dir = op.get("local") or local_root
+        for directory, item in crawl(client, remote_dir.strip("/"), recursive, client.executor.jobs):
+            if item["Type"] != "Folder":
+                yield {"op": "download", "remote": item["Location"], "local": os.path.join(target_dir, directory)}
+
+
+def run_operation(client: Session, op: dict, local_root: str) -> dict:
+    """Run one operation of a batch.
+
+    - upload: ``local`` is a local file, ``remote`` the remote directory (default root).
+    - download: ``remote`` is a remote file path or URL, ``local`` the target
+      directory (default: its place under the local root).
+    - delete: ``remote`` is a remote file path.
+
+    Directory uploads and downloads are split up first, see file_operations.
+
+    Returns:
+        dict: The fields to add to the operation's result, raising on failure.
+
+    Raises:
+        ValueError: If the operation failed.
+    """
+    match op["op"]:
+        case "upload":
+            local_path = op["local"]
+            if not os.path.isfile(local_path):
+                raise ValueError(f"no such file: '{local_path}'")
+            if client.optimizer is not None:
+                local_path = client.optimizer.optimize(local_path)
+            url = client.upload_file(local_path, (op.get("remote") or "").strip("/"))
+            if url is None:
+                raise ValueError("upload failed")
+            return {"url": url}
+        case "download":
+            remote = op["remote"]
+            if remote.startswith(client.url):
+                remote = remote[len(client.url):]
+            remote = remote.lstrip("/")
+            target_dir = op.get("local") or os.path.join(local_root, os.path.dirname(remote))
+            os.makedirs(target_dir, exist_ok=True)
+            if not client.download_file(remote, target_dir):
+                raise ValueError("download failed")
+            return {"path": os.path.join(target_dir, os.path.basename(remote))}
+        case "delete":
+            remote = op["remote"].strip("/")
+            if not client.delete_file(os.path.basename(remote), os.path.dirname(remote)):
+                raise ValueError("delete failed")
+            return {}
+
+
+def run_batch(client: Session, stream, local_root: str, out=None) -> tuple[int, int]:
+    """Run every operation of a stream through the session's transfer executor.
+
+    Operations run in parallel, up to the session's job count, in one
+    logged-in session. One JSON line is written per operation as it
+    finishes, so results arrive in completion order; each carries the input
+    ``line`` number, ``op``, ``ok``, ``seconds`` and either the result
+    (``url``/``path``) or an ``error``.
+
+    A directory upload or download is queued as one task per file while
+    the directory is walked or crawled, see file_operations. Its single
+    result line follows the last of its files and gives the number of
+    ``files`` and how many ``failed``.
+
+    Args:
+        client (Session): A logged-in session.
+        stream (file): JSON lines operations, see read_operations.
+        local_root (str): The local root, for downloads without a ``local`` directory.
+        out (file, optional): Where to write the results. Defaults to stdout.
+
+    Returns:
+        tuple[int, int]: The number of operations that succeeded and failed.
+    """
+    out = out or sys.stdout
+    lock = threading.Lock()
+    counts = {True: 0, False: 0}
+
+    def report(result: dict) -> None:
+        with lock:
+            counts[result["ok"]] += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+    def task(number: int, op: dict) -> None:
+        result = {"line": number, "op": op["op"], "ok": True}
+        start = time.perf_counter()
+        try:
+            result.update(run_operation(client, op, local_root))
+        except SystemExit:
+            # The session gives up with exit() on some errors, end only this operation
+            result.update(ok=False, error="aborted, see the warning above")
+        except Exception as e:
+            result.update(ok=False, error=str(e))
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        report(result)
+
+    def directory_task(number: int, op: dict) -> None:
+        result = {"line": number, "op": op["op"], "ok": True, "files": 0, "failed": 0}
+        start = time.perf_counter()
+        pending = [1]  # The files still running, and the walk until it ends
+
+        def finished(future=None) -> None:
+            with lock:
+                if future is not None:
+                    result["files"] += 1
+                    result["failed"] += future.exception() is not None
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            if "error" in result:
+                pass
+            elif result["failed"]:
+                result.update(ok=False, error=f"{result['failed']} of {result['files']} files failed")
+            elif not result["files"]:
+                result.update(ok=False, error="no files found")
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            report(result)
+
+        try:
+            for file_op in file_operations(client, op, local_root):
+                with lock:
+                    pending[0] += 1
+                future = client.executor.submit(run_operation, client, file_op, local_root)
+                future.add_done_callback(finished)
+                futures.append(future)
+        except Exception as e:
+            result.update(ok=False, error=str(e))
+        finished()
+
+    futures = []
+    for number, op in read_operations(stream):
+        if isinstance(op, str):
+            report({"line": number, "op": None, "ok": False, "error": op})
+        elif is_directory_operation(op):
+            directory_task(number, op)
+        else:
+            futures.append(client.executor.submit(task, number, op))
+    wait(futures)
+
+    return counts[True], counts[False]
@@ -0,0 +1,128 @@
+import threading
+from concurrent.futures import Future
+
+
+class ListingCache:
+    """In-process cache of directory listings with single-flight fetches.
+
+    Concurrent callers asking for the same directory share one request.
+    Keys are remote directory paths without leading or trailing slashes.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, fetch, keep=None):
+        """Return the cached listing for ``key``, fetching it at most once.
+
+        Args:
+            key (str): The directory path.
+            fetch (callable): Called without arguments to fetch the listing.
+                A result of None (a failed fetch) is handed to the waiting
+                callers but not cached.
+            keep (callable, optional): Tells whether a fetched listing may be
+                cached, e.g. not the first page of a longer one. Defaults to keeping all.
+
+        Returns:
+            The listing returned by ``fetch``.
+        """
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generation
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            # Skip storing if something was invalidated while the request was in flight
+            if value is not None and generation == self._generation and (keep is None or keep(value)):
+                self._entries[key] = value
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: str, subtree: bool = False) -> None:
+        """Drop the listing of ``key`` and of all its parent directories.
+
+        Args:
+            key (str): The directory whose contents changed.
+            subtree (bool, optional): Whether to drop the listings below ``key`` too.
+        """
+        key = key.strip("/")
+        with self._lock:
+            self._generation += 1
+            parts = key.split("/") if key else []
+            for i in range(len(parts) + 1):
+                self._entries.pop("/".join(parts[:i]), None)
+            if subtree:
+                prefix = key + "/" if key else ""
+                for cached in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[cached]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class AsyncListingCache(ListingCache):
+    """ListingCache for asyncio code, where ``fetch`` returns a coroutine."""
+
+    async def get(self, key: str, fetch, keep=None):
+        """Return the cached listing for ``key``, awaiting ``fetch()`` at most once.
+
+        Args:
+            key (str): The directory path.
+            fetch (callable): Called without arguments, returns a coroutine
+                that fetches the listing. None results are not cached.
+            keep (callable, optional): See ListingCache.get.
+
+        Returns:
+            The listing returned by ``fetch``.
+        """
+        import asyncio
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                generation = self._generation
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            value = await fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        with self._lock:
+            del self._inflight[key]
+            if value is not None and generation == self._generation and (keep is None or keep(value)):
+                self._entries[key] = value
+        future.set_result(value)
+        return value
@@ -0,0 +1,328 @@
+import json
+import os
+import re
+import threading
+import time
+
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "igem-cdn",
+    "catalog.sqlite3",
+)
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    team TEXT NOT NULL,
+    path TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    key TEXT,
+    location TEXT,
+    size INTEGER,
+    modified TEXT,
+    item TEXT NOT NULL,
+    PRIMARY KEY (team, path)
+);
+CREATE INDEX IF NOT EXISTS items_directory ON items (team, directory);
+CREATE TABLE IF NOT EXISTS listed (
+    team TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    listed_at REAL NOT NULL,
+    PRIMARY KEY (team, directory)
+);
+"""
+PATH_END = "\U0010ffff"  # Sorts after any character, for prefix range scans
+
+
+def glob_regex(pattern: str) -> re.Pattern:
+    """Compile a glob over remote paths.
+
+    ``*`` and ``?`` stay within one directory, ``**/`` matches any number of
+    directories (including none) and ``[...]`` matches one character of a set.
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            out.append("[" + chars.replace("\\", "\\\\").replace("[", "\\[") + "]")
+            i = end + 1
+            continue
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def glob_base(pattern: str) -> str:
+    """The directory part of a glob before its first wildcard, e.g. 'assets' for 'assets/**/*.png'."""
+    literal = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+    return literal.rsplit("/", 1)[0] if "/" in literal else ""
+
+
+def glob_escape(path: str) -> str:
+    """Quote the wildcard characters of a path, so that a glob matches it literally."""
+    return re.sub(r"([*?\[])", r"[\1]", path)
+
+
+def print_matches(matches: list, pattern: str) -> None:
+    """Print the (path, item) pairs found by a glob as a table."""
+    import prettytable as pt
+
+    table = pt.PrettyTable()
+    table.field_names = ["Type", "Path", "FileURL"]
+    for path, item in matches:
+        table.add_row(["File-" + item["Type"], path, item["Location"]])
+    if matches:
+        print(table)
+    print(f"'{pattern}' found: {len(matches)}")
+
+
+class Catalog:
+    """Persistent index of the remote tree, kept in SQLite.
+
+    Every directory listing the session fetches replaces that directory's
+    rows, so the catalog is refreshed one prefix at a time by normal use;
+    uploads and deletes update it as well. Rows keep the path, name, type,
+    key, URL, size and modification time of each file and folder, along with
+    the listing item itself, and the time every directory was last listed.
+    Lookups, directory queries and globs can then be answered without a
+    request. The database is opened on first use, so sessions that never
+    list a directory do not touch it.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        """Create the catalog.
+
+        Args:
+            path (str, optional): The SQLite file. Defaults to DEFAULT_CATALOG_PATH.
+        """
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Open the database on first use. Call with the lock held."""
+        if self._db is None:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            # Every listing is one small transaction; WAL keeps them cheap
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(CATALOG_SCHEMA)
+        return self._db
+
+    @staticmethod
+    def _row(team: str, directory: str, item: dict) -> tuple:
+        if item["Type"] == "Folder":
+            path = item["Prefix"].split(f"teams/{team}/")[-1].rstrip("/")
+        else:
+            path = f"{directory}/{item['Name']}" if directory else item["Name"]
+        return (
+            team,
+            path,
+            directory,
+            item["Name"],
+            item["Type"],
+            item.get("Key"),
+            item.get("Location"),
+            item.get("Size"),
+            item.get("LastModified"),
+            json.dumps(item),
+        )
+
+    def store(self, team_id, directory: str, listing: dict, first: bool = True, last: bool = True) -> None:
+        """Replace the entries of a directory with a fresh listing, one page at a time.
+
+        The first page drops the old entries; after the last one, everything
+        below subfolders that are no longer listed is dropped as well.
+
+        Args:
+            team_id: The team the listing belongs to.
+            directory (str): The directory that was listed.
+            listing (dict): The decoded listing response, or one page of it.
+            first (bool, optional): Whether this is the first page. Defaults to True.
+            last (bool, optional): Whether this is the last page. Defaults to True.
+        """
+        team = str(team_id)
+        directory = directory.strip("/")
+        items = list(listing.get("CommonPrefixes") or []) + list(listing.get("Contents") or [])
+        rows = [self._row(team, directory, item) for item in items]
+        prefix = directory + "/" if directory else ""
+        with self._lock:
+            db = self._open()
+            with db:
+                if first:
+                    db.execute("DELETE FROM items WHERE team = ? AND directory = ?", (team, directory))
+                db.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if not last:
+                    return
+                # Entries below subfolders that are no longer listed are gone too
+                folders = {
+                    path for (path,) in db.execute(
+                        "SELECT path FROM items WHERE team = ? AND directory = ? AND type = 'Folder'",
+                        (team, directory),
+                    )
+                }
+                below = db.execute(
+                    "SELECT substr(path, ?) FROM items WHERE team = ? AND path >= ? AND path < ? AND directory != ? "
+                    "UNION SELECT substr(directory, ?) FROM listed WHERE team = ? AND directory >= ? AND directory < ?",
+                    (len(prefix) + 1, team, prefix, prefix + PATH_END, directory,
+                     len(prefix) + 1, team, prefix, prefix + PATH_END),
+                ).fetchall()
+                for child in {rest.split("/", 1)[0] for (rest,) in below if rest}:
+                    if prefix + child not in folders:
+                        self._delete_below(db, team, prefix + child)
+                db.execute("INSERT OR REPLACE INTO listed VALUES (?, ?, ?)", (team, directory, time.time()))
+
+    @staticmethod
+    def _delete_below(db, team: str, path: str) -> None:
+        """Drop every row and listing under ``path``. Call inside a transaction."""
+        prefix = path + "/"
+        for table, column in (("items", "path"), ("listed", "directory")):
+            db.execute(
+                f"DELETE FROM {table} WHERE team = ? AND {column} >= ? AND {column} < ?",
+                (team, prefix, prefix + PATH_END),
+            )
+
+    def add_file(self, team_id, directory: str, name: str, url: str, size: int) -> None:
+        """Record a file that was just uploaded.
+
+        Args:
+            team_id: The team the file belongs to.
+            directory (str): Its remote directory.
+            name (str): Its file name.
+            url (str): The URL the upload returned.
+            size (int): Its size in bytes.
+        """
+        team = str(team_id)
+        directory = directory.strip("/")
+        path = f"{directory}/{name}" if directory else name
+        item = {
+            "Type": name.rsplit(".", 1)[-1].lower() if "." in name else "file",
+            "Name": name,
+            "Key": f"teams/{team}/{path}",
+            "Location": url,
+            "Size": size,
+            "LastModified": None,
+        }
+        with self._lock:
+            db = self._open()
+            with db:
+                db.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._row(team, directory, item))
+
+    def remove(self, team_id, path: str) -> None:
+        """Forget a deleted file or folder and everything below it."""
+        team = str(team_id)
+        path = path.strip("/")
+        with self._lock:
+            db = self._open()
+            with db:
+                db.execute("DELETE FROM items WHERE team = ? AND path = ?", (team, path))
+                self._delete_below(db, team, path)
+
+    def listed_at(self, team_id, directory: str) -> float | None:
+        """When a directory was last listed, as a Unix time, or None if never."""
+        with self._lock:
+            row = self._open().execute(
+                "SELECT listed_at FROM listed WHERE team = ? AND directory = ?",
+                (str(team_id), directory.strip("/")),
+            ).fetchone()
+        return row[0] if row else None
+
+    def listing(self, team_id, directory: str) -> dict | None:
+        """Rebuild the listing of a directory from the catalog.
+
+        Returns:
+            dict | None: A listing shaped like the API's, or None if the directory was never listed.
+        """
+        directory = directory.strip("/")
+        if self.listed_at(team_id, directory) is None:
+            return None
+        with self._lock:
+            rows = self._open().execute(
+                "SELECT type, item FROM items WHERE team = ? AND directory = ?",
+                (str(team_id), directory),
+            ).fetchall()
+        folders = [json.loads(item) for kind, item in rows if kind == "Folder"]
+        files = [json.loads(item) for kind, item in rows if kind != "Folder"]
+        return {"KeyCount": len(rows), "Contents": files, "CommonPrefixes": folders}
+
+    def walk(self, team_id, directory: str = "", recursive: bool = False):
+        """Walk the catalog breadth first, like crawl does the remote tree.
+
+        Folders that were never listed are yielded but not entered.
+
+        Yields:
+            tuple: (parent directory, item) for every file and folder found.
+        """
+        pending = [directory.strip("/")]
+        while pending:
+            current_dir = pending.pop(0)
+            listing = self.listing(team_id, current_dir)
+            if listing is None:
+                continue
+            for item in listing["CommonPrefixes"] + listing["Contents"]:
+                if item["Type"] == "Folder" and recursive:
+                    pending.append(item["Prefix"].split(f"teams/{team_id}/")[-1].rstrip("/"))
+                yield current_dir, item
+
+    def url(self, team_id, path: str) -> str | None:
+        """The URL of a remote file, or None if it is not in the catalog."""
+        with self._lock:
+            row = self._open().execute(
+                "SELECT location FROM items WHERE team = ? AND path = ?",
+                (str(team_id), path.strip("/")),
+            ).fetchone()
+        return row[0] if row else None
+
+    def glob(self, team_id, pattern: str, directory: str = "") -> list:
+        """Find the files whose path below ``directory`` matches a glob.
+
+        Only the rows under the literal part of the pattern are scanned.
+
+        Args:
+            team_id: The team to search.
+            pattern (str): The glob, relative to ``directory``, e.g. '**/*.png'.
+            directory (str, optional): The directory to search in. Defaults to the root directory.
+
+        Returns:
+            list: (path, item) pairs sorted by path.
+        """
+        directory = directory.strip("/")
+        root = directory + "/" if directory else ""
+        prefix = root + glob_base(pattern)
+        prefix = prefix + "/" if prefix and not prefix.endswith("/") else prefix
+        regex = glob_regex(pattern)
+        with self._lock:
+            rows = self._open().execute(
+                "SELECT path, item FROM items WHERE team = ? AND type != 'Folder' "
+                "AND path >= ? AND path < ? ORDER BY path",
+                (str(team_id), prefix, prefix + PATH_END),
+            ).fetchall()
+        return [(path, json.loads(item)) for path, item in rows if regex.match(path[len(root):])]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,39 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def crawl(session, directory: str = "", recursive: bool = True, jobs: int = 8):
+    """Walk a remote directory breadth first, listing sibling folders in parallel.
+
+    Entries are yielded as soon as their folder has been listed, so callers
+    can start transferring while the rest of the tree is still being crawled.
+    Listings that span several pages are yielded page by page, and the next
+    page of a folder is requested before the current one is handed out.
+    Listings run on their own small thread pool, separate from the transfer
+    executor, so a full transfer queue never blocks the crawl itself.
+
+    Args:
+        session (Session): A logged-in session.
+        directory (str, optional): The directory to walk. Defaults to the root directory.
+        recursive (bool, optional): Whether to descend into subfolders. Defaults to True.
+        jobs (int, optional): Number of folders listed at the same time. Defaults to 8.
+
+    Yields:
+        tuple: (parent directory, item) for every file and folder found.
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="igem-crawl")
+    try:
+        pending = {pool.submit(session.listing_page, directory): directory}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_dir = pending.pop(future)
+                items, page = future.result()
+                if page is not None:
+                    pending[pool.submit(session.listing_page, current_dir, page)] = current_dir
+                for item in items or []:
+                    if item["Type"] == "Folder" and recursive:
+                        sub_dir = item["Prefix"].split(f"teams/{session.team_id}/")[1].rstrip("/")
+                        pending[pool.submit(session.listing_page, sub_dir)] = sub_dir
+                    yield current_dir, item
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
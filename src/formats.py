@@ -0,0 +1,77 @@
+import json
+import sys
+
+
+FORMATS = ("table", "json", "jsonl", "tsv")
+ROW_FIELDS = ("path", "type", "size", "modified", "url")
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def item_row(directory: str, item: dict, team_id) -> dict:
+    """The row of a listing item: its path from the root, type, size, modification time and URL."""
+    if item["Type"] == "Folder":
+        path = item["Prefix"].split(f"teams/{team_id}/")[-1].rstrip("/")
+    else:
+        directory = directory.strip("/")
+        path = f"{directory}/{item['Name']}" if directory else item["Name"]
+    return {
+        "path": path,
+        "type": item["Type"],
+        "size": item.get("Size"),
+        "modified": item.get("LastModified"),
+        "url": item.get("Location"),
+    }
+
+
+class RowWriter:
+    """Writes listing rows as they arrive, for scripts piping large listings.
+
+    - json: one array, opened before the first row and closed by close().
+    - jsonl: one object per line.
+    - tsv: a header line, then one line per row with tabs, newlines and
+      backslashes escaped; empty fields stand for missing values.
+
+    Output is flushed whenever the rows move on to another directory, so a
+    reader sees each listing as soon as it was fetched.
+    """
+
+    def __init__(self, fmt: str, team_id, stream=None):
+        """Create the writer.
+
+        Args:
+            fmt (str): One of "json", "jsonl" or "tsv".
+            team_id: The team ID, used to shorten folder keys.
+            stream (file, optional): Where to write. Defaults to stdout.
+        """
+        self.fmt = fmt
+        self.team_id = team_id
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self._directory = None
+        if fmt == "json":
+            self.stream.write("[")
+        elif fmt == "tsv":
+            self.stream.write("\t".join(ROW_FIELDS) + "\n")
+
+    def write(self, directory: str, item: dict) -> None:
+        """Write the row of one listing item found in ``directory``."""
+        if directory != self._directory:
+            self.stream.flush()
+            self._directory = directory
+        row = item_row(directory, item, self.team_id)
+        match self.fmt:
+            case "json":
+                self.stream.write(("," if self.count else "") + "\n" + json.dumps(row))
+            case "jsonl":
+                self.stream.write(json.dumps(row) + "\n")
+            case "tsv":
+                self.stream.write(
+                    "\t".join("" if row[field] is None else str(row[field]).translate(TSV_ESCAPES) for field in ROW_FIELDS)
+                    + "\n"
+                )
+        self.count += 1
+
+    def close(self) -> None:
+        if self.fmt == "json":
+            self.stream.write("\n]\n" if self.count else "]\n")
+        self.stream.flush()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_JOURNAL_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "igem-cdn",
+    "journals",
+)
+
+
+class Journal:
+    """Append-only record of a bulk upload, download or delete, for --resume.
+
+    One JSON line is appended, and flushed, per event: ``start`` when the
+    operation begins, ``plan`` for every item as it is scheduled, ``done``
+    or ``failed`` once it finished and ``end`` at the end. Items are keyed by
+    the local path (uploads), the file URL (downloads) or the remote path
+    (deletes). A journal whose operation ends without failures is removed;
+    one that was interrupted, or ended with failures, stays, so a resumed run
+    of the same operation skips the items recorded as done and retries the
+    rest.
+
+    The file is named after the operation, its source and its target, so
+    every directory transfer has a journal of its own.
+    """
+
+    def __init__(self, operation: str, source: str, target: str, resume: bool = False, directory: str = DEFAULT_JOURNAL_DIR):
+        """Open the journal of an operation.
+
+        Without ``resume`` a previous journal of the same operation is replaced.
+
+        Args:
+            operation (str): "upload", "download" or "delete".
+            source (str): What is transferred, e.g. the local directory of an upload.
+            target (str): Where it goes, e.g. the remote directory of an upload.
+            resume (bool, optional): Whether to continue a previous run. Defaults to False.
+            directory (str, optional): Where journals are kept. Defaults to DEFAULT_JOURNAL_DIR.
+        """
+        digest = hashlib.sha1(f"{operation}\0{source}\0{target}".encode()).hexdigest()[:16]
+        self.path = os.path.join(directory, f"{operation}-{digest}.jsonl")
+        self.completed = {}
+        self.failures = 0
+        self._lock = threading.Lock()
+
+        previous = self._read()
+        if resume:
+            self.completed = previous
+        elif previous:
+            print(f"Replacing an unfinished {operation} journal with {len(previous)} completed items, pass --resume to continue it")
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a" if resume else "w")
+        if resume and self._file.tell():
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                self._file.write("\n")  # End a line a crash cut short, or the next record would join it
+        self._write({"event": "start", "operation": operation, "source": source, "target": target, "resume": resume})
+
+    def _read(self) -> dict:
+        """The done records of a previous run, keyed by item."""
+        completed = {}
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A line cut short by a crash
+                    if record.get("event") == "done":
+                        completed[record["key"]] = record
+        except FileNotFoundError:
+            pass
+        return completed
+
+    def _write(self, record: dict) -> None:
+        record["t"] = round(time.time(), 3)
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def is_done(self, key: str) -> dict | None:
+        """The done record of an item from the resumed run, or None if it still has to run."""
+        return self.completed.get(key)
+
+    def plan(self, key: str, **fields) -> None:
+        """Record that an item was scheduled."""
+        self._write({"event": "plan", "key": key, **fields})
+
+    def done(self, key: str, **fields) -> None:
+        """Record that an item completed, with any fields a resumed run should get back, e.g. its URL."""
+        self._write({"event": "done", "key": key, **fields})
+
+    def failed(self, key: str, error: str) -> None:
+        """Record that an item failed; a resumed run retries it."""
+        with self._lock:
+            self.failures += 1
+        self._write({"event": "failed", "key": key, "error": error})
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        """Close the journal, removing it if the operation ended without failures."""
+        if exc_type is None:
+            self._write({"event": "end", "failed": self.failures})
+        self._file.close()
+        if exc_type is None and self.failures == 0:
+            os.remove(self.path)
+        elif exc_type is None:
+            print(f"{self.failures} items failed, rerun with --resume to retry only those and the ones not reached")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from urllib.parse import unquote
+
+if TYPE_CHECKING:
+    from src.uploads import Session
+
+
+MANIFEST_NAME = ".igem-manifest.json"
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(file_path: str) -> str:
+    """Compute the SHA-256 hex digest of a file, reading it in chunks.
+
+    Args:
+        file_path (str): Path of the file to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remote_state(item: dict) -> dict:
+    """The parts of a listing item that change when the remote file changes."""
+    return {"size": item.get("Size"), "modified": item.get("LastModified")}
+
+
+def same_remote(recorded: dict | None, item: dict) -> bool:
+    """Whether a listing item shows the same remote file as a recorded remote_state.
+
+    A listing without size and modification time tells nothing about the
+    file, so it never matches.
+    """
+    state = remote_state(item)
+    return any(value is not None for value in state.values()) and recorded == state
+
+
+def uploaded_key(client: "Session", entry: dict, key: str) -> str:
+    """The remote path a local file was uploaded to.
+
+    This differs from ``key`` when the optimizer changed the file extension.
+
+    Args:
+        client (Session): A logged-in session.
+        entry (dict): The manifest entry of the file, if any.
+        key (str): The remote path mirroring the local file path.
+
+    Returns:
+        str: The remote path from the recorded file URL, or ``key`` if none is recorded.
+    """
+    url = unquote(entry.get("url") or "") if entry else ""
+    if url.startswith(client.url):
+        return url[len(client.url):]
+    return key
+
+
+class Manifest:
+    """Persistent record of the files synced between a local root and the CDN.
+
+    Each entry is keyed by the remote file path and stores the local size,
+    mtime and content hash as of the last sync, the file URL and, once
+    known, the remote size and modification time from the listing.
+    """
+
+    def __init__(self, root: str):
+        """Load the manifest stored under ``root``, or start an empty one.
+
+        Args:
+            root (str): The local root directory.
+        """
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("files", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def get(self, key: str) -> dict:
+        with self._lock:
+            return self.entries.get(key)
+
+    def update(self, key: str, **fields) -> None:
+        """Merge ``fields`` into the entry for ``key``, creating it if needed."""
+        with self._lock:
+            self.entries.setdefault(key, {}).update(fields)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self.entries.pop(key, None)
+
+    def scan(self, files: dict) -> dict:
+        """Stat and hash local files, reusing stored hashes where possible.
+
+        A file is only read when its size or mtime differs from its entry.
+        The reads are spread over a thread pool sized to the CPU count.
+
+        Args:
+            files (dict): Local file paths keyed by remote file path.
+
+        Returns:
+            dict: {"size", "mtime", "hash"} of each file, keyed by remote file path.
+        """
+        states = {}
+        to_hash = []
+        for key, local_path in files.items():
+            stat = os.stat(local_path)
+            state = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            entry = self.get(key)
+            if entry and entry.get("size") == state["size"] and entry.get("mtime") == state["mtime"]:
+                state["hash"] = entry["hash"]
+            else:
+                to_hash.append(key)
+            states[key] = state
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            for key, digest in zip(to_hash, pool.map(file_hash, (files[key] for key in to_hash))):
+                states[key]["hash"] = digest
+        return states
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "files": self.entries}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
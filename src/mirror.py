@@ -0,0 +1,162 @@
+import os
+import posixpath
+from src.crawler import crawl
+from src.manifest import Manifest, remote_state, same_remote, uploaded_key
+from src.sync import local_files
+from src.uploads import Session, folder_levels, has_failed_below
+from src.walk import IgnoreMatcher
+
+
+def plan_mirror(client: Session, manifest: Manifest, local_dir: str, remote_dir: str = "") -> dict:
+    """Compare a local directory with a remote directory and plan how to make the remote match.
+
+    The local side comes from a directory walk hashed against the manifest,
+    the remote side from a crawl of the listings with their Size and
+    LastModified. A remote file is left alone when its local file has the
+    hash recorded at the last upload and the remote metadata has not moved
+    since. Remote files and folders without a local counterpart are deleted,
+    except those the local side skips, hidden or excluded by an
+    ``.igemignore``: like rsync's excluded files, they are left alone, so a
+    new ignore rule never deletes anything remotely.
+
+    Args:
+        client (Session): A logged-in session.
+        manifest (Manifest): The manifest of the local root.
+        local_dir (str): The local directory to mirror.
+        remote_dir (str, optional): The remote directory to update. Defaults to the root directory.
+
+    Returns:
+        dict: The plan, with "upload" and "overwrite" lists of (remote path, local path),
+        "delete" and "delete_folders" lists of (parent directory, item), "ignored"
+        (the outermost remote paths kept because they are ignored locally, folders
+        ending in '/'), "forget" (manifest keys of files gone locally), "unchanged"
+        (a count) and "states" (the scanned local files).
+    """
+    remote_dir = remote_dir.strip("/")
+    files = local_files(local_dir, remote_dir)
+    states = manifest.scan(files)
+    owned = {uploaded_key(client, manifest.get(key), key): key for key in files}
+    local_dirs = set()
+    for key in owned:
+        parent = posixpath.dirname(key)
+        while parent and parent not in local_dirs:
+            local_dirs.add(parent)
+            parent = posixpath.dirname(parent)
+
+    plan = {
+        "upload": [],
+        "overwrite": [],
+        "delete": [],
+        "delete_folders": [],
+        "ignored": [],
+        "forget": [],
+        "unchanged": 0,
+        "states": states,
+    }
+    prefix = remote_dir + "/" if remote_dir else ""
+    ignore = IgnoreMatcher(local_dir)
+
+    def ignored(path: str, is_dir: bool) -> bool:
+        return ignore.ignored(os.path.join(local_dir, *path[len(prefix):].split("/")), is_dir)
+
+    def stale(directory: str, item: dict, is_folder: bool) -> None:
+        """Plan to delete a remote item without a local counterpart, unless it is ignored locally."""
+        path = posixpath.join(directory, item["Name"])
+        if not ignored(path, is_folder):
+            plan["delete_folders" if is_folder else "delete"].append((directory, item))
+        elif not ignored(directory, True):  # Only the outermost ignored path is listed
+            plan["ignored"].append(path + "/" if is_folder else path)
+
+    seen = set()
+    for directory, item in crawl(client, remote_dir, True, client.executor.jobs):
+        path = posixpath.join(directory, item["Name"])
+        if item["Type"] == "Folder":
+            if path not in local_dirs:
+                stale(directory, item, True)
+            continue
+        key = owned.get(path)
+        if key is None:
+            stale(directory, item, False)
+            continue
+        seen.add(key)
+        entry = manifest.get(key)
+        if (
+            entry
+            and entry.get("hash") == states[key]["hash"]
+            and (entry.get("remote") is None or same_remote(entry["remote"], item))
+        ):
+            manifest.update(key, remote=remote_state(item))
+            plan["unchanged"] += 1
+        else:
+            plan["overwrite"].append((key, files[key]))
+
+    plan["upload"] = [(key, files[key]) for key in sorted(set(files) - seen)]
+    plan["forget"] = [
+        key for key in list(manifest.entries) if key.startswith(prefix) and key not in files
+    ]
+    return plan
+
+
+def print_plan(plan: dict) -> None:
+    """Print a mirror plan, one line per change."""
+    for key, _ in plan["upload"]:
+        print(f"+ {key}")
+    for key, _ in plan["overwrite"]:
+        print(f"~ {key}")
+    for directory, item in plan["delete"]:
+        print(f"- {posixpath.join(directory, item['Name'])}")
+    for directory, item in plan["delete_folders"]:
+        print(f"- {posixpath.join(directory, item['Name'])}/")
+    for path in plan["ignored"]:
+        print(f"= {path} (ignored locally, kept)")
+    print(
+        f"{len(plan['upload'])} to upload, {len(plan['overwrite'])} to overwrite, "
+        f"{len(plan['delete']) + len(plan['delete_folders'])} to delete, "
+        f"{plan['unchanged']} unchanged"
+        + (f", {len(plan['ignored'])} ignored locally and kept" if plan["ignored"] else "")
+    )
+
+
+def run_mirror(client: Session, manifest: Manifest, plan: dict) -> None:
+    """Carry out a mirror plan.
+
+    Uploads and overwrites go first so the site never misses a file, then
+    the stale files, then the stale folders deepest first. Folders that
+    still hold a file that failed to delete are kept.
+
+    Args:
+        client (Session): A logged-in session.
+        manifest (Manifest): The manifest of the local root.
+        plan (dict): The plan from plan_mirror.
+    """
+    try:
+        to_send = plan["upload"] + plan["overwrite"]
+        urls = {}
+        if to_send:
+            urls = client.upload_files(
+                [(local_path, posixpath.dirname(key)) for key, local_path in to_send]
+            )
+        for key, local_path in to_send:
+            if local_path in urls:
+                manifest.update(key, **plan["states"][key], url=urls[local_path], remote=None)
+
+        failed = client.delete_files(plan["delete"]) if plan["delete"] else []
+        for level in folder_levels(plan["delete_folders"]):
+            ready = []
+            for directory, item in level:
+                if has_failed_below(posixpath.join(directory, item["Name"]), failed):
+                    failed.append((directory, item))
+                else:
+                    ready.append((directory, item))
+            if ready:
+                failed.extend(client.delete_files(ready))
+        for key in plan["forget"]:
+            manifest.remove(key)
+
+        print(
+            f"Uploaded {len(urls)} of {len(to_send)} files, "
+            f"deleted {len(plan['delete']) + len(plan['delete_folders']) - len(failed)} "
+            f"of {len(plan['delete']) + len(plan['delete_folders'])} stale items\n"
+        )
+    finally:
+        manifest.save()
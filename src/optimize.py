@@ -0,0 +1,151 @@
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from src.manifest import file_hash
+
+
+TOOLS_DIR = Path(__file__).resolve().parent.parent / "utils"
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "igem-cdn",
+    "optimized",
+)
+WEBP_QUALITY = 80
+# Source extension -> (target extension, encoder)
+CONVERSIONS = {
+    ".png": (".webp", "cwebp"),
+    ".jpg": (".webp", "cwebp"),
+    ".jpeg": (".webp", "cwebp"),
+    ".gif": (".webp", "gif2webp"),
+    ".ttf": (".woff2", "cwoff2"),
+}
+KEEP_ORIGINAL = ".original"  # Marks a cache entry whose encoding was not smaller
+
+
+def platform_tools_dir() -> Path:
+    """The directory of bundled encoders for the host, e.g. utils/linux/x86_64."""
+    system = "mac" if sys.platform == "darwin" else "linux"
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        machine = "arm64" if system == "mac" else "aarch64"
+    return TOOLS_DIR / system / machine
+
+
+def find_tool(name: str) -> str | None:
+    """Locate an encoder, preferring the binary bundled for the host platform.
+
+    Args:
+        name (str): The encoder name, e.g. 'cwebp'.
+
+    Returns:
+        str | None: Path of the encoder, or None if it is neither bundled nor on PATH.
+    """
+    for candidate in sorted(platform_tools_dir().rglob(name)):
+        if not candidate.is_file():
+            continue
+        if not os.access(candidate, os.X_OK):
+            try:
+                candidate.chmod(candidate.stat().st_mode | 0o111)
+            except OSError:
+                continue
+        return str(candidate)
+    return shutil.which(name)
+
+
+class Optimizer:
+    """Transcodes assets before upload: PNG/JPEG and GIF to WebP, TTF to WOFF2.
+
+    Encoded files are cached by the content hash of their source, so an
+    unchanged asset is only ever encoded once. The encoders run as
+    subprocesses, at most one per CPU at a time. An encoding is only used
+    when it is smaller than its source.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, workers: int = None):
+        """Create the optimizer.
+
+        Args:
+            cache_dir (str, optional): Where encoded files are kept. Defaults to DEFAULT_CACHE_DIR.
+            workers (int, optional): Number of encoders run at once. Defaults to the CPU count.
+        """
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.tools = {}
+        for tool in sorted({tool for _, tool in CONVERSIONS.values()}):
+            self.tools[tool] = find_tool(tool)
+        missing = [tool for tool, path in self.tools.items() if path is None]
+        if missing:
+            warnings.warn(f"No {', '.join(missing)} for this platform, those files are uploaded as-is")
+
+    def _command(self, tool: str, source: str, target: str) -> list:
+        match tool:
+            case "cwebp":
+                return [self.tools[tool], "-quiet", "-mt", "-q", str(WEBP_QUALITY), source, "-o", target]
+            case "gif2webp":
+                return [self.tools[tool], "-quiet", "-mt", "-mixed", "-q", str(WEBP_QUALITY), source, "-o", target]
+            case "cwoff2":
+                return [self.tools[tool], source]  # Writes <source stem>.woff2 next to source
+
+    def optimize(self, file_path: str) -> str:
+        """Return the file to upload in place of ``file_path``.
+
+        Args:
+            file_path (str): The local file.
+
+        Returns:
+            str: The cached encoded file, or ``file_path`` itself if its type is
+            not converted, its encoder is missing, or encoding did not make it smaller.
+        """
+        source = Path(file_path)
+        target_ext, tool = CONVERSIONS.get(source.suffix.lower(), (None, None))
+        if tool is None or self.tools.get(tool) is None:
+            return file_path
+
+        entry_dir = os.path.join(self.cache_dir, file_hash(file_path))
+        target = os.path.join(entry_dir, source.stem + target_ext)
+        if os.path.exists(os.path.join(entry_dir, KEEP_ORIGINAL)):
+            return file_path
+        if os.path.exists(target):
+            return target
+        os.makedirs(entry_dir, exist_ok=True)
+
+        # Same content under another name: reuse the earlier encoding
+        for cached in os.listdir(entry_dir):
+            if cached.endswith(target_ext):
+                shutil.copyfile(os.path.join(entry_dir, cached), target + ".tmp")
+                os.replace(target + ".tmp", target)
+                return target
+
+        with tempfile.TemporaryDirectory(dir=entry_dir) as work_dir:
+            work_source = os.path.join(work_dir, "source" + source.suffix.lower())
+            work_target = os.path.join(work_dir, "source" + target_ext)
+            shutil.copyfile(file_path, work_source)
+            result = subprocess.run(
+                self._command(tool, work_source, work_target), capture_output=True
+            )
+            if result.returncode != 0 or not os.path.exists(work_target):
+                warnings.warn(f"{tool} failed on '{file_path}': {result.stderr.decode(errors='replace').strip()}")
+                return file_path
+            if os.path.getsize(work_target) >= os.path.getsize(file_path):
+                open(os.path.join(entry_dir, KEEP_ORIGINAL), "w").close()
+                return file_path
+            os.replace(work_target, target)
+        return target
+
+    def optimize_many(self, file_paths: list) -> dict:
+        """Optimize many files in parallel.
+
+        Args:
+            file_paths (list): The local files.
+
+        Returns:
+            dict: The file to upload for each local file, keyed by local file.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="igem-optimize") as pool:
+            return dict(zip(file_paths, pool.map(self.optimize, file_paths)))
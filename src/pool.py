@@ -0,0 +1,298 @@
+import functools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+import httpx
+from src.stats import Recorder, Timing
+
+
+DEFAULT_API_POOL = {
+    "max_connections": 8,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 30.0,
+    "max_streams": 16,
+}
+DEFAULT_STATIC_POOL = {
+    "max_connections": 4,
+    "max_keepalive_connections": 4,
+    "keepalive_expiry": 90.0,
+    "max_streams": 64,
+}
+
+
+def static_pool_defaults(jobs: int) -> dict:
+    """DEFAULT_STATIC_POOL with a connection for each of ``jobs`` transfers.
+
+    Should the host fall back to HTTP/1.1, every download then still has a
+    connection of its own instead of queueing behind a slow large file.
+    """
+    connections = max(DEFAULT_STATIC_POOL["max_connections"], jobs)
+    return {**DEFAULT_STATIC_POOL, "max_connections": connections, "max_keepalive_connections": connections}
+
+
+def pool_settings(settings: dict = None, defaults: dict = DEFAULT_API_POOL) -> dict:
+    """Merge connection pool settings over their defaults.
+
+    Args:
+        settings (dict, optional): Overrides for ``defaults``. Known keys are
+            max_connections, max_keepalive_connections, keepalive_expiry and max_streams.
+        defaults (dict, optional): The base settings. Defaults to DEFAULT_API_POOL.
+
+    Returns:
+        dict: The merged settings.
+
+    Raises:
+        ValueError: If a setting is unknown or not positive.
+    """
+    merged = dict(defaults)
+    for key, value in (settings or {}).items():
+        if key not in defaults:
+            raise ValueError(f"Unknown connection pool setting: '{key}'")
+        if value is None or value <= 0:
+            raise ValueError(f"Connection pool setting '{key}' must be positive")
+        merged[key] = value
+    return merged
+
+
+@functools.cache
+def ssl_context():
+    """The TLS context shared by every pool, so the CA bundle is loaded once per process."""
+    return httpx.create_ssl_context()
+
+
+def pool_limits(settings: dict) -> httpx.Limits:
+    """Build the httpx limits for merged pool settings."""
+    return httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+
+
+def record_response(
+    recorder: Recorder,
+    timing: Timing,
+    method: str,
+    url,
+    response: httpx.Response,
+    error: Exception = None,
+) -> None:
+    """Report a response whose body has been read, or failed to read, to ``recorder``."""
+    recorder.request(
+        timing,
+        method,
+        str(url),
+        response.status_code,
+        sent=int(response.request.headers.get("Content-Length", 0)),
+        received=response.num_bytes_downloaded,
+        error=error,
+    )
+
+
+class ConnectionPool:
+    """A long-lived HTTP/2 client with tuned pool limits.
+
+    Besides the connection limits handed to httpx, the pool caps the number of
+    requests in flight at ``max_connections * max_streams`` so a busy worker
+    pool cannot open more streams than the settings allow.
+
+    The httpx client is only built on first use, so a run that never talks
+    to a host does not pay for setting up its client.
+
+    When ``recorder`` is set, every request is timed (connect, TLS, time to
+    first byte, transfer) and reported to it.
+    """
+
+    def __init__(self, settings: dict = None, defaults: dict = DEFAULT_API_POOL, **client_kwargs):
+        """Create the pool.
+
+        Args:
+            settings (dict, optional): Overrides for ``defaults``, see pool_settings.
+            defaults (dict, optional): The base settings. Defaults to DEFAULT_API_POOL.
+            **client_kwargs: Extra arguments for ``httpx.Client`` (e.g. headers).
+
+        Raises:
+            ValueError: If a setting is unknown or not positive.
+        """
+        self.settings = pool_settings(settings, defaults)
+        self.recorder: Recorder | None = None
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._streams = threading.BoundedSemaphore(
+            self.settings["max_connections"] * self.settings["max_streams"]
+        )
+
+    @property
+    def client(self) -> httpx.Client:
+        """The underlying httpx client, created on first access."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        http2=True,
+                        limits=pool_limits(self.settings),
+                        verify=ssl_context(),
+                        **self._client_kwargs,
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, client: httpx.Client) -> None:
+        self._client = client
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request once a stream slot is free.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL to send the request to.
+            **kwargs: Passed on to ``httpx.Client.request``.
+
+        Returns:
+            httpx.Response: The response object from the request.
+        """
+        with self._streams:
+            if self.recorder is None:
+                return self.client.request(method, url, **kwargs)
+            timing = Timing()
+            try:
+                response = self.client.request(
+                    method, url, extensions={"trace": timing.trace}, **kwargs
+                )
+            except httpx.TransportError as e:
+                self.recorder.request(timing, method, str(url), error=e)
+                raise
+            record_response(self.recorder, timing, method, url, response)
+            return response
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs):
+        """Stream a response, holding a stream slot until the body is consumed.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL to send the request to.
+            **kwargs: Passed on to ``httpx.Client.stream``.
+
+        Yields:
+            httpx.Response: The response, with its body not yet read.
+        """
+        with self._streams:
+            if self.recorder is None:
+                with self.client.stream(method, url, **kwargs) as response:
+                    yield response
+                return
+            timing = Timing()
+            response = None
+            try:
+                with self.client.stream(
+                    method, url, extensions={"trace": timing.trace}, **kwargs
+                ) as response:
+                    yield response
+            except httpx.TransportError as e:
+                if response is None:
+                    self.recorder.request(timing, method, str(url), error=e)
+                else:
+                    record_response(self.recorder, timing, method, url, response, e)
+                raise
+            else:
+                record_response(self.recorder, timing, method, url, response)
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+
+
+class AsyncConnectionPool:
+    """The asyncio counterpart of ConnectionPool, built on httpx.AsyncClient."""
+
+    def __init__(self, settings: dict = None, defaults: dict = DEFAULT_API_POOL, **client_kwargs):
+        """Create the pool.
+
+        Args:
+            settings (dict, optional): Overrides for ``defaults``, see pool_settings.
+            defaults (dict, optional): The base settings. Defaults to DEFAULT_API_POOL.
+            **client_kwargs: Extra arguments for ``httpx.AsyncClient`` (e.g. headers).
+
+        Raises:
+            ValueError: If a setting is unknown or not positive.
+        """
+        import asyncio
+
+        self.settings = pool_settings(settings, defaults)
+        self.recorder: Recorder | None = None
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._streams = asyncio.Semaphore(
+            self.settings["max_connections"] * self.settings["max_streams"]
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The underlying httpx client, created on first access."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=pool_limits(self.settings),
+                verify=ssl_context(),
+                **self._client_kwargs,
+            )
+        return self._client
+
+    @client.setter
+    def client(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._streams:
+            if self.recorder is None:
+                return await self.client.request(method, url, **kwargs)
+            timing = Timing()
+            try:
+                response = await self.client.request(
+                    method, url, extensions={"trace": timing.atrace}, **kwargs
+                )
+            except httpx.TransportError as e:
+                self.recorder.request(timing, method, str(url), error=e)
+                raise
+            record_response(self.recorder, timing, method, url, response)
+            return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        async with self._streams:
+            if self.recorder is None:
+                async with self.client.stream(method, url, **kwargs) as response:
+                    yield response
+                return
+            timing = Timing()
+            response = None
+            try:
+                async with self.client.stream(
+                    method, url, extensions={"trace": timing.atrace}, **kwargs
+                ) as response:
+                    yield response
+            except httpx.TransportError as e:
+                if response is None:
+                    self.recorder.request(timing, method, str(url), error=e)
+                else:
+                    record_response(self.recorder, timing, method, url, response, e)
+                raise
+            else:
+                record_response(self.recorder, timing, method, url, response)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Upper bounds in seconds
+HISTOGRAM_WIDTH = 40
+
+
+def percentile(values: list, fraction: float) -> float:
+    """The value below which ``fraction`` of the sorted ``values`` fall."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Timing:
+    """Timestamps of one request, fed by the httpcore "trace" extension.
+
+    ``connect`` covers DNS and TCP, ``tls`` the handshake; both stay at 0
+    when a pooled connection is reused. ``ttfb`` runs from sending to the
+    response headers, ``transfer`` from the headers to the end of the body.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connect = 0.0
+        self.tls = 0.0
+        self.ttfb = None
+        self._marks = {}
+
+    def trace(self, event_name: str, info: dict) -> None:
+        now = time.perf_counter()
+        match event_name:
+            case "connection.connect_tcp.started" | "connection.start_tls.started":
+                self._marks[event_name] = now
+            case "connection.connect_tcp.complete":
+                self.connect = now - self._marks.get("connection.connect_tcp.started", now)
+            case "connection.start_tls.complete":
+                self.tls = now - self._marks.get("connection.start_tls.started", now)
+            case "http11.receive_response_headers.complete" | "http2.receive_response_headers.complete":
+                self.ttfb = now - self.start
+
+    async def atrace(self, event_name: str, info: dict) -> None:
+        self.trace(event_name, info)
+
+
+class Recorder:
+    """Collects per-request timings, retries and phases of a run.
+
+    The connection pools report every request here once its body has been
+    read. The totals are printed by print_summary (``--stats``); with a trace
+    path, every request, retry and phase is also written as one JSON line.
+    """
+
+    def __init__(self, trace_path: str = None):
+        """Create the recorder.
+
+        Args:
+            trace_path (str, optional): Where to write the JSON lines trace. Defaults to no trace.
+        """
+        self.started = time.perf_counter()
+        self.groups = {}
+        self.statuses = Counter()
+        self.retries = Counter()
+        self.phases = []
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, "w") if trace_path else None
+
+    def _write(self, event: dict) -> None:
+        """Append an event to the trace. Call with the lock held."""
+        if self._trace is not None:
+            self._trace.write(json.dumps(event) + "\n")
+
+    def request(
+        self,
+        timing: Timing,
+        method: str,
+        url: str,
+        status: int = None,
+        sent: int = 0,
+        received: int = 0,
+        error: Exception = None,
+    ) -> None:
+        """Record a finished request.
+
+        Args:
+            timing (Timing): The request's timestamps.
+            method (str): The HTTP method.
+            url (str): The request URL.
+            status (int, optional): The response status, None if the request failed.
+            sent (int, optional): Request body bytes.
+            received (int, optional): Response body bytes.
+            error (Exception, optional): The transport error, if any.
+        """
+        end = time.perf_counter()
+        total = end - timing.start
+        ttfb = timing.ttfb if timing.ttfb is not None else total
+        host = url.split("/")[2] if "://" in url else ""
+        key = f"{host} {method}"
+        with self._lock:
+            group = self.groups.setdefault(
+                key,
+                {"count": 0, "errors": 0, "sent": 0, "received": 0, "latencies": [],
+                 "connects": 0, "connect_time": 0.0},
+            )
+            group["count"] += 1
+            group["sent"] += sent
+            group["received"] += received
+            group["latencies"].append(total)
+            if timing.connect or timing.tls:
+                group["connects"] += 1
+                group["connect_time"] += timing.connect + timing.tls
+            if error is not None or status >= 400:
+                group["errors"] += 1
+            self.statuses[status if error is None else type(error).__name__] += 1
+            self._write({
+                "event": "request",
+                "t": round(timing.start - self.started, 6),
+                "method": method,
+                "url": url,
+                "status": status,
+                "error": repr(error) if error is not None else None,
+                "connect": round(timing.connect, 6),
+                "tls": round(timing.tls, 6),
+                "ttfb": round(ttfb, 6),
+                "transfer": round(total - ttfb, 6),
+                "total": round(total, 6),
+                "sent": sent,
+                "received": received,
+            })
+
+    def retry(self, reason, attempt: int, delay: float) -> None:
+        """Record that a request is retried.
+
+        Args:
+            reason: The status code or exception that caused the retry.
+            attempt (int): The attempt that failed, starting at 0.
+            delay (float): Seconds waited before the next attempt.
+        """
+        reason = reason if isinstance(reason, int) else type(reason).__name__
+        with self._lock:
+            self.retries[reason] += 1
+            self._write({
+                "event": "retry",
+                "t": round(time.perf_counter() - self.started, 6),
+                "reason": reason,
+                "attempt": attempt,
+                "delay": round(delay, 6),
+            })
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a step of the run, such as logging in or the action itself."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.phases.append((name, duration))
+                self._write({
+                    "event": "phase",
+                    "name": name,
+                    "t": round(start - self.started, 6),
+                    "duration": round(duration, 6),
+                })
+
+    def print_summary(self, limiter=None) -> None:
+        """Print phase times, request counts, throughput, latencies and retries.
+
+        Args:
+            limiter (AdaptiveConcurrency, optional): Its final limit is shown when given.
+        """
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            groups = {key: dict(group, latencies=sorted(group["latencies"])) for key, group in self.groups.items()}
+            statuses = dict(self.statuses)
+            retries = dict(self.retries)
+            phases = list(self.phases)
+
+        print(f"\n--- Stats ({elapsed:.2f}s) ---")
+        for name, duration in phases:
+            print(f"{name:<24} {duration:>9.2f}s")
+
+        print(
+            f"\n{'requests':<24} {'count':>6} {'errors':>6} {'sent MB':>8} {'recv MB':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'conns':>6} {'conn ms':>8}"
+        )
+        sent = received = 0
+        for key, group in sorted(groups.items()):
+            latencies = group["latencies"]
+            sent += group["sent"]
+            received += group["received"]
+            connect_ms = group["connect_time"] / group["connects"] * 1000 if group["connects"] else 0.0
+            print(
+                f"{key:<24} {group['count']:>6} {group['errors']:>6} "
+                f"{group['sent'] / 1024 / 1024:>8.2f} {group['received'] / 1024 / 1024:>8.2f} "
+                f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+                f"{percentile(latencies, 0.99) * 1000:>8.1f} {latencies[-1] * 1000:>8.1f} "
+                f"{group['connects']:>6} {connect_ms:>8.1f}"
+            )
+        if elapsed > 0:
+            print(
+                f"\nThroughput: {sent / elapsed / 1024 / 1024:.2f} MB/s sent, "
+                f"{received / elapsed / 1024 / 1024:.2f} MB/s received"
+            )
+        print("Statuses: " + (", ".join(f"{status} x{count}" for status, count in sorted(statuses.items(), key=str)) or "none"))
+        print("Retries: " + (", ".join(f"{reason} x{count}" for reason, count in sorted(retries.items(), key=str)) or "none"))
+        if limiter is not None:
+            print(f"Concurrency limit at exit: {limiter.limit:.1f} of {limiter.max_limit}")
+
+        for key, group in sorted(groups.items()):
+            print(f"\n{key} latency")
+            counts = [0] * (len(LATENCY_BUCKETS) + 1)
+            for latency in group["latencies"]:
+                index = 0
+                while index < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[index]:
+                    index += 1
+                counts[index] += 1
+            peak = max(counts)
+            last = max(index for index, count in enumerate(counts) if count)
+            for index, count in enumerate(counts[:last + 1]):
+                label = (
+                    f"<= {LATENCY_BUCKETS[index] * 1000:g} ms" if index < len(LATENCY_BUCKETS)
+                    else f"> {LATENCY_BUCKETS[-1] * 1000:g} ms"
+                )
+                bar = "#" * round(count / peak * HISTOGRAM_WIDTH) if peak else ""
+                print(f"  {label:>12} {bar:<{HISTOGRAM_WIDTH}} {count}")
+
+    def close(self) -> None:
+        if self._trace is not None:
+            self._trace.close()
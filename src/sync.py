@@ -0,0 +1,92 @@
+import os
+import posixpath
+from src.manifest import Manifest, remote_state, same_remote, uploaded_key
+from src.uploads import Session
+from src.walk import walk_local
+
+
+def local_files(local_dir: str, remote_dir: str) -> dict:
+    """Collect the files under a local directory, skipping hidden files and directories
+    and what an ``.igemignore`` excludes, see walk_local.
+
+    Args:
+        local_dir (str): The local directory to walk.
+        remote_dir (str): The remote directory it corresponds to.
+
+    Returns:
+        dict: Local file paths keyed by remote file path.
+    """
+    files = {}
+    for file_path, relative_dir in walk_local(local_dir, True):
+        relative_path = os.path.normpath(os.path.join(relative_dir, os.path.basename(file_path)))
+        key = posixpath.join(remote_dir, relative_path.replace(os.sep, "/"))
+        files[key] = file_path
+    return files
+
+
+def sync_dir(client: Session, manifest: Manifest, local_dir: str, remote_dir: str = "") -> None:
+    """Bring a local directory and a remote directory up to date with each other.
+
+    New and changed local files are uploaded. Remote files are downloaded when
+    they are missing locally or have changed remotely since the last sync,
+    unless the local copy has changed as well, in which case the local copy wins.
+
+    Args:
+        client (Session): A logged-in session.
+        manifest (Manifest): The manifest of the local root.
+        local_dir (str): The local directory to sync.
+        remote_dir (str, optional): The remote directory to sync. Defaults to the root directory.
+    """
+    remote_dir = remote_dir.strip("/")
+    files = local_files(local_dir, remote_dir)
+    states = manifest.scan(files)
+
+    changed = set()
+    for key, state in states.items():
+        entry = manifest.get(key)
+        if entry is None or entry.get("hash") != state["hash"]:
+            changed.add(key)
+        elif entry.get("size") != state["size"] or entry.get("mtime") != state["mtime"]:
+            manifest.update(key, size=state["size"], mtime=state["mtime"])  # touched only
+
+    try:
+        urls = {}
+        if changed:
+            urls = client.upload_files(
+                [(files[key], posixpath.dirname(key)) for key in sorted(changed)]
+            )
+        uploaded = set()
+        for key in changed:
+            if files[key] in urls:
+                manifest.update(key, **states[key], url=urls[files[key]], remote=None)
+                uploaded.add(key)
+        print(f"Uploaded {len(uploaded)} of {len(changed)} changed files")
+
+        owned = {uploaded_key(client, manifest.get(key), key): key for key in files}
+        to_download = {}
+        for directory, item in client.list_files(remote_dir, True):
+            key = posixpath.join(directory, item["Name"])
+            key = owned.get(key, key)
+            entry = manifest.get(key)
+            if key in uploaded or (entry and entry.get("remote") is None and key in files):
+                manifest.update(key, remote=remote_state(item))
+            elif key not in files or (
+                key not in changed and entry and not same_remote(entry.get("remote"), item)
+            ):
+                to_download[item["Location"]] = (key, item)
+
+        downloads = []
+        for file_url, (key, item) in to_download.items():
+            relative_path = posixpath.relpath(key, remote_dir) if remote_dir else key
+            downloads.append((file_url, os.path.dirname(os.path.join(local_dir, relative_path)), item))
+        downloaded = client.download_files(downloads) if downloads else []
+
+        for file_url in downloaded:
+            key, item = to_download[file_url]
+            relative_path = posixpath.relpath(key, remote_dir) if remote_dir else key
+            local_path = os.path.join(local_dir, relative_path)
+            state = manifest.scan({key: local_path})[key]
+            manifest.update(key, **state, url=file_url, remote=remote_state(item))
+        print(f"Downloaded {len(downloaded)} of {len(to_download)} new or changed remote files\n")
+    finally:
+        manifest.save()
@@ -0,0 +1,251 @@
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_AFTER_CAP = 120.0
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2
+DEFAULT_INFLIGHT_MB = 64
+
+
+def retry_delay(attempt: int, retry_after: str = None) -> float:
+    """How long to wait before retrying a request.
+
+    Args:
+        attempt (int): Number of attempts made so far, starting at 0.
+        retry_after (str, optional): The Retry-After header of the response,
+            in seconds or as an HTTP date. It takes precedence when present.
+
+    Returns:
+        float: The delay in seconds, with full jitter unless Retry-After was given.
+    """
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), RETRY_AFTER_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class AdaptiveConcurrency:
+    """Additive-increase/multiplicative-decrease limit on requests in flight.
+
+    The limit grows by about one per round of successful requests while the
+    smoothed latency stays within LATENCY_TOLERANCE of the best latency seen,
+    and is halved when the server throttles (429/503) or a request times out.
+    Decreases are spaced by DECREASE_COOLDOWN so that one burst of throttled
+    responses only counts once.
+
+    Large requests (big uploads) and small requests each leave up to
+    ``reserved`` slots to the other kind while it has requests waiting or in
+    flight, so a few big files cannot hold every slot while a burst of small
+    ones queues behind them, nor the other way round.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: int = None, reserved: int = 0):
+        """Create the limiter.
+
+        Args:
+            max_limit (int): The highest concurrency allowed.
+            min_limit (int, optional): The lowest concurrency allowed. Defaults to 1.
+            initial (int, optional): The starting concurrency. Defaults to half of ``max_limit``.
+            reserved (int, optional): Slots each kind of request leaves to the other. Defaults to 0.
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial or max(self.min_limit, self.max_limit // 2))
+        self.reserved = max(0, reserved)
+        self.in_flight = 0
+        self.large_in_flight = 0
+        self.waiting = {False: 0, True: 0}  # Requests waiting, by whether they are large
+        self._min_latency = None
+        self._latency = None
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+
+    def _can_start(self, large: bool = False) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        large_running = self.large_in_flight
+        small_running = self.in_flight - large_running
+        running, others = (large_running, small_running) if large else (small_running, large_running)
+        other_demand = min(self.reserved, others + self.waiting[not large])
+        return running < max(1, int(self.limit) - other_demand)
+
+    def _start(self, large: bool) -> None:
+        """Count a request that may start. Call with the lock held."""
+        self.in_flight += 1
+        if large:
+            self.large_in_flight += 1
+
+    def _finish(self, latency: float, throttled: bool, large: bool) -> None:
+        """Count a finished request and update the limit. Call with the lock held."""
+        self.in_flight -= 1
+        if large:
+            self.large_in_flight -= 1
+        self._record(latency, throttled)
+
+    def _record(self, latency: float = None, throttled: bool = False) -> None:
+        """Update the limit with the outcome of a request. Call with the lock held."""
+        if throttled:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            return
+        if latency is None:
+            return
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += LATENCY_SMOOTHING * (latency - self._latency)
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+        if self._latency <= self._min_latency * LATENCY_TOLERANCE:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def acquire(self, large: bool = False) -> None:
+        """Block until a request may start.
+
+        Args:
+            large (bool, optional): Whether the request carries a large body. Defaults to False.
+        """
+        with self._cond:
+            self.waiting[large] += 1
+            try:
+                self._cond.wait_for(lambda: self._can_start(large))
+            finally:
+                self.waiting[large] -= 1
+            self._start(large)
+
+    def release(self, latency: float = None, throttled: bool = False, large: bool = False) -> None:
+        """Mark a request as finished.
+
+        Args:
+            latency (float, optional): The request latency in seconds, if it succeeded.
+            throttled (bool, optional): Whether the server throttled the request or it timed out.
+            large (bool, optional): The value passed to acquire. Defaults to False.
+        """
+        with self._cond:
+            self._finish(latency, throttled, large)
+            self._cond.notify_all()
+
+
+class AsyncAdaptiveConcurrency(AdaptiveConcurrency):
+    """AdaptiveConcurrency for asyncio code, where acquire and release are coroutines."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: int = None, reserved: int = 0):
+        import asyncio
+
+        super().__init__(max_limit, min_limit, initial, reserved)
+        self._async_cond = asyncio.Condition()
+
+    async def acquire(self, large: bool = False) -> None:
+        async with self._async_cond:
+            self.waiting[large] += 1
+            try:
+                await self._async_cond.wait_for(lambda: self._can_start(large))
+            finally:
+                self.waiting[large] -= 1
+            self._start(large)
+
+    async def release(self, latency: float = None, throttled: bool = False, large: bool = False) -> None:
+        async with self._async_cond:
+            with self._lock:
+                self._finish(latency, throttled, large)
+            self._async_cond.notify_all()
+
+
+class ByteBudget:
+    """Cap on the total size of the request bodies in flight.
+
+    Every large upload reserves the size of its file before opening it and
+    gives it back once the response arrived, so however many workers run, no
+    more than ``limit`` bytes of large files are being sent at a time.
+    Reservations are granted first come, first served, so a large file is not
+    starved by smaller ones; a file larger than the whole budget is sent alone.
+    """
+
+    def __init__(self, limit: int):
+        """Create the budget.
+
+        Args:
+            limit (int): The most bytes in flight at once.
+        """
+        self.limit = max(1, int(limit))
+        self.in_flight = 0
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    def _fits(self, size: int) -> bool:
+        return self.in_flight == 0 or self.in_flight + size <= self.limit
+
+    def _can_start(self, ticket, size: int) -> bool:
+        return self._waiting[0] is ticket and self._fits(size)
+
+    def fits(self, size: int) -> bool:
+        """Whether ``size`` bytes could be reserved without waiting."""
+        with self._cond:
+            return not self._waiting and self._fits(size)
+
+    def acquire(self, size: int) -> None:
+        """Block until ``size`` bytes fit in the budget, then reserve them."""
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            self._cond.wait_for(lambda: self._can_start(ticket, size))
+            self._waiting.remove(ticket)
+            self.in_flight += size
+            self._cond.notify_all()
+
+    def release(self, size: int) -> None:
+        """Give back a reservation made by acquire."""
+        with self._cond:
+            self.in_flight -= size
+            self._cond.notify_all()
+
+
+class AsyncByteBudget(ByteBudget):
+    """ByteBudget for asyncio code, where acquire and release are coroutines."""
+
+    def __init__(self, limit: int):
+        import asyncio
+
+        super().__init__(limit)
+        self._async_cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        ticket = object()
+        async with self._async_cond:
+            self._waiting.append(ticket)
+            try:
+                await self._async_cond.wait_for(lambda: self._can_start(ticket, size))
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._async_cond.notify_all()
+                raise
+            self._waiting.remove(ticket)
+            self.in_flight += size
+            self._async_cond.notify_all()
+
+    async def release(self, size: int) -> None:
+        async with self._async_cond:
+            self.in_flight -= size
+            self._async_cond.notify_all()
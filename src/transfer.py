@@ -0,0 +1,296 @@
+import heapq
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+
+
+DEFAULT_JOBS = 8
+QUEUE_FACTOR = 4
+SMALL_FILE_SIZE = 1024 * 1024  # Files below this go to the small-file lane
+SMALL_LANE_SHARE = 0.25  # Share of the workers that take small files first
+PENDING_TRANSFERS = 4096  # Transfers a streamed listing may queue ahead of the workers
+
+
+def small_lane_workers(jobs: int) -> int:
+    """How many of ``jobs`` workers serve the small-file lane first."""
+    return max(1, round(jobs * SMALL_LANE_SHARE)) if jobs > 1 else 0
+
+
+class SizeLanes:
+    """Transfers ordered by size, in a lane of large files and one of small files.
+
+    Large files are handed out largest first, so the longest transfers start
+    early instead of stretching the tail of the run. Small files are handed
+    out in the order they were added from a lane of their own, which a share
+    of the workers serves first, so a burst of small files does not wait
+    behind the large ones. A worker whose lane is empty takes from the other.
+
+    Transfers can be added while workers are already taking them, for example
+    as a remote listing comes in; each worker then gets the largest file
+    known so far. pop blocks until a transfer is added or close is called;
+    with ``max_pending``, add blocks while that many transfers are waiting, so
+    a listing of any size is held in bounded memory.
+    """
+
+    def __init__(self, small_size: int = SMALL_FILE_SIZE, max_pending: int = None):
+        """Create empty lanes.
+
+        Args:
+            small_size (int, optional): Files below this many bytes are small. Defaults to SMALL_FILE_SIZE.
+            max_pending (int, optional): How many transfers may wait in the lanes. Defaults to no limit.
+        """
+        self.small_size = small_size
+        self.max_pending = max_pending
+        self.total = 0
+        self.total_bytes = 0
+        self.closed = False
+        self._large = []  # Heap of (-size, order, size, task)
+        self._small = deque()
+        self._cond = threading.Condition()
+
+    def add(self, task: tuple, size: int) -> None:
+        """Add a transfer.
+
+        Args:
+            task (tuple): The argument tuple of the transfer.
+            size (int): Its size in bytes.
+        """
+        with self._cond:
+            while self._full():
+                self._cond.wait()
+            self._push(task, size)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Mark that no more transfers will be added."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def pop(self, small_first: bool = False, fits=None) -> tuple | None:
+        """Take the next transfer, from the small-file lane first if asked.
+
+        Args:
+            small_first (bool, optional): Whether to serve the small-file lane first. Defaults to False.
+            fits (callable, optional): Tells whether a large file of the given size can start
+                right away; if not, a small file is taken instead while there is one.
+
+        Returns:
+            tuple | None: (size, argument tuple), or None once the lanes are
+            closed and empty.
+        """
+        with self._cond:
+            while True:
+                item = self._take(small_first, fits)
+                if item is not None:
+                    self._cond.notify_all()
+                    return item
+                if self.closed:
+                    return None
+                self._cond.wait()
+
+    # The helpers below are shared with AsyncSizeLanes and expect its lock held
+
+    def _full(self) -> bool:
+        return bool(self.max_pending) and len(self._large) + len(self._small) >= self.max_pending
+
+    def _push(self, task: tuple, size: int) -> None:
+        if size >= self.small_size:
+            heapq.heappush(self._large, (-size, self.total, size, task))
+        else:
+            self._small.append((size, task))
+        self.total += 1
+        self.total_bytes += size
+
+    def _take(self, small_first: bool, fits) -> tuple | None:
+        """The next transfer, see pop, or None if both lanes are empty."""
+        if self._small and (
+            small_first or not self._large or (fits is not None and not fits(self._large[0][2]))
+        ):
+            return self._small.popleft()
+        if self._large:
+            _, _, size, task = heapq.heappop(self._large)
+            return size, task
+        return None
+
+
+class AsyncSizeLanes(SizeLanes):
+    """SizeLanes for asyncio code, where add, close and pop are coroutines."""
+
+    def __init__(self, small_size: int = SMALL_FILE_SIZE, max_pending: int = None):
+        import asyncio
+
+        super().__init__(small_size, max_pending)
+        self._async_cond = asyncio.Condition()
+
+    async def add(self, task: tuple, size: int) -> None:
+        async with self._async_cond:
+            await self._async_cond.wait_for(lambda: not self._full())
+            self._push(task, size)
+            self._async_cond.notify_all()
+
+    async def close(self) -> None:
+        async with self._async_cond:
+            self.closed = True
+            self._async_cond.notify_all()
+
+    async def pop(self, small_first: bool = False, fits=None) -> tuple | None:
+        async with self._async_cond:
+            while True:
+                item = self._take(small_first, fits)
+                if item is not None:
+                    self._async_cond.notify_all()
+                    return item
+                if self.closed:
+                    return None
+                await self._async_cond.wait()
+
+
+class TransferExecutor:
+    """Fixed pool of worker threads fed from a bounded queue.
+
+    Every upload, download and delete of a Session goes through one executor,
+    so the number of threads and open sockets is set by ``jobs`` rather than
+    by the number of files in a tree.
+    """
+
+    def __init__(self, jobs: int = DEFAULT_JOBS, queue_size: int = None):
+        """Create the executor. Workers are started lazily on first submit.
+
+        Args:
+            jobs (int, optional): Number of worker threads. Defaults to DEFAULT_JOBS.
+            queue_size (int, optional): Maximum number of pending tasks.
+                Defaults to QUEUE_FACTOR * jobs.
+        """
+        self.jobs = max(1, int(jobs))
+        self._queue = queue.Queue(maxsize=queue_size or self.jobs * QUEUE_FACTOR)
+        self._workers: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.jobs):
+                worker = threading.Thread(
+                    target=self._work, name=f"igem-transfer-{i}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                return
+            future, fn, args = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:  # exit() inside a task must not kill the worker
+                    future.set_exception(e)
+            self._queue.task_done()
+
+    def submit(self, fn, *args) -> Future:
+        """Schedule ``fn(*args)`` on the pool.
+
+        Blocks while the queue is full, which keeps producers from running
+        ahead of the workers.
+
+        Args:
+            fn (callable): The function to run.
+            *args: Positional arguments for ``fn``.
+
+        Returns:
+            Future: The future holding the result of the call.
+
+        Raises:
+            RuntimeError: If the executor has been shut down.
+        """
+        if self._shutdown:
+            raise RuntimeError("TransferExecutor has been shut down")
+        self._start_workers()
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def map(self, fn, iterable, callback=None) -> list[Future]:
+        """Run ``fn`` for each argument tuple in ``iterable`` and wait for all of them.
+
+        Args:
+            fn (callable): The function to run.
+            iterable (iterable): Argument tuples, one per call.
+            callback (callable, optional): Called with each future once it is done.
+
+        Returns:
+            list[Future]: The completed futures, in submission order.
+        """
+        futures = []
+        for args in iterable:
+            future = self.submit(fn, *args)
+            if callback is not None:
+                future.add_done_callback(callback)
+            futures.append(future)
+        wait(futures)
+        return futures
+
+    def map_by_size(self, fn, lanes: SizeLanes, tasks=None, callback=None, fits=None) -> list[Future]:
+        """Run ``fn`` for each transfer of ``lanes`` and wait for all of them.
+
+        One runner per worker takes transfers from the lanes as it becomes
+        free, small_lane_workers of them from the small-file lane first.
+        ``fn`` must not submit to this executor.
+
+        Args:
+            fn (callable): The function to run.
+            lanes (SizeLanes): The transfers.
+            tasks (iterable, optional): (argument tuple, size) pairs to add to
+                the lanes while the runners work, after which the lanes are closed.
+                Without it, ``lanes`` must already be closed.
+            callback (callable, optional): Called with each future once it is done.
+            fits (callable, optional): Passed on to SizeLanes.pop.
+
+        Returns:
+            list[Future]: The completed futures, in the order they were started.
+        """
+        futures = []
+        lock = threading.Lock()
+
+        def run(small_first):
+            while (item := lanes.pop(small_first, fits)) is not None:
+                future = Future()
+                if callback is not None:
+                    future.add_done_callback(callback)
+                with lock:
+                    futures.append(future)
+                future.set_running_or_notify_cancel()
+                try:
+                    future.set_result(fn(*item[1]))
+                except BaseException as e:  # See _work
+                    future.set_exception(e)
+
+        small_workers = small_lane_workers(self.jobs)
+        runners = [self.submit(run, i < small_workers) for i in range(self.jobs)]
+        if tasks is not None:
+            try:
+                for task, size in tasks:
+                    lanes.add(task, size)
+            finally:
+                lanes.close()
+        wait(runners)
+        return futures
+
+    def shutdown(self) -> None:
+        """Stop the workers after the queued tasks have finished."""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
@@ -1,19 +1,69 @@
 import httpx
-import mimetypes
+import itertools
+import json
 import os
-import prettytable as pt
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sys import exit
+from typing import TYPE_CHECKING
 import warnings
-from tqdm import tqdm
+from src.transfer import (
+    DEFAULT_JOBS,
+    PENDING_TRANSFERS,
+    SMALL_FILE_SIZE,
+    SizeLanes,
+    TransferExecutor,
+    small_lane_workers,
+)
+from src.pool import ConnectionPool, DEFAULT_API_POOL, static_pool_defaults
+from src.cache import ListingCache
+from src.catalog import Catalog, glob_base, print_matches
+from src.crawler import crawl
+from src.journal import DEFAULT_JOURNAL_DIR, Journal
+from src.walk import walk_local
+from src.stats import Recorder
+from src.auth_cache import EXPIRED_STATUS, SessionCache, restore_cookies
+from src.validators import ValidatorStore
+from src.throttle import (
+    AdaptiveConcurrency,
+    ByteBudget,
+    DEFAULT_INFLIGHT_MB,
+    MAX_RETRIES,
+    RETRY_STATUSES,
+    THROTTLE_STATUSES,
+    retry_delay,
+)
+
+if TYPE_CHECKING:
+    from src.optimize import Optimizer
 
 
 NOT_LOGGED_IN = 0
 LOGGED_IN = 1
 LOGIN_FAILED = -1
-TIMEOUT = 30
+# No limit on the wait for a pooled connection: the pools already cap the requests in flight,
+# and a wait behind a long transfer is not a stalled server
+TIMEOUT = httpx.Timeout(30, pool=None)
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+PART_INFO_SUFFIX = ".json"  # Next to the part file, see part_info
 STATIC_URL_PREFIX = "https://static.igem.wiki/teams/"
+STATIC_HEADERS = {
+    "Host": "static.igem.wiki",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/png,image/svg+xml,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br, zstd",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "cross-site",
+    "Priority": "u=0, i",
+    "TE": "trailers",
+}
 
 def check_parameter(directory: str) -> None:
     """Check if the directory parameter is valid.
@@ -31,15 +81,695 @@ def check_parameter(directory: str) -> None:
         exit(1)
 
 
-class Session:
-    """Class to manage the session for interacting with the iGEM API."""
+def read_team_id(team_list: list) -> str:
+    """Pick the main team from a memberships response and report it.
+
+    Args:
+        team_list (list): The decoded response of /v1/teams/memberships/mine.
+
+    Returns:
+        str: The team ID of the main team.
+
+    Raises:
+        Warning: If the user is not part of any team or if their team or role is not accepted.
+    """
+    if len(team_list) == 0:
+        warnings.warn("Not joined any team")
+        exit(1)
+    main_team = team_list[0]["team"]
+    main_membership = team_list[0]["membership"]
+    team_id = main_team["id"]
+    team_name = main_team["name"]
+    team_status = main_team["status"]
+    team_year = main_team["year"]
+    team_role = main_membership["role"]
+    team_role_status = main_membership["status"]
+    print("Team:", team_id, team_name, team_year)
+    print("Role:", team_role)
+    if team_status != "accepted":
+        warnings.warn("Your team is not accepted")
+    if team_role_status != "accepted":
+        warnings.warn("Your team role is not accepted")
+    return team_id
+
+
+def listing_contents(res: dict, directory: str, team_id, output: bool = True) -> list:
+    """Turn a directory listing response into a list of items.
+
+    Args:
+        res (dict): The decoded listing response.
+        directory (str): The directory that was listed.
+        team_id: The team ID, used to shorten folder keys.
+        output (bool, optional): Whether to print the listing as a table. Defaults to True.
+
+    Returns:
+        list: The folders, then the files. When printed, they are sorted by
+        name, and the files by type and name; otherwise they keep the order
+        of the response and no table is built.
+
+    Raises:
+        Warning: If the response is malformed.
+    """
+    if res["KeyCount"] > 0:
+        folders = res.get("CommonPrefixes") or []
+        files = res.get("Contents") or []
+        if not output:
+            return folders + files
+        contents = sorted(folders, key=lambda x: x["Name"]) + sorted(files, key=lambda x: (x["Type"], x["Name"]))
+        import prettytable as pt
+
+        table = pt.PrettyTable()
+        table.field_names = ["Type", "Name", "DirectoryKey/FileURL"]
+        for item in contents:
+            if item["Type"] == "Folder":
+                table.add_row(
+                    [
+                        "Folder",
+                        item["Name"],
+                        item["Key"].split(f"teams/{team_id}/")[-1],
+                    ]
+                )
+            else:
+                table.add_row(
+                    ["File-" + item["Type"], item["Name"], item["Location"]]
+                )
+        print(table)
+        print(f"'{directory if directory != "" else "/"}' found: {res["KeyCount"]}")
+        return contents
+    elif res["KeyCount"] == 0:
+        if output:
+            print(f"'{directory if directory != "" else "/"}'" , "found: 0")
+        return []
+    else:
+        warnings.warn("Query failed")
+        return []
+
+
+def next_page(res: dict) -> dict | None:
+    """The query parameters for the page after a listing response, or None if it was the last.
+
+    Follows an S3 ListObjectsV2 continuation token, or a ListObjects marker
+    (given, or the last key of a truncated page).
+    """
+    if res.get("NextContinuationToken"):
+        return {"continuation-token": res["NextContinuationToken"]}
+    if not res.get("IsTruncated"):
+        return None
+    if res.get("NextMarker"):
+        return {"marker": res["NextMarker"]}
+    keys = [item["Key"] for item in (res.get("CommonPrefixes") or []) + (res.get("Contents") or [])]
+    return {"marker": max(keys)} if keys else None
+
+
+def part_info(headers) -> dict:
+    """What identifies the file a download started writing to its part file.
+
+    Returns:
+        dict: "if_range", a strong ETag or else the Last-Modified date to resume
+        with (None if the response had neither), and "size", the total length
+        of the file if the response states it unencoded.
+    """
+    etag = headers.get("ETag")
+    if etag and etag.startswith("W/"):
+        etag = None  # If-Range only accepts strong ETags
+    length = headers.get("Content-Range", "").rpartition("/")[2] or headers.get("Content-Length")
+    encoded = headers.get("Content-Encoding", "identity") != "identity"
+    return {
+        "if_range": etag or headers.get("Last-Modified"),
+        "size": int(length) if length and length.isdigit() and not encoded else None,
+    }
+
+
+def read_part_info(part_path: str) -> dict | None:
+    """The part_info saved next to a part file, None if there is none."""
+    try:
+        with open(part_path + PART_INFO_SUFFIX, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_part_info(part_path: str, info: dict) -> None:
+    with open(part_path + PART_INFO_SUFFIX, "w") as f:
+        json.dump(info, f)
+
+
+def discard_part(part_path: str) -> None:
+    """Remove a part file and its part_info, if they exist."""
+    for path in (part_path, part_path + PART_INFO_SUFFIX):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def resume_request(part_path: str, conditional: dict = None) -> tuple[int, dict | None, dict | None]:
+    """How to request the rest of a partial download.
+
+    A part file without a validator to resume with is discarded, as nothing
+    proves the remote file is still the same.
+
+    Args:
+        part_path (str): The partial file.
+        conditional (dict, optional): If-None-Match/If-Modified-Since headers,
+            sent unless the download is resumed.
+
+    Returns:
+        tuple: The size of the part file, its part_info and the request headers.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    info = read_part_info(part_path) if offset > 0 else None
+    if offset > 0 and (info is None or not info.get("if_range")):
+        discard_part(part_path)
+        offset = 0
+    if offset == 0:
+        return 0, None, conditional
+    return offset, info, {"Range": f"bytes={offset}-", "Accept-Encoding": "identity", "If-Range": info["if_range"]}
+
+
+def part_write_mode(response: httpx.Response, part_path: str, offset: int, info: dict | None) -> str | None:
+    """What to do with the response to a resume_request.
+
+    Args:
+        response (httpx.Response): The response, with its body not yet read.
+        part_path (str): The partial file.
+        offset (int): The size of the part file, from resume_request.
+        info (dict | None): Its part_info, from resume_request.
+
+    Returns:
+        str | None: "wb" or "ab", the mode to write the body to the part file
+        in, after saving the part_info of a download that starts over;
+        "complete" if the part file already holds the whole file; "restart" if
+        the part file was discarded and the file has to be requested again;
+        None if the response is not the file, e.g. a 304 or an error.
+    """
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 416 and offset > 0:
+        if content_range == f"bytes */{offset}" and info.get("size") in (None, offset):
+            # The previous run stopped after the last byte but before renaming
+            return "complete"
+        discard_part(part_path)
+        return "restart"
+    if response.status_code == 206 and (
+        not content_range.startswith(f"bytes {offset}-")
+        or (offset > 0 and info.get("size") is not None and content_range.rsplit("/", 1)[-1] != str(info["size"]))
+    ):
+        # Not the rest of the file the part was started from
+        discard_part(part_path)
+        return "restart"
+    if response.status_code not in (200, 206):
+        return None
+
+    mode = "ab" if response.status_code == 206 and offset > 0 else "wb"
+    if mode == "wb":
+        write_part_info(part_path, part_info(response.headers))
+    return mode
+
+
+def local_size(file_path: str) -> int:
+    """The size of a local file, 0 if it cannot be read."""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def remote_size(item: dict = None) -> int:
+    """The size of a file from its listing item, 0 if unknown."""
+    return int(item.get("Size") or 0) if item else 0
+
+
+def byte_progress(total: int, desc: str):
+    """A progress bar counting bytes, so its rate and ETA follow the data moved rather than the files."""
+    from tqdm import tqdm
+
+    return tqdm(total=total, desc=desc, unit="B", unit_scale=True, unit_divisor=1024)
+
+
+def folder_levels(folders: list) -> list:
+    """Group folder items by depth, deepest level first.
+
+    Args:
+        folders (list): (parent directory, item) pairs of folders.
+
+    Returns:
+        list: Lists of (parent directory, item) pairs, one per depth.
+    """
+    levels = {}
+    for current_dir, item in folders:
+        depth = len([part for part in current_dir.split("/") if part])
+        levels.setdefault(depth, []).append((current_dir, item))
+    return [levels[depth] for depth in sorted(levels, reverse=True)]
+
 
-    def __init__(self):
-        self.client = httpx.Client(http2=True)
+def has_failed_below(folder_path: str, failed: list) -> bool:
+    """Whether any of the failed (parent directory, item) pairs lies inside a folder."""
+    folder_path = folder_path.strip("/") + "/"
+    return any((current_dir.strip("/") + "/").startswith(folder_path) for current_dir, _ in failed)
+
+
+class BaseSession:
+    """The state and request handling Session and AsyncSession share.
+
+    Nothing here waits on the network: it builds requests, takes in their
+    responses and keeps the paths, journals and signed-in state. The two
+    sessions only differ in how they send requests and run transfers.
+    """
+
+    def __init__(self, client, static, optimizer: "Optimizer" = None, recorder: Recorder = None):
+        """Set up the state shared by both sessions.
+
+        Args:
+            client: The connection pool for api.igem.org.
+            static: The connection pool for static.igem.wiki.
+            optimizer (Optimizer, optional): Transcodes assets before they are uploaded.
+            recorder (Recorder, optional): Receives the timing of every request and retry.
+        """
+        self.client = client
+        self.static = static
+        self.validators = ValidatorStore()
+        self.catalog = Catalog()
+        self.journal_dir = DEFAULT_JOURNAL_DIR
+        self.optimizer = optimizer
+        self.recorder = recorder
+        self.client.recorder = self.static.recorder = recorder
+        self._credentials = None
+        self._session_cache = None
+        self._auth_generation = 0
+        self._signed_in_again = False
         self.status = NOT_LOGGED_IN
         self.team_id = ""
         self.url = ""
 
+    def _team_url(self, filename: str = "") -> str:
+        """The API URL of the team's files, or of one of them."""
+        url = f"https://api.igem.org/v1/websites/teams/{self.team_id}"
+        return f"{url}/{filename}" if filename else url
+
+    @staticmethod
+    def _directory_params(directory: str) -> dict | None:
+        """The query parameters that point a request at a remote directory."""
+        return {"directory": directory} if directory != "" else None
+
+    @staticmethod
+    def _check_directory(directory: str) -> None:
+        """Stop on a malformed target directory, see check_parameter, or on '/'."""
+        check_parameter(directory)
+        if directory == "/":
+            warnings.warn(
+                "You specified '/' as a directory name, which may cause unknown errors"
+            )
+            exit(1)
+
+    def _check_logged_in(self) -> None:
+        if self.status != LOGGED_IN:
+            warnings.warn("Not logged in, please login first")
+            exit(1)
+
+    def _claim_sign_in(self, generation: int) -> bool | None:
+        """Decide what a request that got a 401 does. Call with the auth lock held.
+
+        Args:
+            generation (int): The sign-in generation the request was sent with.
+
+        Returns:
+            bool | None: True if it has to sign in again, its cookies are then
+            cleared; False if another request already did and it only has to
+            be sent again; None if this session already signed in again once,
+            so the 401 stands.
+        """
+        if self._auth_generation != generation:
+            return False
+        if self._signed_in_again:
+            return None
+        self._signed_in_again = True
+        self.client.client.cookies.clear()
+        return True
+
+    def _restore_session(self, username: str, password: str, cache: SessionCache = None) -> bool:
+        """Keep the credentials and put back the session ``cache`` saved for ``username``.
+
+        Returns:
+            bool: Whether a saved session was restored, otherwise the session has to sign in.
+        """
+        self._credentials = (username, password)
+        self._session_cache = cache
+        saved = cache.load(username) if cache is not None else None
+        if saved is None:
+            return False
+        restore_cookies(self.client.client.cookies, saved["cookies"])
+        self.team_id = saved["team_id"]
+        self.url = saved["url"]
+        self.status = LOGGED_IN
+        print("Team:", self.team_id, "(saved session)")
+        return True
+
+    def _check_sign_in(self, response: httpx.Response) -> None:
+        """Stop if the sign-in response rejects the credentials.
+
+        Raises:
+            httpx.HTTPStatusError: If the response is an error.
+        """
+        response.raise_for_status()  # Raises an HTTPStatusError for bad responses (4xx and 5xx)
+        if "Invalid credentials" in response.text:
+            self.status = LOGIN_FAILED
+            warnings.warn("Invalid credentials")
+            exit(1)
+
+    def _signed_in(self, username: str, team_id) -> None:
+        """Take in a sign-in that succeeded, team lookup included, saving the session if a cache is set."""
+        self.team_id = team_id
+        self.url = STATIC_URL_PREFIX + str(self.team_id) + '/'
+        self.status = LOGGED_IN
+        self._auth_generation += 1
+        if self._session_cache is not None:
+            self._session_cache.save(username, self.team_id, self.url, self.client.client.cookies)
+
+    def _sign_in_failed(self, message: str) -> None:
+        self.status = LOGIN_FAILED
+        warnings.warn(message)
+        exit(1)
+
+    def _listing_params(self, directory: str, page: dict = None) -> dict | None:
+        """The query parameters of a listing page, see next_page."""
+        return {**(self._directory_params(directory) or {}), **(page or {})} or None
+
+    def _take_listing(self, directory: str, page: dict, response: httpx.Response) -> dict | None:
+        """Decode a listing response and add it to the catalog.
+
+        Returns:
+            dict | None: The decoded listing, or None if the request failed.
+        """
+        if response.status_code != 200:
+            warnings.warn(f"Query failed with status code: {response.status_code}.")
+            return None
+        listing = response.json()
+        self.catalog.store(self.team_id, directory, listing, page is None, next_page(listing) is None)
+        return listing
+
+    def _query_result(self, directory: str, items: list, output: bool) -> list:
+        """The result of query for the items of every page, printed if ``output``."""
+        if not output:
+            return items
+        folders = [item for item in items if item["Type"] == "Folder"]
+        files = [item for item in items if item["Type"] != "Folder"]
+        res = {"KeyCount": len(items), "CommonPrefixes": folders, "Contents": files}
+        return listing_contents(res, directory, self.team_id, output)
+
+    @staticmethod
+    def _search_scope(pattern: str, directory: str) -> tuple[str, bool]:
+        """The directory search has to crawl for a glob, and whether to descend below it."""
+        base = glob_base(pattern)
+        rest = pattern[len(base):].lstrip("/")
+        # Only descend when the rest of the pattern can match below its first level
+        return os.path.join(directory.strip("/"), base).strip("/"), "/" in rest or "**" in rest
+
+    def _search_matches(self, pattern: str, directory: str, output: bool) -> list:
+        matches = self.catalog.glob(self.team_id, pattern, directory)
+        if output:
+            print_matches(matches, pattern)
+        return matches
+
+    def _upload_source(self, file_path: str, dest_dir: str) -> tuple[Path, str | None, int]:
+        """Check an upload and describe its file.
+
+        Returns:
+            tuple: The path of the file, its MIME type, if known, and its size.
+
+        Raises:
+            Warning: If the target directory or the file path is invalid.
+        """
+        import mimetypes
+
+        self._check_directory(dest_dir)
+        path_to_file = Path(file_path)
+        if not path_to_file.is_file():
+            warnings.warn("Invalid file path: " + file_path)
+            exit(1)
+        return path_to_file, mimetypes.guess_type(file_path, True)[0], path_to_file.stat().st_size
+
+    def _uploaded(self, res: httpx.Response, dest_dir: str, path_to_file: Path, size: int, output: bool) -> str | None:
+        """Take in the response to an upload.
+
+        Returns:
+            str | None: The file URL of the uploaded file, None if the upload failed.
+        """
+        self.listings.invalidate(dest_dir)
+        if res.status_code == 201:
+            self.catalog.add_file(self.team_id, dest_dir, path_to_file.name, res.text, size)
+            if output:
+                print(f"'{path_to_file.name}' uploaded {res.text}")
+            return res.text
+        else:
+            warnings.warn(f"Upload '{path_to_file.name}' failed {res.text}")
+
+    def _upload_tasks(self, local_dir: str, dest_dir: str, recursive: bool):
+        """Check a directory upload and start walking the directory, see walk_local.
+
+        Returns:
+            tuple | None: The remote directory the files go to and a generator of
+            (local file path, remote directory) pairs, or None if there is nothing to upload.
+
+        Raises:
+            Warning: If the target directory or the directory path is invalid.
+        """
+        self._check_directory(dest_dir)
+        path_to_dir = Path(local_dir)
+        if not path_to_dir.is_dir():
+            warnings.warn(f"Invalid directory path: '{local_dir}'")
+            exit(1)
+
+        local_files = walk_local(local_dir, recursive)
+        first = next(local_files, None)
+        if first is None:
+            print(f"Directory '{local_dir}' is empty")
+            return None
+
+        remote_base_dir = dest_dir if dest_dir else path_to_dir.name
+        return remote_base_dir, (
+            (file_path, os.path.join(remote_base_dir, relative_dir))
+            for file_path, relative_dir in itertools.chain([first], local_files)
+        )
+
+    def _upload_journal(self, local_dir: str, remote_base_dir: str, resume: bool) -> Journal:
+        return Journal(
+            "upload", os.path.abspath(local_dir), f"{self.team_id}/{remote_base_dir}", resume, self.journal_dir
+        )
+
+    def _download_journal(self, remote_dir: str, target_dir: str, resume: bool) -> Journal:
+        return Journal(
+            "download", f"{self.team_id}/{remote_dir}", os.path.abspath(target_dir), resume, self.journal_dir
+        )
+
+    def _delete_journal(self, directory: str, resume: bool) -> Journal:
+        return Journal("delete", f"{self.team_id}/{directory}", "", resume, self.journal_dir)
+
+    @staticmethod
+    def _plan_upload(journal: Journal | None, file_path: str, remote_dir_path: str) -> str | None:
+        """Journal an upload about to be scheduled.
+
+        Returns:
+            str | None: The URL recorded by the resumed run if it already uploaded
+            the file, which is then not planned again.
+        """
+        if journal is None:
+            return None
+        record = journal.is_done(os.path.abspath(file_path))
+        if record is not None:
+            return record["url"]
+        journal.plan(os.path.abspath(file_path), directory=remote_dir_path)
+        return None
+
+    @staticmethod
+    def _plan_download(journal: Journal | None, task: tuple) -> bool:
+        """Journal a download about to be scheduled.
+
+        Returns:
+            bool: False if the resumed run already downloaded the file, which is then not planned again.
+        """
+        if journal is None:
+            return True
+        if journal.is_done(task[0]):
+            return False
+        journal.plan(task[0], directory=task[1])
+        return True
+
+    @staticmethod
+    def _plan_delete(journal: Journal, folders: list, recursive: bool, current_dir: str, item: dict) -> bool:
+        """Sort out an item crawled by delete_dir.
+
+        Folders are kept in ``folders`` to be deleted once the files are gone.
+
+        Returns:
+            bool: Whether the item is a file to delete now, which is then planned.
+        """
+        if item["Type"] == "Folder":
+            if recursive:
+                folders.append((current_dir, item))
+            return False
+        if journal.is_done(os.path.join(current_dir, item["Name"])):
+            return False  # Deleted by the resumed run, listed from a stale cache
+        journal.plan(os.path.join(current_dir, item["Name"]))
+        return True
+
+    @staticmethod
+    def _ready_folders(journal: Journal, level: list, failed: list) -> list:
+        """Plan the folders of one level of delete_dir.
+
+        A folder with anything below it that could not be deleted is kept,
+        recorded as failed and added to ``failed``.
+
+        Returns:
+            list: The (parent directory, item) pairs of the folders to delete.
+        """
+        ready = []
+        for current_dir, item in level:
+            journal.plan(os.path.join(current_dir, item["Name"]))
+            if has_failed_below(os.path.join(current_dir, item["Name"]), failed):
+                journal.failed(os.path.join(current_dir, item["Name"]), "not empty")
+                failed.append((current_dir, item))
+            else:
+                ready.append((current_dir, item))
+        return ready
+
+    @staticmethod
+    def _record(journal: Journal | None, key: str, done: bool, error: str, **fields) -> None:
+        """Record that an item completed, with ``fields``, or failed with ``error``, if there is a journal."""
+        if journal is None:
+            return
+        if done:
+            journal.done(key, **fields)
+        else:
+            journal.failed(key, error)
+
+    @staticmethod
+    def _check_delete_root(directory: str) -> None:
+        if directory == "":
+            warnings.warn(
+                "Trying to delete the root directory! Please specify a directory name instead."
+            )
+            exit(1)
+
+    def _deleted(self, res: httpx.Response, directory: str, filename: str, output: bool) -> bool:
+        """Take in the response to a delete.
+
+        Returns:
+            bool: True if the deletion was successful, False otherwise.
+        """
+        self.listings.invalidate(os.path.join(directory, filename), subtree=True)
+        if res.status_code == 200:
+            self.catalog.remove(self.team_id, os.path.join(directory, filename))
+            if output:
+                print(f"'{os.path.join(directory, filename)}' deleted")
+            return True
+        else:
+            warnings.warn(f"'{os.path.join(directory, filename)}' delete failed")
+            return False
+
+    @staticmethod
+    def _print_deleted(directory: str, successful_deletions: int, failed: list) -> None:
+        print(
+            f"Deleted '{os.path.join(directory, '')}' with {successful_deletions} items"
+            + (f", {len(failed)} failed" if failed else "")
+            + "\n"
+        )
+
+    def _download_paths(self, file_url: str, target_dir: str) -> tuple[str, str, str]:
+        """The full URL of a file to download, its local path and the path of its part file."""
+        if not file_url.startswith(STATIC_URL_PREFIX):
+            file_url = self.url + file_url
+        file_name = os.path.basename(file_url)  # get file name from url
+        file_path = os.path.join(target_dir, file_name)  # local file path
+
+        # Hidden, so an interrupted download is never picked up by upload_dir
+        part_path = os.path.join(target_dir, "." + file_name + PART_SUFFIX)
+        return file_url, file_path, part_path
+
+    def _up_to_date(self, file_path: str, file_url: str, item: dict, output: bool) -> tuple[dict | None, bool]:
+        """Look up the validators of a file to download.
+
+        Returns:
+            tuple: The validator entry of the local file, if any, and whether
+            the listing ``item`` shows the file unchanged, so it needs no request.
+        """
+        entry = self.validators.get(file_path, file_url)
+        if entry is not None and item is not None and self.validators.matches(entry, item):
+            if output:
+                print(f"'{file_path}' is up to date")
+            return entry, True
+        return entry, False
+
+    def _downloaded(
+        self, response: httpx.Response | None, file_url: str, file_path: str, part_path: str, item: dict, output: bool
+    ) -> bool:
+        """Take in the outcome of _download_to_part, moving a complete part file into place.
+
+        Returns:
+            bool: True if the local file is up to date, False otherwise.
+        """
+        if response is not None and response.status_code == 304:
+            self.validators.record(file_path, file_url, None, item)
+            if output:
+                print(f"'{file_path}' is up to date")
+            return True
+        elif response is None or response.status_code in (200, 206):
+            os.replace(part_path, file_path)
+            discard_part(part_path)
+            self.validators.record(file_path, file_url, response and response.headers, item)
+            if output:
+                print(f"Downloaded '{file_url}' to '{file_path}'")
+            return True
+        else:
+            print(
+                f"Failed to download '{file_url}': Response Header {response.headers}"
+            )
+            return False
+
+
+class Session(BaseSession):
+    """Class to manage the session for interacting with the iGEM API."""
+
+    def __init__(
+        self,
+        jobs: int = DEFAULT_JOBS,
+        api_pool: dict = None,
+        static_pool: dict = None,
+        optimizer: "Optimizer" = None,
+        recorder: Recorder = None,
+        max_inflight_mb: float = DEFAULT_INFLIGHT_MB,
+    ):
+        """Create a session.
+
+        Args:
+            jobs (int, optional): Number of parallel transfers. Defaults to DEFAULT_JOBS.
+            api_pool (dict, optional): Connection pool settings for api.igem.org.
+            static_pool (dict, optional): Connection pool settings for static.igem.wiki,
+                over a connection per transfer, see static_pool_defaults.
+            optimizer (Optimizer, optional): Transcodes assets in upload_files before they are sent.
+            recorder (Recorder, optional): Receives the timing of every request and retry.
+            max_inflight_mb (float, optional): Cap on the size of the files being uploaded at once,
+                in MiB. Defaults to DEFAULT_INFLIGHT_MB.
+        """
+        super().__init__(
+            ConnectionPool(api_pool, DEFAULT_API_POOL),
+            ConnectionPool(static_pool, static_pool_defaults(jobs), headers=STATIC_HEADERS),
+            optimizer,
+            recorder,
+        )
+        self.executor = TransferExecutor(jobs)
+        self.listings = ListingCache()
+        self.limiter = AdaptiveConcurrency(jobs, reserved=small_lane_workers(jobs))
+        self.upload_budget = ByteBudget(max_inflight_mb * 1024 * 1024)
+        self._auth_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Stop the transfer workers, save the download validators, close the catalog and the HTTP connection pools."""
+        self.executor.shutdown()
+        self.validators.save()
+        self.catalog.close()
+        self.client.close()
+        self.static.close()
+
     def _request(
         self,
         method: str,
@@ -47,33 +777,96 @@ class Session:
         params: dict = None,
         data: dict = None,
         files: dict = None,
+        large: bool = False,
     ) -> httpx.Response:
         """Make an HTTP request to the specified URL.
 
+        If the API rejects the session (401), for example because a saved
+        session expired, the session signs in again and repeats the request.
+        It signs in again at most once: should the new session be rejected
+        too, the 401 response is returned.
+
         Args:
             method (str): The HTTP method (e.g., 'GET', 'POST').
             url (str): The URL to send the request to.
             params (dict, optional): URL parameters to include in the request.
             data (dict, optional): Data to send in the body of the request.
             files (dict, optional): Files to upload.
+            large (bool, optional): Whether the body is a large file, see AdaptiveConcurrency.
 
         Returns:
             httpx.Response: The response object from the request.
 
         Raises:
             Warning: If the user is not logged in.
+            httpx.TransportError: If the last retry still failed to connect or timed out.
         """
-        if self.status != LOGGED_IN:
-            warnings.warn("Not logged in, please login first")
-            exit(1)
-        return self.client.request(
-            method=method, 
-            url=url, 
-            params=params, 
-            data=data, 
-            files=files, 
-            timeout=TIMEOUT
-        )
+        self._check_logged_in()
+        generation = self._auth_generation
+        response = self._send(method, url, params, data, files, large)
+        if response.status_code == EXPIRED_STATUS and self._credentials is not None:
+            with self._auth_lock:
+                # Only the first request to see the rejection signs in again
+                sign_in = self._claim_sign_in(generation)
+                if sign_in:
+                    self._sign_in(*self._credentials)
+            if sign_in is None:
+                return response
+            response = self._send(method, url, params, data, files, large)
+        return response
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data: dict = None,
+        files: dict = None,
+        large: bool = False,
+    ) -> httpx.Response:
+        """Send a request through the adaptive concurrency limiter.
+
+        Throttled (429/503), failed (5xx) and timed out requests are retried up
+        to MAX_RETRIES times with jittered exponential backoff, honouring the
+        Retry-After header.
+
+        Returns:
+            httpx.Response: The response object from the last attempt.
+
+        Raises:
+            httpx.TransportError: If the last retry still failed to connect or timed out.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire(large)
+            start = time.monotonic()
+            latency = None
+            throttled = False
+            # Exactly one release per acquire, whatever ends the attempt
+            try:
+                response = self.client.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    data=data,
+                    files=files,
+                    timeout=TIMEOUT
+                )
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    latency = time.monotonic() - start
+                    return response
+                throttled = response.status_code in THROTTLE_STATUSES
+                reason, retry_after = response.status_code, response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                throttled = isinstance(e, httpx.TimeoutException)
+                if attempt == MAX_RETRIES:
+                    raise
+                reason, retry_after = e, None
+            finally:
+                self.limiter.release(latency=latency, throttled=throttled, large=large)
+            delay = retry_delay(attempt, retry_after)
+            if self.recorder is not None:
+                self.recorder.retry(reason, attempt, delay)
+            time.sleep(delay)
 
     def _request_team_id(self) -> str:
         """Retrieve the team ID for the logged-in user.
@@ -89,61 +882,38 @@ class Session:
             params={"onlyAcceptedTeams": True},
             timeout=TIMEOUT,
         )
-        team_list = response.json()
-        if len(team_list) == 0:
-            warnings.warn("Not joined any team")
-            exit(1)
-        main_team = team_list[0]["team"]
-        main_membership = team_list[0]["membership"]
-        team_id = main_team["id"]
-        team_name = main_team["name"]
-        team_status = main_team["status"]
-        team_year = main_team["year"]
-        team_role = main_membership["role"]
-        team_role_status = main_membership["status"]
-        print("Team:", team_id, team_name, team_year)
-        print("Role:", team_role)
-        if team_status != "accepted":
-            warnings.warn("Your team is not accepted")
-        if team_role_status != "accepted":
-            warnings.warn("Your team role is not accepted")
-        return team_id
-
-    def login(self, username: str, password: str) -> None:
+        response.raise_for_status()
+        return read_team_id(response.json())
+
+    def login(self, username: str, password: str, cache: SessionCache = None) -> None:
         """Log in to the iGEM API.
 
         Args:
             username (str): Your username.
             password (str): Your password.
+            cache (SessionCache, optional): Where to reuse and keep the signed-in
+                session, so later runs can skip signing in.
 
         Raises:
             Warning: If the credentials are invalid.
         """
+        if not self._restore_session(username, password, cache):
+            self._sign_in(username, password)
+
+    def _sign_in(self, username: str, password: str) -> None:
+        """Sign in and look up the team, saving the session if a cache is set and both succeeded."""
         data = {"identifier": username, "password": password}
         try:
             print("Logging in...")
             response = self.client.post(
                 "https://api.igem.org/v1/auth/sign-in", data=data, timeout=TIMEOUT
             )
-            response.raise_for_status()  # Raises an HTTPStatusError for bad responses (4xx and 5xx)
-
-            if "Invalid credentials" in response.text:
-                self.status = LOGIN_FAILED
-                warnings.warn("Invalid credentials")
-                exit(1)
-            else:
-                self.status = LOGGED_IN
-                self.team_id = self._request_team_id()
-                self.url = STATIC_URL_PREFIX + str(self.team_id) + '/'
-
+            self._check_sign_in(response)
+            self._signed_in(username, self._request_team_id())
         except httpx.HTTPStatusError as http_err:
-            self.status = LOGIN_FAILED
-            warnings.warn(f"HTTP error occurred: {http_err}")
-            exit(1)
+            self._sign_in_failed(f"HTTP error occurred: {http_err}")
         except httpx.RequestError as req_err:
-            self.status = LOGIN_FAILED
-            warnings.warn(f"Request failed: {req_err}")
-            exit(1)
+            self._sign_in_failed(f"Request failed: {req_err}")
 
     def query(self, directory: str = "", output: bool = True) -> list:
         """Query files and directories in a specific directory.
@@ -153,58 +923,114 @@ class Session:
             output (bool, optional): Whether to print the query result. Defaults to True.
 
         Returns:
-            list: A list of files, each represented as a dictionary.
+            list: A list of files, each represented as a dictionary, from every page of the listing.
 
         Raises:
             Warning: If the query fails.
         """
-        check_parameter(directory)
-        response = self._request(
-            "GET",
-            f"https://api.igem.org/v1/websites/teams/{self.team_id}",
-            params={"directory": directory} if directory != "" else None,
-        )
-
-        # Check if the request was successful
-        if response.status_code != 200:
-            warnings.warn(f"Query failed with status code: {response.status_code}.")
+        items, page = self.listing_page(directory)
+        if items is None:
             return []
+        if page is not None:
+            items = items + list(self.listing_items(directory, page))
+        return self._query_result(directory, items, output)
 
-        res = response.json()
+    def listing_page(self, directory: str, page: dict = None) -> tuple[list | None, dict | None]:
+        """Fetch one page of a directory listing.
 
-        if res["KeyCount"] > 0:
-            contents = []
-            if res.get("CommonPrefixes", False):
-                contents.extend(sorted(res["CommonPrefixes"], key=lambda x: x["Name"]))
-            if res.get("Contents", False):
-                contents.extend(
-                    sorted(res["Contents"], key=lambda x: (x["Type"], x["Name"]))
-                )
-            table = pt.PrettyTable()
-            table.field_names = ["Type", "Name", "DirectoryKey/FileURL"]
-            for item in contents:
-                if item["Type"] == "Folder":
-                    table.add_row(
-                        [
-                            "Folder",
-                            item["Name"],
-                            item["Key"].split(f"teams/{self.team_id}/")[-1],
-                        ]
-                    )
-                else:
-                    table.add_row(
-                        ["File-" + item["Type"], item["Name"], item["Location"]]
-                    )
-            if output:
-                print(table)
-                print(f"'{directory if directory != "" else "/"}' found: {res["KeyCount"]}")
-            return contents
-        elif res["KeyCount"] == 0:
-            print(f"'{directory if directory != "" else "/"}'" , "found: 0")
-            return []
+        The first page goes through the listing cache, which only keeps
+        listings that fit in one page, so a large folder is never held whole.
+
+        Args:
+            directory (str): The directory to list.
+            page (dict, optional): The query parameters of the page, from next_page. Defaults to the first page.
+
+        Returns:
+            tuple[list | None, dict | None]: The items of the page, None if the
+            request failed, and the parameters of the next page, None after the last one.
+        """
+        check_parameter(directory)
+        if page is None:
+            res = self.listings.get(
+                directory.strip("/"), lambda: self._fetch_listing(directory), keep=lambda res: next_page(res) is None
+            )
         else:
-            warnings.warn("Query failed")
-            return []
+            res = self._fetch_listing(directory, page)
+        if res is None:
+            return None, None
+        return listing_contents(res, directory, self.team_id, False), next_page(res)
+
+    def listing_items(self, directory: str, page: dict = None):
+        """Iterate over the items of a directory listing, page by page.
+
+        The next page is requested on a helper thread while the items of the
+        current one are consumed, and only those two pages are held at a time.
+
+        Args:
+            directory (str): The directory to list.
+            page (dict, optional): The page to start from. Defaults to the first page.
+
+        Yields:
+            dict: Every folder and file of the listing, each page's folders first.
+        """
+        items, page = self.listing_page(directory, page)
+        if page is None:
+            yield from items or []
+            return
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="igem-page") as pool:
+            while True:
+                prefetch = pool.submit(self.listing_page, directory, page) if page is not None else None
+                yield from items or []
+                if prefetch is None:
+                    return
+                items, page = prefetch.result()
+
+    def _fetch_listing(self, directory: str, page: dict = None) -> dict | None:
+        """Request the listing of a directory, or one page of it, from the API.
+
+        Args:
+            directory (str): The directory to list.
+            page (dict, optional): The query parameters of the page, from next_page. Defaults to the first page.
+
+        Returns:
+            dict | None: The decoded listing, or None if the request failed.
+        """
+        response = self._request("GET", self._team_url(), params=self._listing_params(directory, page))
+        return self._take_listing(directory, page, response)
+
+    def locate(self, remote_path: str, output: bool = False) -> str | None:
+        """Look up the URL of a remote file in the catalog, listing its directory if it is not there.
+
+        Args:
+            remote_path (str): The remote file path, e.g. 'img/logo.png'.
+            output (bool, optional): Whether to print the URL. Defaults to False.
+
+        Returns:
+            str | None: The file URL, or None if the file does not exist.
+        """
+        url = self.catalog.url(self.team_id, remote_path)
+        if url is None:
+            for _ in self.listing_items(os.path.dirname(remote_path.strip("/"))):
+                pass
+            url = self.catalog.url(self.team_id, remote_path)
+        if output:
+            print(url if url is not None else f"'{remote_path}' not found")
+        return url
+
+    def search(self, pattern: str, directory: str = "", output: bool = False) -> list:
+        """Refresh the catalog below the literal part of a glob, then match the glob against it.
+
+        Args:
+            pattern (str): The glob, relative to ``directory``, e.g. '**/*.png'.
+            directory (str, optional): The directory to search in. Defaults to the root directory.
+            output (bool, optional): Whether to print the matches. Defaults to False.
+
+        Returns:
+            list: (path, item) pairs of the matching files, sorted by path.
+        """
+        for _ in crawl(self, *self._search_scope(pattern, directory), self.executor.jobs):
+            pass
+        return self._search_matches(pattern, directory, output)
 
     def upload_file(
         self, file_path: str, dest_dir: str = "", output: bool = False
@@ -222,111 +1048,127 @@ class Session:
         Raises:
             Warning: If the file path is invalid or the upload fails.
         """
-        check_parameter(dest_dir)
-        if dest_dir == "/":
-            warnings.warn(
-                "You specified '/' as a directory name, which may cause unknown errors"
-            )
-            exit(1)
-        path_to_file = Path(file_path)
-        if not path_to_file.is_file():
-            warnings.warn("Invalid file path: " + file_path)
-            exit(1)
-        mime_type = mimetypes.guess_type(file_path, True)[0]
-        files = {"file": (path_to_file.name, open(file_path, "rb"), mime_type)}
-        res = self._request(
-            "POST",
-            f"https://api.igem.org/v1/websites/teams/{self.team_id}",
-            params={"directory": dest_dir} if dest_dir != "" else None,
-            files=files,
-        )
-        if res.status_code == 201:
-            if output:
-                print(f"'{path_to_file.name}' uploaded {res.text}")
-            return res.text
-        else:
-            warnings.warn(f"Upload '{path_to_file.name}' failed {res.text}")
+        path_to_file, mime_type, size = self._upload_source(file_path, dest_dir)
+        # httpx streams the multipart body from the open file in chunks and
+        # rewinds it for retries; the handle only lives for this request.
+        # Small files skip the byte budget, jobs * SMALL_FILE_SIZE bounds them.
+        large = size >= SMALL_FILE_SIZE
+        if large:
+            self.upload_budget.acquire(size)
+        try:
+            with open(file_path, "rb") as file:
+                res = self._request(
+                    "POST",
+                    self._team_url(),
+                    params=self._directory_params(dest_dir),
+                    files={"file": (path_to_file.name, file, mime_type)},
+                    large=large,
+                )
+        finally:
+            if large:
+                self.upload_budget.release(size)
+        return self._uploaded(res, dest_dir, path_to_file, size, output)
 
-    def upload_dir(self, local_dir: str, dest_dir: str = "", recursive: bool = False) -> list:
+    def upload_dir(self, local_dir: str, dest_dir: str = "", recursive: bool = False, resume: bool = False) -> list:
         """Upload the contents of a directory to a specific remote path.
 
+        Files are uploaded while the directory is still being walked, skipping
+        hidden files and what an ``.igemignore`` excludes, see walk_local. The
+        upload is journaled, see Journal: a file that fails is recorded and
+        the others go on, and a resumed run only uploads the files left.
+
         Args:
             local_dir (str): Path of the directory to upload.
             dest_dir (str, optional): The target directory. Defaults to the root directory.
             recursive (bool, optional): Whether to upload subdirectories. Defaults to True.
+            resume (bool, optional): Whether to skip the files an earlier run of the
+                same upload completed. Defaults to False.
+
+        Returns:
+            list: The file URLs of the uploaded files.
 
         Raises:
             Warning: If the directory path is invalid.
         """
-        def collect_files_and_dirs(directory_path):
-            path_to_dir = Path(directory_path)
-            if not path_to_dir.is_dir():
-                return [], []
-
-            file_list = []
-            dir_list = []
-            for item in path_to_dir.iterdir():
-                if item.is_dir():
-                    dir_list.append(item)
-                    if recursive:  # Only collect subdirectories if recursive is True
-                        sub_files, sub_dirs = collect_files_and_dirs(item)
-                        file_list.extend(sub_files)
-                        dir_list.extend(sub_dirs)
-                elif not item.name.startswith("."):
-                    file_list.append(item)
-            return file_list, dir_list
-
-        check_parameter(dest_dir)
-        if dest_dir == "/":
-            warnings.warn(
-                "You specified '/' as a directory name, which may cause unknown errors"
-            )
-            exit(1)
-        path_to_dir = Path(local_dir)
-        if not path_to_dir.is_dir():
-            warnings.warn(f"Invalid directory path: '{local_dir}'")
-            exit(1)
-
-        all_files, all_dirs = collect_files_and_dirs(local_dir)
-
-        if not all_files and not all_dirs:
-            print(f"Directory '{local_dir}' is empty")
+        planned = self._upload_tasks(local_dir, dest_dir, recursive)
+        if planned is None:
             return []
+        remote_base_dir, upload_tasks = planned
 
-        lock = threading.Lock()
+        with self._upload_journal(local_dir, remote_base_dir, resume) as journal:
+            urls = self.upload_files(upload_tasks, journal)
 
-        self.successful_uploads = 0
-        def thread_upload(file_path, remote_dir_path):
-            try:
-                self.upload_file(file_path, remote_dir_path, False)
-                with lock:
-                    self.successful_uploads += 1
-                    pbar.update(1)  # Update progress bar
-            except Exception as e:
-                print(f"Error uploading '{file_path}': {e}")
+        print(f"Uploaded {len(urls)} files to '{os.path.join(dest_dir, '')}'\n")
+        return list(urls.values())
 
-        remote_base_dir = dest_dir if dest_dir else path_to_dir.name
+    def upload_files(self, files, journal: Journal = None) -> dict:
+        """Upload many files in parallel through the transfer executor.
 
-        # Use tqdm to create a progress bar
-        with tqdm(total=len(all_files), desc="Uploading files", unit="file") as pbar:
-            threads: list[threading.Thread] = []
-            for file_path in all_files:
-                relative_file_path = file_path.relative_to(local_dir)
-                remote_file_dir = os.path.join(remote_base_dir, relative_file_path.parent)
-                thread = threading.Thread(
-                    target=thread_upload,
-                    args=(str(file_path), remote_file_dir),
-                )
-                thread.start()
-                threads.append(thread)
+        The files are taken largest first, with a lane for small files, see
+        SizeLanes.
 
-            for thread in threads:
-                thread.join()
+        Args:
+            files (iterable): (local file path, remote directory) pairs. It is
+                consumed lazily, so uploads start while it is still being produced,
+                unless the optimizer needs all of them first.
+            journal (Journal, optional): Records every upload; the files it has
+                as done are not uploaded again and keep their recorded URL.
 
-        print(f"Uploaded {self.successful_uploads} files to '{os.path.join(dest_dir, '')}'\n")
+        Returns:
+            dict: The file URL of each uploaded file, keyed by local file path.
+            Failed uploads are left out.
+        """
+        lock = threading.Lock()
+        urls = {}
+        upload_paths = {}
+        if self.optimizer is not None:
+            files = list(files)
+            upload_paths = self.optimizer.optimize_many([file_path for file_path, _ in files])
+
+        def thread_upload(file_path, remote_dir_path, size):
+            url = None
+            error = "upload failed"
+            try:
+                url = self.upload_file(
+                    upload_paths.get(file_path, file_path), remote_dir_path, False
+                )
+                if url is not None:
+                    with lock:
+                        urls[file_path] = url
+            except (Exception, SystemExit) as e:
+                # SystemExit too: one bad file must not end the whole upload
+                print(f"Error uploading '{file_path}': {e}")
+                error = str(e) or type(e).__name__
+            finally:
+                self._record(journal, os.path.abspath(file_path), url is not None, error, url=url)
+                with lock:
+                    pbar.update(size)  # Update progress bar
+
+        def sized(tasks):
+            for file_path, remote_dir_path in tasks:
+                url = self._plan_upload(journal, file_path, remote_dir_path)
+                if url is not None:
+                    with lock:
+                        urls[file_path] = url
+                    continue
+                size = local_size(upload_paths.get(file_path, file_path))
+                with lock:
+                    pbar.total += size
+                    pbar.refresh()
+                yield (file_path, remote_dir_path, size), size
+
+        # Largest files first, progress in bytes
+        with byte_progress(0, "Uploading files") as pbar:
+            self.executor.map_by_size(
+                thread_upload,
+                SizeLanes(max_pending=PENDING_TRANSFERS),
+                sized(files),
+                fits=self.upload_budget.fits,
+            )
 
+        return urls
 
-    def delete_file(self, filename: str, directory: str = "", output: bool = False) -> None:
+    def delete_file(self, filename: str, directory: str = "", output: bool = False) -> bool:
         """Delete a file in a specific directory.
 
         Args:
@@ -334,187 +1176,293 @@ class Session:
             directory (str, optional): The parent directory of the file. Defaults to the root directory.
             output (bool, optional): Whether to list files after deletion. Defaults to True.
 
+        Returns:
+            bool: True if the deletion was successful, False otherwise.
+
         Raises:
             Warning: If the deletion fails.
         """
-        check_parameter(directory)
-        if directory == "/":
-            warnings.warn(
-                "You specified '/' as a directory name, which may cause unknown errors"
-            )
-            exit(1)
-        res = self._request(
-            "DELETE",
-            f"https://api.igem.org/v1/websites/teams/{self.team_id}/{filename}",
-            params={"directory": directory} if directory != "" else None,
-        )
-        if res.status_code == 200:
-            if output:
-                print(f"'{os.path.join(directory, filename)}' deleted")
-        else:
-            warnings.warn(f"'{os.path.join(directory, filename)}' delete failed")
+        self._check_directory(directory)
+        res = self._request("DELETE", self._team_url(filename), params=self._directory_params(directory))
+        return self._deleted(res, directory, filename, output)
+
+    def delete_files(self, items: list) -> list:
+        """Delete many files or folders in parallel through the transfer executor.
+
+        Args:
+            items (list): (parent directory, item) pairs from a listing.
+
+        Returns:
+            list: The (parent directory, item) pairs that could not be deleted.
+        """
+        from tqdm import tqdm
 
-    def delete_dir(self, directory: str, recursive: bool = False) -> None:
+        lock = threading.Lock()
+        failed = []
+
+        def thread_delete(current_dir, item):
+            try:
+                deleted = self.delete_file(item["Name"], current_dir, False)
+            except Exception as e:
+                print(f"Error deleting '{os.path.join(current_dir, item['Name'])}': {e}")
+                deleted = False
+            with lock:
+                if not deleted:
+                    failed.append((current_dir, item))
+                pbar.update(1)
+
+        with tqdm(total=len(items), desc="Deleting files", unit="item") as pbar:
+            self.executor.map(thread_delete, items)
+
+        return failed
+
+    def delete_dir(self, directory: str, recursive: bool = False, resume: bool = False) -> list:
         """Delete a directory by deleting its contents.
 
+        Files are deleted in parallel while the tree is crawled. Folder markers
+        follow level by level, deepest first, and a folder is kept when
+        anything below it could not be deleted. The deletion is journaled,
+        see Journal.
+
         Args:
             directory (str): The directory to delete.
             recursive (bool): Whether to delete subdirectories as well.
+            resume (bool, optional): Whether to skip the items an earlier run of the
+                same deletion completed. Defaults to False.
+
+        Returns:
+            list: The (parent directory, item) pairs that could not be deleted, to retry.
 
         Raises:
             Warning: If attempting to delete the root directory.
         """
-        if directory == "":
-            warnings.warn(
-                "Trying to delete the root directory! Please specify a directory name instead."
-            )
-            exit(1)
+        from tqdm import tqdm
 
-        if len(self.query(directory, output=False)) == 0:
+        self._check_delete_root(directory)
+
+        if not self.listing_page(directory)[0]:
             warnings.warn(f"Directory '{directory}' is empty")
-            return
+            return []
 
-        stack = [directory]
-        all_items = []
+        folders = []
+        failed = []
         successful_deletions = 0
+        lock = threading.Lock()
 
-        # Collect all items first
-        while stack:
-            current_dir = stack.pop()
-            contents = self.query(current_dir, output=False)                
-            for item in contents:
-                all_items.append((current_dir, item))
-                if item["Type"] == "Folder" and recursive:  # Only add to stack if recursive is True
-                    stack.append(os.path.join(current_dir, item["Name"]))
-
-        # Process all items with a single progress bar
-        # Filter out folders if not recursive
-        if not recursive:
-            all_items = [(current_dir, item) for current_dir, item in all_items if item["Type"] != "Folder"]
-
-        with tqdm(
-            total=len(all_items), desc="Deleting directory", unit="item"
-        ) as pbar:
-            for current_dir, item in all_items:
-                if item["Type"] != "Folder" or (item["Type"] == "Folder" and recursive):
-                    self.delete_file(item["Name"], current_dir, False)
+        def thread_delete(current_dir, item):
+            nonlocal successful_deletions
+            key = os.path.join(current_dir, item["Name"])
+            error = "delete failed"
+            try:
+                deleted = self.delete_file(item["Name"], current_dir, False)
+            except (Exception, SystemExit) as e:
+                print(f"Error deleting '{key}': {e}")
+                deleted = False
+                error = str(e) or type(e).__name__
+            self._record(journal, key, deleted, error)
+            with lock:
+                if deleted:
                     successful_deletions += 1
+                else:
+                    failed.append((current_dir, item))
                 pbar.update(1)
 
-        print(f"Deleted '{os.path.join(directory, '')}' with {successful_deletions} files\n")
-
-
-    def download_file(self, file_url: str, target_dir: str = "", output: bool = False) -> bool:
+        def file_items():
+            # Files are deleted while the crawl goes on, folders are kept for later
+            for current_dir, item in crawl(self, directory, recursive, self.executor.jobs):
+                if not self._plan_delete(journal, folders, recursive, current_dir, item):
+                    continue
+                with lock:
+                    pbar.total += 1
+                    pbar.refresh()
+                yield current_dir, item
+
+        with (
+            self._delete_journal(directory, resume) as journal,
+            tqdm(total=0, desc="Deleting directory", unit="item") as pbar,
+        ):
+            self.executor.map(thread_delete, file_items())
+
+            with lock:
+                pbar.total += len(folders)
+                pbar.refresh()
+            for level in folder_levels(folders):
+                ready = self._ready_folders(journal, level, failed)
+                pbar.update(len(level) - len(ready))
+                self.executor.map(thread_delete, ready)
+
+        self._print_deleted(directory, successful_deletions, failed)
+        return failed
+
+    def download_file(
+        self, file_url: str, target_dir: str = "", output: bool = False, item: dict = None
+    ) -> bool:
         """Download a single file from a URL.
 
+        A file downloaded before and not changed locally since is only fetched
+        again if it changed remotely: with its listing ``item``, a matching
+        size and modification time skip the request entirely, otherwise the
+        request is conditional on the stored ETag and Last-Modified and a 304
+        leaves the file as it is.
+
         Args:
             file_url (str): The URL of the file to download.
             target_dir (str, optional): The target directory for saving the file. Defaults to the current directory.
+            output (bool, optional): Whether to print the result. Defaults to False.
+            item (dict, optional): The file's item in the remote listing, if known.
 
         Returns:
-            bool: True if the download was successful, False otherwise.
+            bool: True if the local file is up to date, False otherwise, including
+            when the request failed.
         """
-        if not file_url.startswith(STATIC_URL_PREFIX):
-            file_url = self.url + file_url
-        file_name = os.path.basename(file_url)  # get file name from url
-        file_path = os.path.join(target_dir, file_name)  # local file path
-
-        headers = {
-            "Host": "static.igem.wiki",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/png,image/svg+xml,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate, br, zstd",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Sec-Fetch-Dest": "document",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-Site": "cross-site",
-            "Priority": "u=0, i",
-            "Pragma": "no-cache",
-            "Cache-Control": "no-cache",
-            "TE": "trailers",
-        }
+        file_url, file_path, part_path = self._download_paths(file_url, target_dir)
+        entry, up_to_date = self._up_to_date(file_path, file_url, item, output)
+        if up_to_date:
+            return True
 
         try:
-            with httpx.Client(http2=True, headers=headers) as client:
-                response = client.get(file_url, timeout=TIMEOUT)
-
-            if response.status_code == 200:
-                with open(file_path, "wb") as file:
-                    file.write(response.content)
-                if output:
-                    print(f"Downloaded '{file_url}' to '{file_path}'")
-                return True
-            else:
-                print(
-                    f"Failed to download '{file_url}': Response Header {response.headers}"
-                )
-                return False
+            response = self._download_to_part(
+                file_url, part_path, self.validators.headers(entry) if entry else None
+            )
+            return self._downloaded(response, file_url, file_path, part_path, item, output)
         except httpx.RequestError as e:
             print(f"Request failed: {e}")
-            exit(1)
-
-    def download_dir(self, remote_dir: str = "", target_dir: str = "server", recursive: bool = False) -> None:
-        """Download a directory and its subdirectories to the local file system."""
-
-        def collect_files(directory, recursive):
-            contents = self.query(directory, False)
-            if not contents:
-                return []
-
-            file_list = []
-            for item in contents:
-                if item["Type"] == "Folder":
-                    if recursive:
-                        file_list.extend(
-                            collect_files(
-                                item["Prefix"].split(f"teams/{self.team_id}/")[1],
-                                recursive,
-                            )
-                        )
-                else:
-                    file_list.append((item["Location"], directory))
-            return file_list
+            return False
+
+    def _download_to_part(
+        self, file_url: str, part_path: str, conditional: dict = None
+    ) -> httpx.Response | None:
+        """Stream a file into ``part_path``, resuming from its current size.
+
+        The ETag or Last-Modified date and the length of the first response
+        are saved next to the part file. A resumed request asks for the
+        missing byte range without content encoding, so the appended bytes
+        line up with what was already written, and sends that validator as
+        If-Range, so a file that changed since is sent whole. The download
+        restarts from the beginning if the server sends the whole file, if
+        the range or total length in Content-Range do not match the part
+        file, or if there is no validator to resume with.
 
-        self.successful_downloads = 0
-        self.query(remote_dir)
-        all_files = collect_files(remote_dir, recursive)
+        Args:
+            file_url (str): The URL of the file to download.
+            part_path (str): The partial file to write to.
+            conditional (dict, optional): If-None-Match/If-Modified-Since headers,
+                sent unless a partial download is resumed.
 
-        if not all_files:
+        Returns:
+            httpx.Response | None: The (closed) response: 200 or 206 once ``part_path``
+            holds the complete file, 304 if the file did not change, otherwise a
+            failure. None if the part file was already complete.
+        """
+        while True:
+            offset, info, headers = resume_request(part_path, conditional)
+            with self.static.stream("GET", file_url, headers=headers, timeout=TIMEOUT) as response:
+                mode = part_write_mode(response, part_path, offset, info)
+                if mode == "complete":
+                    return None
+                if mode == "restart":
+                    continue
+                if mode is None:
+                    return response
+                with open(part_path, mode) as file:
+                    for chunk in response.iter_bytes(CHUNK_SIZE):
+                        file.write(chunk)
+                return response
+
+    def download_dir(
+        self, remote_dir: str = "", target_dir: str = "server", recursive: bool = False, resume: bool = False
+    ) -> None:
+        """Download a directory and its subdirectories to the local file system.
+
+        The download is journaled, see Journal: a file that fails is recorded
+        and the others go on, and a resumed run only downloads the files left.
+        """
+        if not self.listing_page(remote_dir)[0]:
             print(f"Directory '{remote_dir}' is empty")
             return
 
-        for file_url, dir_path in all_files:
-            local_target_directory = f"{target_dir}/{dir_path}"
-            os.makedirs(local_target_directory, exist_ok=True)
+        with self._download_journal(remote_dir, target_dir, resume) as journal:
+            downloaded = self.download_files(
+                (
+                    (item["Location"], f"{target_dir}/{directory}", item)
+                    for directory, item in crawl(self, remote_dir, recursive, self.executor.jobs)
+                    if item["Type"] != "Folder"
+                ),
+                journal,
+            )
 
+        remote_dir = remote_dir if remote_dir != "" else "/"
+        print(f"Downloaded {len(downloaded)} files in '{os.path.join(remote_dir, "")}'\n")
+
+    def download_files(self, files, journal: Journal = None) -> list:
+        """Download many files in parallel through the transfer executor.
+
+        The files are taken by their listing size, largest first, with a
+        lane for small files, see SizeLanes.
+
+        Args:
+            files (iterable): (file URL, local target directory) pairs, or triples
+                adding the file's listing item so that unchanged files are skipped
+                and large files go first. It is consumed lazily, so downloads start
+                while it is still being produced.
+            journal (Journal, optional): Records every download; the files it has
+                as done are not requested again.
+
+        Returns:
+            list: The URLs of the files that are up to date locally.
+        """
         # Create a lock for thread-safe updates
         lock = threading.Lock()
+        downloaded = []
 
-        def thread_download(file_url, dir_path):
+        def thread_download(file_url, dir_path, item=None):
+            done = False
+            error = "download failed"
             try:
-                self.download_file(file_url, dir_path)
-                with lock:
-                    self.successful_downloads += 1
-                    pbar.update(1)  # Update progress bar
-            except Exception as e:
+                os.makedirs(dir_path, exist_ok=True)
+                done = self.download_file(file_url, dir_path, False, item)
+                if done:
+                    with lock:
+                        downloaded.append(file_url)
+            except (Exception, SystemExit) as e:
                 print(f"Error downloading '{file_url}': {e}")
+                error = str(e) or type(e).__name__
+            finally:
+                self._record(journal, file_url, done, error)
+                with lock:
+                    pbar.update(remote_size(item))  # Update progress bar
+
+        def sized(tasks):
+            for task in tasks:
+                if not self._plan_download(journal, task):
+                    with lock:
+                        downloaded.append(task[0])
+                    continue
+                size = remote_size(task[2]) if len(task) > 2 else 0
+                with lock:
+                    pbar.total += size
+                    pbar.refresh()
+                yield task, size
 
-        # Use tqdm to create a progress bar
-        with tqdm(total=len(all_files), desc="Downloading files", unit="file") as pbar:
-            threads = []
-            for file_url, dir_path in all_files:
-                local_target_directory = f"{target_dir}/{dir_path}"
-                thread = threading.Thread(
-                    target=thread_download,
-                    args=(file_url, local_target_directory),
-                )
-                thread.start()
-                threads.append(thread)
+        # Largest files first, progress in bytes
+        with byte_progress(0, "Downloading files") as pbar:
+            self.executor.map_by_size(thread_download, SizeLanes(max_pending=PENDING_TRANSFERS), sized(files))
+        self.validators.save()
 
-            for thread in threads:
-                thread.join()
+        return downloaded
 
-        remote_dir = remote_dir if remote_dir != "" else "/"
-        print(f"Downloaded {self.successful_downloads} files in '{os.path.join(remote_dir, "")}'\n")
+    def list_files(self, directory: str = "", recursive: bool = False) -> list:
+        """List the files in a remote directory.
+
+        Args:
+            directory (str, optional): The directory to list. Defaults to the root directory.
+            recursive (bool, optional): Whether to list subdirectories as well. Defaults to False.
+
+        Returns:
+            list: (parent directory, item) pairs, one per file. Folders are left out.
+        """
+        return [
+            (current_dir, item)
+            for current_dir, item in crawl(self, directory, recursive, self.executor.jobs)
+            if item["Type"] != "Folder"
+        ]
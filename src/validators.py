@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from src.manifest import remote_state, same_remote
+
+
+DEFAULT_VALIDATORS_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "igem-cdn",
+    "downloads.json",
+)
+VALIDATORS_VERSION = 1
+
+
+def parse_timestamp(value: str) -> datetime | None:
+    """Parse an HTTP date or an ISO 8601 timestamp, as used by listings and headers.
+
+    Timestamps without a timezone are taken as UTC, so every result can be
+    compared with every other.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class ValidatorStore:
+    """Persistent record of the files downloaded from the static host.
+
+    Each entry is keyed by the absolute local path and stores the file URL,
+    the ETag and Last-Modified headers it was served with, the remote size
+    and modification time from the listing, if known, and the local size and
+    mtime right after the download. An entry only counts while the local file
+    still has that size and mtime, so a file edited locally is fetched again.
+    The file is loaded on first use, so sessions that never download do not
+    read it.
+    """
+
+    def __init__(self, path: str = DEFAULT_VALIDATORS_PATH):
+        """Create the store.
+
+        Args:
+            path (str, optional): The JSON file to keep the entries in. Defaults to DEFAULT_VALIDATORS_PATH.
+        """
+        self.path = path
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        """Read the entries on first use. Call with the lock held."""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == VALIDATORS_VERSION:
+                    self._entries = data.get("files", {})
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+        return self._entries
+
+    def get(self, file_path: str, file_url: str) -> dict | None:
+        """The entry of a local file, if it was downloaded from ``file_url`` and not changed since."""
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._load().get(file_path)
+        if entry is None or entry.get("url") != file_url:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if entry.get("local") != [stat.st_size, stat.st_mtime_ns]:
+            return None
+        return entry
+
+    @staticmethod
+    def headers(entry: dict) -> dict:
+        """Conditional request headers asking the server to answer 304 if the file is unchanged."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def matches(entry: dict, item: dict) -> bool:
+        """Whether a listing item shows the same remote file as an entry.
+
+        The listing's size and modification time are compared with the ones
+        recorded from the listing last time; entries without them fall back
+        to the size and Last-Modified header the file was served with. A
+        listing without either never matches, so the file is revalidated.
+        """
+        if entry.get("remote") is not None:
+            return same_remote(entry["remote"], item)
+        state = remote_state(item)
+        if state["size"] is None or state["size"] != entry["local"][0]:
+            return False
+        served = parse_timestamp(entry.get("last_modified"))
+        listed = parse_timestamp(state["modified"])
+        return served is not None and listed is not None and listed <= served
+
+    def record(self, file_path: str, file_url: str, headers=None, item: dict = None) -> None:
+        """Store the validators of a file that was just downloaded or revalidated.
+
+        Args:
+            file_path (str): The local file.
+            file_url (str): The URL it was downloaded from.
+            headers (optional): The response headers. None keeps the stored ones (for a 304).
+            item (dict, optional): The file's listing item, if known.
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(file_path) if headers is None else None
+            if entry is None or entry.get("url") != file_url:
+                entry = {"url": file_url, "etag": None, "last_modified": None, "remote": None}
+            if headers is not None:
+                entry["etag"] = headers.get("ETag")
+                entry["last_modified"] = headers.get("Last-Modified")
+            if item is not None:
+                entry["remote"] = remote_state(item)
+            entry["local"] = [stat.st_size, stat.st_mtime_ns]
+            entries[file_path] = entry
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the store atomically, dropping entries whose local file is gone."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": VALIDATORS_VERSION, "files": entries}, f)
+            os.replace(tmp_path, self.path)
+            self._entries = entries
+            self._dirty = False
@@ -0,0 +1,173 @@
+import os
+import re
+import warnings
+from src.catalog import glob_regex
+
+
+IGNORE_FILE = ".igemignore"
+
+
+def parse_ignore(lines, base: str = "") -> list:
+    """Compile the patterns of an ignore file, with gitignore syntax.
+
+    Blank lines and lines starting with ``#`` are skipped. ``!`` re-includes
+    what an earlier pattern excluded, a trailing ``/`` matches directories
+    only, and a pattern with a ``/`` before its end is relative to the
+    directory of the ignore file; any other pattern matches a name at any
+    depth below it. ``*``, ``?``, ``[...]`` and ``**`` work as in glob_regex.
+
+    Args:
+        lines (iterable): The lines of the file.
+        base (str, optional): The directory of the file, relative to the walked one. Defaults to "".
+
+    Returns:
+        list: (base, regex, negated, directories only) rules, in file order.
+    """
+    rules = []
+    for line in lines:
+        pattern = line.rstrip("\n").rstrip()
+        if not pattern or pattern.startswith("#"):
+            continue
+        negated = pattern.startswith("!")
+        if negated:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\"):
+            pattern = pattern[1:]  # \# and \! stand for a literal first character
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            continue
+        regex = glob_regex(pattern.lstrip("/"))
+        if "/" not in pattern:
+            regex = re.compile("(?:.*/)?" + regex.pattern)
+        rules.append((base, regex, negated, dir_only))
+    return rules
+
+
+def is_ignored(rules: list, relative_path: str, is_dir: bool) -> bool:
+    """Whether the last rule matching a path excludes it.
+
+    Args:
+        rules (list): Rules from parse_ignore, outer directories first.
+        relative_path (str): The path relative to the walked directory, with '/' separators.
+        is_dir (bool): Whether the path is a directory.
+    """
+    ignored = False
+    for base, regex, negated, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not relative_path.startswith(base + "/"):
+                continue
+            path = relative_path[len(base) + 1:]
+        else:
+            path = relative_path
+        if regex.match(path):
+            ignored = not negated
+    return ignored
+
+
+def read_ignore(directory: str, base: str) -> list:
+    """The rules of the ignore file in a directory, none if it has no such file."""
+    try:
+        with open(os.path.join(directory, IGNORE_FILE), "r", encoding="utf-8") as f:
+            return parse_ignore(f, base)
+    except FileNotFoundError:
+        return []
+    except (OSError, UnicodeDecodeError) as e:
+        warnings.warn(f"Cannot read '{os.path.join(directory, IGNORE_FILE)}': {e}")
+        return []
+
+
+def walk_local(directory: str, recursive: bool = False):
+    """Walk a local directory with os.scandir, yielding files as they are found.
+
+    Hidden files and directories are skipped, and so is everything an
+    ``.igemignore`` excludes: like a .gitignore, one can sit in the walked
+    directory or any directory below it and applies to its own subtree,
+    deeper files taking precedence. Excluded directories are pruned before
+    they are entered, so a ``node_modules/`` line costs one check rather than
+    a walk of the whole tree. Directories that cannot be read are warned
+    about and skipped.
+
+    Args:
+        directory (str): The directory to walk.
+        recursive (bool, optional): Whether to walk subdirectories. Defaults to False.
+
+    Yields:
+        tuple: (file path, its directory relative to ``directory``), the latter
+        '.' for files directly in it, as os.path.relpath gives it.
+    """
+    pending = [(directory, "", read_ignore(directory, ""))]
+    while pending:
+        current_dir, relative_dir, rules = pending.pop()
+        subdirs = []
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_ignored(rules, relative_path, is_dir):
+                        continue
+                    if not is_dir:
+                        yield entry.path, relative_dir.replace("/", os.sep) if relative_dir else "."
+                    elif recursive:
+                        subdirs.append((entry.path, relative_path))
+        except OSError as e:
+            warnings.warn(f"Cannot read directory '{current_dir}': {e}")
+            continue
+        # Popped in reverse, so subdirectories are walked in the order they were found
+        for path, relative_path in reversed(subdirs):
+            pending.append((path, relative_path, rules + read_ignore(path, relative_path)))
+
+
+class IgnoreMatcher:
+    """Tells whether single paths under a root are ones walk_local skips.
+
+    A path is skipped if it or a directory above it is hidden or excluded by
+    an ``.igemignore`` between the root and it. Each directory's rules are
+    read once and kept, for checking many paths, e.g. as a watcher reports them.
+    """
+
+    def __init__(self, root: str):
+        """Create the matcher.
+
+        Args:
+            root (str): The directory walk_local would walk.
+        """
+        self.root = root
+        self._rules = {}
+
+    def _rules_for(self, relative_dir: str) -> list:
+        """The rules that apply inside a directory, outer ones first."""
+        if relative_dir not in self._rules:
+            parent = relative_dir.rpartition("/")[0]
+            inherited = self._rules_for(parent) if relative_dir else []
+            self._rules[relative_dir] = inherited + read_ignore(
+                os.path.join(self.root, *relative_dir.split("/")) if relative_dir else self.root, relative_dir
+            )
+        return self._rules[relative_dir]
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether walk_local would skip a path.
+
+        Args:
+            path (str): A path under the root.
+            is_dir (bool, optional): Whether it is a directory. Defaults to False.
+        """
+        relative_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if relative_path == ".":
+            return False
+        parts = relative_path.split("/")
+        for depth, name in enumerate(parts):
+            if name.startswith("."):
+                return True  # Hidden, or outside the root
+            last = depth == len(parts) - 1
+            if is_ignored(self._rules_for("/".join(parts[:depth])), "/".join(parts[:depth + 1]), is_dir or not last):
+                return True
+        return False
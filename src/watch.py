@@ -0,0 +1,272 @@
+import ctypes
+import ctypes.util
+import os
+import posixpath
+import select
+import struct
+import sys
+import time
+import warnings
+from src.manifest import Manifest
+from src.uploads import Session
+from src.walk import IgnoreMatcher, walk_local
+
+
+DEBOUNCE = 0.1  # Quiet time that ends a burst of events
+MAX_DELAY = 0.5  # Longest a change waits while events keep coming
+POLL_INTERVAL = 1.0
+IDLE_TIMEOUT = 1.0
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def walk_files(root: str) -> dict:
+    """Stat the files under a directory that walk_local finds.
+
+    Returns:
+        dict: (mtime in ns, size) of each file, keyed by path.
+    """
+    files = {}
+    for path, _ in walk_local(root, True):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class InotifyWatcher:
+    """Reports files written under a directory tree, using Linux inotify.
+
+    Every directory walk_local would enter gets its own watch, so hidden
+    directories and those an ``.igemignore`` excludes are never watched; directories created or
+    moved in later are watched as they appear, and the files already in them
+    reported. A file is reported once its writer closes it or it is moved
+    into place, so half-written files are never picked up.
+    """
+
+    name = "inotify"
+
+    def __init__(self, root: str):
+        """Start watching.
+
+        Args:
+            root (str): The directory to watch.
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        self.root = root
+        self.ignore = IgnoreMatcher(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._dirs = {}  # Watch descriptor -> directory
+        self._add_tree(root)
+
+    def _add_tree(self, directory: str) -> set:
+        """Watch a directory and its subdirectories, returning the files already in them."""
+        files = set()
+        for dir_path, dir_names, file_names in os.walk(directory):
+            dir_names[:] = [name for name in dir_names if not self.ignore.ignored(os.path.join(dir_path, name), True)]
+            files.update(
+                os.path.join(dir_path, name)
+                for name in file_names
+                if not self.ignore.ignored(os.path.join(dir_path, name))
+            )
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                warnings.warn(f"Cannot watch '{dir_path}': {os.strerror(errno)}")
+                continue
+            self._dirs[wd] = dir_path
+        return files
+
+    def read(self, timeout: float) -> set:
+        """Wait up to ``timeout`` seconds for changes.
+
+        Returns:
+            set: Paths of the files written since the last call, possibly empty.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self._fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, so treat every file as changed
+                changed |= set(walk_files(self.root))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if self.ignore.ignored(path, bool(mask & IN_ISDIR)):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Reports files whose mtime or size changed, by rescanning the tree periodically."""
+
+    name = "polling"
+
+    def __init__(self, root: str, interval: float = POLL_INTERVAL):
+        """Start watching.
+
+        Args:
+            root (str): The directory to watch.
+            interval (float, optional): Seconds between scans. Defaults to POLL_INTERVAL.
+        """
+        self.root = root
+        self.interval = interval
+        self._snapshot = walk_files(root)
+        self._next_scan = time.monotonic() + interval
+
+    def read(self, timeout: float) -> set:
+        """Wait up to ``timeout`` seconds for changes, see InotifyWatcher.read."""
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(delay, 0))
+        self._next_scan = time.monotonic() + self.interval
+        snapshot = walk_files(self.root)
+        changed = {path for path, state in snapshot.items() if self._snapshot.get(path) != state}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(root: str):
+    """Watch a directory with inotify where available, falling back to polling."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            warnings.warn(f"inotify unavailable ({e}), polling every {POLL_INTERVAL}s instead")
+    return PollingWatcher(root)
+
+
+def push_changes(client: Session, manifest: Manifest, local_dir: str, remote_dir: str, paths: set) -> None:
+    """Upload the given files if their content differs from the manifest.
+
+    Files that vanished again (editor temp files, moved-away files), files
+    walk_local would skip and files whose hash matches their last upload are
+    skipped.
+
+    Args:
+        client (Session): A logged-in session.
+        manifest (Manifest): The manifest of the local root.
+        local_dir (str): The watched local directory.
+        remote_dir (str): The remote directory it corresponds to.
+        paths (set): Paths of the changed files.
+    """
+    files = {}
+    ignore = IgnoreMatcher(local_dir)
+    for path in paths:
+        if not os.path.isfile(path) or ignore.ignored(path):
+            continue
+        relative_path = os.path.relpath(path, local_dir)
+        files[posixpath.join(remote_dir, relative_path.replace(os.sep, "/"))] = path
+    if not files:
+        return
+
+    states = manifest.scan(files)
+    changed = [
+        (key, local_path)
+        for key, local_path in sorted(files.items())
+        if (manifest.get(key) or {}).get("hash") != states[key]["hash"]
+    ]
+    if not changed:
+        return
+
+    urls = client.upload_files(
+        [(local_path, posixpath.dirname(key)) for key, local_path in changed]
+    )
+    for key, local_path in changed:
+        if local_path in urls:
+            manifest.update(key, **states[key], url=urls[local_path], remote=None)
+    manifest.save()
+    print(
+        f"[{time.strftime('%H:%M:%S')}] Uploaded {len(urls)} of {len(changed)} changed files: "
+        + ", ".join(key for key, _ in changed[:5])
+        + (", ..." if len(changed) > 5 else "")
+    )
+
+
+def watch_dir(client: Session, manifest: Manifest, local_dir: str, remote_dir: str = "") -> None:
+    """Upload local changes as they happen, until interrupted.
+
+    Bursts of events are coalesced: a batch is pushed once no event arrived
+    for DEBOUNCE seconds, or MAX_DELAY seconds after its first event, so a
+    save of many files becomes one parallel upload.
+
+    Args:
+        client (Session): A logged-in session, kept open for the whole watch.
+        manifest (Manifest): The manifest of the local root.
+        local_dir (str): The local directory to watch.
+        remote_dir (str, optional): The remote directory to upload to. Defaults to the root directory.
+    """
+    remote_dir = remote_dir.strip("/")
+    watcher = open_watcher(local_dir)
+    print(f"Watching '{local_dir}' ({watcher.name}), press Ctrl+C to stop")
+    pending = set()
+    first_event = last_event = 0.0
+    try:
+        while True:
+            if pending:
+                now = time.monotonic()
+                deadline = min(last_event + DEBOUNCE, first_event + MAX_DELAY)
+                if now >= deadline:
+                    batch, pending = pending, set()
+                    push_changes(client, manifest, local_dir, remote_dir, batch)
+                    continue
+                timeout = deadline - now
+            else:
+                timeout = IDLE_TIMEOUT
+
+            changed = watcher.read(timeout)
+            if changed:
+                now = time.monotonic()
+                if not pending:
+                    first_event = now
+                last_event = now
+                pending |= changed
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
+        manifest.save()
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.cache import AsyncListingCache, ListingCache
+
+
+class SlowFetch:
+    """A fetch that counts its calls and blocks until released."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def run_concurrently(cache, key, fetch, callers=4) -> list:
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(key, fetch)))
+        for _ in range(callers)
+    ]
+    threads[0].start()
+    assert fetch.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    fetch.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_callers_share_one_fetch():
+    cache = ListingCache()
+    fetch = SlowFetch(["a.txt"])
+    assert run_concurrently(cache, "site", fetch) == [["a.txt"]] * 4
+    assert fetch.calls == 1
+    assert cache.get("site", lambda: pytest.fail("fetched again")) == ["a.txt"]
+
+
+def test_failed_fetch_reaches_waiters_and_is_not_cached():
+    cache = ListingCache()
+    errors = []
+    fetch = SlowFetch(RuntimeError("listing failed"))
+
+    def get():
+        try:
+            cache.get("site", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    threads[0].start()
+    assert fetch.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)  # Let the others wait on the fetch, or they would retry it
+    fetch.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["listing failed"] * 3 and fetch.calls == 1
+    assert cache.get("site", lambda: ["b.txt"]) == ["b.txt"]
+
+
+def test_none_and_unkept_results_are_not_cached():
+    cache = ListingCache()
+    assert cache.get("site", lambda: None) is None
+    assert cache.get("site", lambda: ["page 1"], keep=lambda value: False) == ["page 1"]
+    assert cache.get("site", lambda: ["all"]) == ["all"]
+    assert cache.get("site", lambda: ["refetched"]) == ["all"]
+
+
+def test_invalidation_during_fetch_skips_storing():
+    cache = ListingCache()
+    fetch = SlowFetch(["stale"])
+    owner = threading.Thread(target=lambda: cache.get("site", fetch))
+    owner.start()
+    assert fetch.started.wait(5)
+    cache.invalidate("site/sub")
+    fetch.release.set()
+    owner.join(5)
+    assert cache.get("site", lambda: ["fresh"]) == ["fresh"]
+
+
+def test_invalidate_drops_parents_and_optionally_subtree():
+    cache = ListingCache()
+    for key in ["", "site", "site/sub", "site/sub/deep", "other"]:
+        cache.get(key, lambda key=key: [key])
+    cache.invalidate("/site/sub/")
+    assert cache.get("", lambda: ["new"]) == ["new"]
+    assert cache.get("site", lambda: ["new"]) == ["new"]
+    assert cache.get("site/sub", lambda: ["new"]) == ["new"]
+    assert cache.get("site/sub/deep", lambda: ["new"]) == ["site/sub/deep"]
+    assert cache.get("other", lambda: ["new"]) == ["other"]
+
+    cache.invalidate("site", subtree=True)
+    assert cache.get("site/sub/deep", lambda: ["newer"]) == ["newer"]
+    assert cache.get("other", lambda: ["newer"]) == ["other"]
+
+
+def test_async_concurrent_callers_share_one_fetch():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["a.txt"]
+
+    async def main():
+        cache = AsyncListingCache()
+        results = await asyncio.gather(*(cache.get("site", fetch) for _ in range(4)))
+        return results, await cache.get("site", fetch)
+
+    results, cached = asyncio.run(main())
+    assert results == [["a.txt"]] * 4 and cached == ["a.txt"] and calls == 1
@@ -0,0 +1,72 @@
+import json
+import os
+import pytest
+from src.journal import Journal
+
+
+def interrupted(tmp_path) -> str:
+    """Leave the journal of an upload cut short after one of three files."""
+    with pytest.raises(KeyboardInterrupt):
+        with Journal("upload", "site", "remote", directory=str(tmp_path)) as journal:
+            for key in ["a.txt", "b.txt", "c.txt"]:
+                journal.plan(key)
+            journal.done("a.txt", url="https://static/a.txt")
+            journal.failed("b.txt", "timed out")
+            raise KeyboardInterrupt
+    with open(journal.path, "a") as f:
+        f.write('{"event": "done", "key": "c.t')  # The crash cut the last line short
+    return journal.path
+
+
+def events(path: str) -> list:
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line)["event"])
+            except json.JSONDecodeError:
+                records.append(None)
+    return records
+
+
+def test_resume_skips_only_completed_items(tmp_path):
+    path = interrupted(tmp_path)
+    with Journal("upload", "site", "remote", resume=True, directory=str(tmp_path)) as journal:
+        assert journal.path == path
+        assert journal.is_done("a.txt")["url"] == "https://static/a.txt"
+        assert journal.is_done("b.txt") is None
+        assert journal.is_done("c.txt") is None
+        journal.done("b.txt")
+        journal.done("c.txt")
+        assert events(path)[-4:] == [None, "start", "done", "done"]
+    assert not os.path.exists(path)
+
+
+def test_resumed_failures_keep_the_journal(tmp_path, capsys):
+    path = interrupted(tmp_path)
+    with Journal("upload", "site", "remote", resume=True, directory=str(tmp_path)) as journal:
+        journal.failed("b.txt", "timed out again")
+        journal.done("c.txt")
+    assert "1 items failed" in capsys.readouterr().out
+    assert events(path)[-1] == "end"
+
+    with Journal("upload", "site", "remote", resume=True, directory=str(tmp_path)) as journal:
+        assert set(journal.completed) == {"a.txt", "c.txt"}
+
+
+def test_without_resume_the_journal_is_replaced(tmp_path, capsys):
+    path = interrupted(tmp_path)
+    with Journal("upload", "site", "remote", directory=str(tmp_path)) as journal:
+        assert "1 completed items" in capsys.readouterr().out
+        assert journal.completed == {}
+        assert events(path) == ["start"]
+        journal.done("a.txt")
+    assert not os.path.exists(path)
+
+
+def test_operations_have_journals_of_their_own(tmp_path):
+    paths = set()
+    for args in [("upload", "site", "remote"), ("upload", "site", "other"), ("download", "site", "remote")]:
+        with Journal(*args, directory=str(tmp_path)) as journal:
+            paths.add(journal.path)
+    assert len(paths) == 3
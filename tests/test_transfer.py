@@ -0,0 +1,96 @@
+import threading
+from src.transfer import SizeLanes, TransferExecutor
+
+
+def filled(sizes, small_size=10, max_pending=None) -> SizeLanes:
+    lanes = SizeLanes(small_size, max_pending)
+    for size in sizes:
+        lanes.add((size,), size)
+    return lanes
+
+
+def drain(lanes: SizeLanes, small_first=False) -> list:
+    sizes = []
+    while (item := lanes.pop(small_first)) is not None:
+        sizes.append(item[0])
+    return sizes
+
+
+def test_large_files_largest_first_then_small_in_order():
+    lanes = filled([50, 3, 200, 1, 100, 2])
+    lanes.close()
+    assert drain(lanes) == [200, 100, 50, 3, 1, 2]
+    assert lanes.total == 6 and lanes.total_bytes == 356
+
+
+def test_small_lane_served_first_when_asked():
+    lanes = filled([50, 3, 200, 1])
+    lanes.close()
+    assert drain(lanes, small_first=True) == [3, 1, 200, 50]
+
+
+def test_small_file_taken_while_large_one_does_not_fit():
+    lanes = filled([200, 3])
+    lanes.close()
+    assert lanes.pop(fits=lambda size: size < 100)[0] == 3
+    assert lanes.pop(fits=lambda size: size < 100)[0] == 200
+
+
+def test_add_blocks_while_backlog_is_full():
+    lanes = filled([50, 60], max_pending=2)
+    added = threading.Event()
+    adder = threading.Thread(target=lambda: (lanes.add((70,), 70), added.set()))
+    adder.start()
+    assert not added.wait(0.1)
+    assert lanes.pop()[0] == 60
+    assert added.wait(5)
+    adder.join()
+    lanes.close()
+    assert drain(lanes) == [70, 50]
+
+
+def test_pop_waits_for_add_and_returns_none_once_closed():
+    lanes = SizeLanes(10)
+    popped = []
+    taker = threading.Thread(target=lambda: popped.extend(drain(lanes)))
+    taker.start()
+    lanes.add((20,), 20)
+    lanes.close()
+    taker.join(5)
+    assert not taker.is_alive() and popped == [20]
+
+
+def test_map_by_size_runs_largest_first():
+    executor = TransferExecutor(jobs=1)
+    lanes = filled([50, 300, 100])
+    lanes.close()
+    order = []
+    try:
+        futures = executor.map_by_size(order.append, lanes)
+    finally:
+        executor.shutdown()
+    assert order == [300, 100, 50]
+    assert [future.result() for future in futures] == [None] * 3
+
+
+def test_map_by_size_streams_tasks_and_keeps_failures():
+    executor = TransferExecutor(jobs=4)
+    done = []
+
+    def transfer(size):
+        if size == 13:
+            raise ValueError("failed")
+        return size
+
+    try:
+        futures = executor.map_by_size(
+            transfer,
+            SizeLanes(10, max_pending=2),
+            (((size,), size) for size in range(1, 41)),
+            callback=done.append,
+        )
+    finally:
+        executor.shutdown()
+    assert len(futures) == len(done) == 40
+    assert sorted(f.result() for f in futures if f.exception() is None) == [n for n in range(1, 41) if n != 13]
+    assert [str(f.exception()) for f in futures if f.exception() is not None] == ["failed"]
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from src.validators import ValidatorStore, parse_timestamp
+
+
+SERVED = "Wed, 21 Oct 2025 07:28:00 GMT"
+
+
+def entry(last_modified: str = SERVED) -> dict:
+    return {"remote": None, "local": [5, 0], "last_modified": last_modified}
+
+
+def test_parse_timestamp_formats_are_aware():
+    expected = datetime(2025, 10, 21, 7, 28, tzinfo=timezone.utc)
+    assert parse_timestamp(SERVED) == expected
+    assert parse_timestamp("2025-10-21T07:28:00Z") == expected
+    assert parse_timestamp("2025-10-21T09:28:00+02:00") == expected
+    assert parse_timestamp("2025-10-21T07:28:00") == expected
+    assert parse_timestamp("2025-10-21T07:28:00").tzinfo is not None
+
+
+def test_parse_timestamp_invalid():
+    assert parse_timestamp(None) is None
+    assert parse_timestamp("") is None
+    assert parse_timestamp("yesterday") is None
+
+
+def test_matches_naive_listing_against_http_date():
+    assert ValidatorStore.matches(entry(), {"Size": 5, "LastModified": "2025-10-21T07:00:00"})
+    assert not ValidatorStore.matches(entry(), {"Size": 5, "LastModified": "2025-10-21T08:00:00"})
+
+
+def test_matches_iso_listing_against_http_date():
+    assert ValidatorStore.matches(entry(), {"Size": 5, "LastModified": "2025-10-21T07:00:00Z"})
+    assert not ValidatorStore.matches(entry(), {"Size": 5, "LastModified": "2025-10-21T07:00:00-02:00"})
+
+
+def test_matches_needs_size_and_time():
+    assert not ValidatorStore.matches(entry(), {"Size": 6, "LastModified": "2025-10-21T07:00:00"})
+    assert not ValidatorStore.matches(entry(), {"Size": 5})
+    assert not ValidatorStore.matches(entry(None), {"Size": 5, "LastModified": "2025-10-21T07:00:00"})
@@ -0,0 +1,77 @@
+import os
+from src.walk import IgnoreMatcher, is_ignored, parse_ignore, walk_local
+
+
+def tree(root, files: dict) -> None:
+    for path, content in files.items():
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text(content)
+
+
+def walked(root) -> set:
+    return {os.path.relpath(path, root).replace(os.sep, "/") for path, _ in walk_local(str(root), True)}
+
+
+def test_negation_re_includes_a_later_match():
+    rules = parse_ignore(["*.map", "!keep.map", "# a comment", ""])
+    assert is_ignored(rules, "app.map", False)
+    assert is_ignored(rules, "js/app.map", False)
+    assert not is_ignored(rules, "keep.map", False)
+    assert not is_ignored(rules, "js/keep.map", False)
+    assert not is_ignored(rules, "app.js", False)
+
+
+def test_last_matching_rule_wins():
+    rules = parse_ignore(["!keep.map", "*.map"])
+    assert is_ignored(rules, "keep.map", False)
+
+
+def test_directory_only_rules_skip_files_of_that_name():
+    rules = parse_ignore(["build/"])
+    assert is_ignored(rules, "build", True)
+    assert is_ignored(rules, "sub/build", True)
+    assert not is_ignored(rules, "build", False)
+
+
+def test_anchored_and_nested_rules():
+    rules = parse_ignore(["/top.txt"]) + parse_ignore(["*.css"], "sub")
+    assert is_ignored(rules, "top.txt", False)
+    assert not is_ignored(rules, "sub/top.txt", False)
+    assert is_ignored(rules, "sub/a.css", False)
+    assert not is_ignored(rules, "a.css", False)
+
+
+def test_walk_and_matcher_agree(tmp_path):
+    tree(tmp_path, {
+        ".igemignore": "*.map\n!keep.map\nbuild/\n/top.txt\n",
+        "a.map": "",
+        "keep.map": "",
+        "top.txt": "",
+        "index.html": "",
+        ".hidden": "",
+        "build/app.js": "",
+        "sub/top.txt": "",
+        "sub/b.map": "",
+        "sub/build": "a file, not a directory",
+        "sub/.igemignore": "!b.map\n*.css\n",
+        "sub/c.css": "",
+        "sub/deep/d.map": "",
+        "sub/deep/e.css": "",
+    })
+    assert walked(tmp_path) == {
+        "keep.map",
+        "index.html",
+        "sub/top.txt",
+        "sub/b.map",
+        "sub/build",
+    }
+
+    matcher = IgnoreMatcher(str(tmp_path))
+    for path in ["a.map", "top.txt", ".hidden", "sub/c.css", "sub/deep/d.map", "sub/deep/e.css", "build/app.js"]:
+        assert matcher.ignored(str(tmp_path / path)), path
+    for path in ["keep.map", "index.html", "sub/top.txt", "sub/b.map", "sub/build"]:
+        assert not matcher.ignored(str(tmp_path / path)), path
+    assert matcher.ignored(str(tmp_path / "build"), is_dir=True)
+    assert matcher.ignored(str(tmp_path / "build" / "new.js"))
+    assert not matcher.ignored(str(tmp_path))